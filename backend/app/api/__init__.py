@@ -1,5 +1,11 @@
 from .vault import router as vault_router
 from .credentials import router as credentials_router
+from .attachments import router as attachments_router
 from .chat import router as chat_router
+from .rotation import router as rotation_router
+from .jobs import router as jobs_router
+from .snapshot import router as snapshot_router
+from .events import router as events_router
+from .admin import router as admin_router
 
-__all__ = ["vault_router", "credentials_router", "chat_router"]
+__all__ = ["vault_router", "credentials_router", "attachments_router", "chat_router", "rotation_router", "jobs_router", "snapshot_router", "events_router", "admin_router"]
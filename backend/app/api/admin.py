@@ -0,0 +1,31 @@
+# Admin: SQL statistics (slowest statements, queries per request by route); needs SQL_STATS=true
+from fastapi import APIRouter, HTTPException
+
+from app.db import database
+from app.models.schemas import SQLStatsResponse
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+
+def _stats() -> database.SQLStats:
+    if database.sql_stats is None:
+        raise HTTPException(status_code=404, detail="SQL statistics are off. Set SQL_STATS=true and restart.")
+    return database.sql_stats
+
+
+@router.get("/sql-stats", response_model=SQLStatsResponse)
+def sql_stats(limit: int = 20):
+    """Top statements by total time over the last SQL_STATS_WINDOW executions, routes by queries per request."""
+    stats = _stats()
+    limit = max(1, min(limit, 200))
+    return SQLStatsResponse(
+        window=stats.window,
+        slow_ms=stats.slow_ms,
+        statements=stats.top_statements(limit),
+        routes=stats.routes(limit),
+    )
+
+
+@router.post("/sql-stats/reset", status_code=204)
+def reset_sql_stats():
+    _stats().reset()
@@ -0,0 +1,54 @@
+# Attachments of a credential: raw request body upload, chunk-by-chunk streamed download
+from urllib.parse import quote
+
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.database import get_db
+from app.models.schemas import AttachmentResponse
+from app.services import attachments as svc
+
+router = APIRouter(prefix="/credentials/{credential_id}/attachments", tags=["attachments"])
+
+
+@router.post("", response_model=AttachmentResponse)
+async def upload(
+    credential_id: int,
+    filename: str,
+    request: Request,
+    compress: bool = True,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Body = file content (not multipart), e.g. curl --data-binary @kubeconfig "...?filename=kubeconfig".
+    compress=false for content that is already compressed (zip, jar, p12).
+    """
+    content_type = request.headers.get("content-type", "application/octet-stream")
+    return await svc.store_attachment(db, credential_id, filename, content_type, request.stream(), compress)
+
+
+@router.get("", response_model=list[AttachmentResponse])
+async def list_(credential_id: int, db: AsyncSession = Depends(get_db)):
+    return await svc.list_attachments(db, credential_id)
+
+
+@router.get("/{attachment_id}")
+async def download(credential_id: int, attachment_id: int, db: AsyncSession = Depends(get_db)):
+    att = await svc.get_attachment(db, credential_id, attachment_id)
+    filename, content = await svc.open_attachment(att)
+    return StreamingResponse(
+        content,
+        media_type=att.content_type,
+        headers={
+            "Content-Length": str(att.size),
+            "Content-Disposition": f"attachment; filename*=utf-8''{quote(filename)}",
+            "Cache-Control": "no-store",
+        },
+    )
+
+
+@router.delete("/{attachment_id}", status_code=204)
+async def delete(credential_id: int, attachment_id: int, db: AsyncSession = Depends(get_db)):
+    att = await svc.get_attachment(db, credential_id, attachment_id)
+    await svc.delete_attachment(db, att)
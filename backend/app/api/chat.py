@@ -1,18 +1,65 @@
 # Chat: AI-Agent (Ollama)
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.api.sse import SSE_HEADERS, sse_event
 from app.db.database import get_db
-from app.models.schemas import ChatRequest, ChatResponse
-from app.services.agent import execute
+from app.models.schemas import ChatRequest, ChatResponse, ChatStatsResponse
+from app.services.agent import execute, execute_stream, get_path_stats
+from app.services.ollama import OllamaBusyError
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
 
+def _history(req: ChatRequest) -> list[dict]:
+    return [m.model_dump() for m in req.history]
+
+
 @router.post("", response_model=ChatResponse)
 async def chat(req: ChatRequest, db: AsyncSession = Depends(get_db)):
     try:
-        reply, action = await execute(db, req.message)
-        return ChatResponse(reply=reply, action_performed=action)
+        reply, action, handled_by = await execute(db, req.message, _history(req))
+        return ChatResponse(reply=reply, action_performed=action, handled_by=handled_by)
+    except OllamaBusyError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "2"})
     except RuntimeError as e:
         raise HTTPException(status_code=503, detail=str(e))
+
+
+@router.get("/stats", response_model=ChatStatsResponse)
+def chat_stats():
+    """How many messages the fast path handled vs. the LLM (since backend start)."""
+    return ChatStatsResponse(**get_path_stats())
+
+
+@router.post("/stream")
+async def chat_stream(req: ChatRequest, db: AsyncSession = Depends(get_db)):
+    """
+    Same as POST /chat, streamed as Server-Sent Events:
+    "token" (reply fragments), "intent" (detected action), "result" (ChatResponse fields), "error".
+    """
+    events = execute_stream(db, req.message, _history(req))
+    # Wait for the first event before answering: busy queue / unreachable Ollama stay proper HTTP errors.
+    try:
+        first = await events.__anext__()
+    except OllamaBusyError as e:
+        await events.aclose()
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "2"})
+    except RuntimeError as e:
+        await events.aclose()
+        raise HTTPException(status_code=503, detail=str(e))
+
+    async def body():
+        try:
+            yield sse_event(*first)
+            async for event, data in events:
+                yield sse_event(event, data)
+        except HTTPException as e:
+            yield sse_event("error", {"status": e.status_code, "detail": e.detail})
+        except RuntimeError as e:
+            yield sse_event("error", {"status": 503, "detail": str(e)})
+        finally:
+            await events.aclose()
+
+    return StreamingResponse(body(), media_type="text/event-stream", headers=SSE_HEADERS)
@@ -1,17 +1,39 @@
 # Credential API: CRUD for passwords, SSH keys, API keys
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.config import Settings
+from app.crypto import current_vault
 from app.db.database import get_db
 from app.models.schemas import (
     CredentialCreate,
     CredentialUpdate,
     CredentialResponse,
     CredentialWithSecret,
+    HealthReport,
+    PublicKeyResponse,
+    SecretsRequest,
+    SemanticSearchResult,
+    SSHKeyCreate,
+    SSHKeyCreateResponse,
 )
 from app.services import credentials as svc
+from app.services.health import get_health_scanner
+from app.services.semantic import get_semantic_index
+from app.services.sshkeys import get_key_pool, public_key_from_private, validate_key_spec
 
 router = APIRouter(prefix="/credentials", tags=["credentials"])
+settings = Settings()
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match: "*" or a comma-separated list of ETags, compared weakly (W/ prefix ignored)."""
+    opaque = etag.removeprefix("W/")
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == opaque:
+            return True
+    return False
 
 
 @router.post("", response_model=CredentialResponse)
@@ -19,15 +41,72 @@ async def create(data: CredentialCreate, db: AsyncSession = Depends(get_db)):
     return await svc.create_credential(db, data)
 
 
+@router.post("/ssh-key", response_model=SSHKeyCreateResponse)
+async def create_ssh_key(data: SSHKeyCreate, db: AsyncSession = Depends(get_db)):
+    """Generate an SSH key pair server-side; the private key is stored as the secret."""
+    svc.ensure_unsealed()
+    bits = validate_key_spec(data.algorithm, data.bits)
+    private_key, public_key = await get_key_pool().take(data.algorithm, bits)
+    resp = await svc.create_credential(
+        db,
+        CredentialCreate(
+            type="ssh_key",
+            name=data.name,
+            username=data.username,
+            category=data.category,
+            description=data.description,
+            secret=private_key,
+        ),
+    )
+    return SSHKeyCreateResponse(public_key=public_key, **resp.model_dump())
+
+
 @router.get("", response_model=list[CredentialResponse])
 async def list_(
+    request: Request,
+    response: Response,
     type: str | None = None,
     category: str | None = None,
     db: AsyncSession = Depends(get_db),
 ):
+    """ETag: clients send If-None-Match and get 304 (no body, nothing decrypted) while the list is unchanged."""
+    svc.ensure_unsealed()
+    etag = await svc.list_etag(db, type_filter=type, category=category)
+    if _etag_matches(request.headers.get("if-none-match", ""), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
     return await svc.list_credentials(db, type_filter=type, category=category)
 
 
+@router.post("/secrets", response_model=list[CredentialWithSecret])
+async def get_secrets(req: SecretsRequest, db: AsyncSession = Depends(get_db)):
+    """Secrets of several credentials in one request (same data as GET /{id}/secret)."""
+    if len(req.ids) > 500:
+        raise HTTPException(status_code=400, detail="At most 500 IDs per request.")
+    return await svc.get_secrets_decrypted(db, req.ids)
+
+
+@router.get("/health", response_model=HealthReport)
+async def health(stale_days: int | None = None, db: AsyncSession = Depends(get_db)):
+    """Reused, weak and stale secrets of the vault (no secrets in the report). Only changed credentials are decrypted."""
+    days = settings.health_stale_days if stale_days is None else stale_days
+    if days < 0:
+        raise HTTPException(status_code=400, detail="stale_days must not be negative.")
+    return await get_health_scanner().report(db, days)
+
+
+@router.get("/semantic-search", response_model=list[SemanticSearchResult])
+async def semantic_search(q: str, k: int = 5, db: AsyncSession = Depends(get_db)):
+    """Credentials by meaning of name, type, category and description (embeddings), most similar first."""
+    svc.ensure_unsealed()
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="q must not be empty.")
+    hits = await get_semantic_index().search(current_vault.get(), q, max(1, min(k, 50)))
+    creds = await svc.get_credentials_by_ids(db, [cid for cid, _ in hits])
+    # An ID may be gone already (deleted, index not yet updated)
+    return [SemanticSearchResult(**creds[cid].model_dump(), score=score) for cid, score in hits if cid in creds]
+
+
 @router.get("/{credential_id}", response_model=CredentialResponse)
 async def get(credential_id: int, db: AsyncSession = Depends(get_db)):
     resp = await svc.get_credential_response(db, credential_id)
@@ -45,6 +124,17 @@ async def get_with_secret(credential_id: int, db: AsyncSession = Depends(get_db)
     return CredentialWithSecret(secret=secret, **resp.model_dump())
 
 
+@router.get("/{credential_id}/public-key", response_model=PublicKeyResponse)
+async def get_public_key(credential_id: int, db: AsyncSession = Depends(get_db)):
+    result = await svc.get_credential_decrypted(db, credential_id)
+    if not result:
+        raise HTTPException(status_code=404, detail="Credential not found")
+    resp, secret = result
+    if resp.type != "ssh_key":
+        raise HTTPException(status_code=400, detail="Credential is not an SSH key.")
+    return PublicKeyResponse(public_key=public_key_from_private(secret))
+
+
 @router.patch("/{credential_id}", response_model=CredentialResponse)
 async def update(credential_id: int, data: CredentialUpdate, db: AsyncSession = Depends(get_db)):
     resp = await svc.update_credential(db, credential_id, data)
@@ -0,0 +1,61 @@
+# Change feed: GET /events streams credential/vault changes of the selected vault as Server-Sent Events
+import asyncio
+from typing import Optional
+
+from fastapi import APIRouter, Header
+from fastapi.responses import StreamingResponse
+
+from app.api.sse import SSE_HEADERS, sse_event
+from app.config import Settings
+from app.crypto import current_vault
+from app.services.events import get_event_bus
+
+router = APIRouter(tags=["events"])
+settings = Settings()
+
+
+@router.get("/events")
+async def events(
+    last_event_id: Optional[int] = None,
+    last_event_id_header: Optional[str] = Header(None, alias="Last-Event-ID"),
+):
+    """
+    Events: credential.created / credential.updated (metadata, never secrets), credential.deleted {id},
+    credentials.rotated {ids}, vault.unsealed / vault.sealed / vault.reset. Every event has an id;
+    reconnect with Last-Event-ID (EventSource does this itself) or ?last_event_id= to get what was missed.
+    "reset": the missed events are gone (too old, vault sealed, backend restarted) – reload the full list.
+    """
+    raw = last_event_id_header or last_event_id
+    try:
+        last_id = int(raw) if raw is not None else None
+    except ValueError:
+        last_id = None
+    bus = get_event_bus()
+    backlog, sub, gap = bus.subscribe(current_vault.get(), last_id)
+
+    async def body():
+        sent = last_id or 0
+        try:
+            if gap:
+                sent = bus.last_seq
+                yield sse_event("reset", {"reason": "missed events are no longer available"}, sent)
+            for event in backlog:
+                if event.seq > sent:
+                    sent = event.seq
+                    yield sse_event(event.type, event.data, event.seq)
+            while True:
+                try:
+                    event = await asyncio.wait_for(sub.queue.get(), settings.event_keepalive_seconds)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if event.seq > sent:
+                    sent = event.seq
+                    yield sse_event(event.type, event.data, event.seq)
+                if sub.overflowed and sub.queue.empty():
+                    yield sse_event("reset", {"reason": "client too slow, events dropped"}, bus.last_seq)
+                    return
+        finally:
+            bus.unsubscribe(sub)
+
+    return StreamingResponse(body(), media_type="text/event-stream", headers=SSE_HEADERS)
@@ -0,0 +1,41 @@
+# Jobs: start long-running vault operations in the background, poll progress/ETA, cancel
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.database import get_db
+from app.db.models import Job
+from app.models.schemas import JobCreate, JobResponse
+from app.services.jobs import FINISHED, get_job_runner
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+@router.post("", response_model=JobResponse, status_code=202)
+async def start(req: JobCreate):
+    job = await get_job_runner().submit(req.kind, req.params)
+    return get_job_runner().to_response(job)
+
+
+@router.get("", response_model=list[JobResponse])
+async def list_(limit: int = 20, db: AsyncSession = Depends(get_db)):
+    r = await db.execute(select(Job).order_by(Job.id.desc()).limit(max(1, min(limit, 200))))
+    return [get_job_runner().to_response(job) for job in r.scalars().all()]
+
+
+@router.get("/{job_id}", response_model=JobResponse)
+async def get(job_id: int, db: AsyncSession = Depends(get_db)):
+    job = await db.get(Job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return get_job_runner().to_response(job)
+
+
+@router.post("/{job_id}/cancel", response_model=JobResponse)
+async def cancel(job_id: int, db: AsyncSession = Depends(get_db)):
+    job = await db.get(Job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status in FINISHED or not get_job_runner().cancel(job_id):
+        raise HTTPException(status_code=409, detail=f"Job is already {job.status}.")
+    return get_job_runner().to_response(job)
@@ -0,0 +1,76 @@
+# Vault selection per request: header X-KeyPilot-Vault or path prefix /v/<vault>/ (stripped before routing);
+# with SQL_STATS, query counts per request
+import json
+
+from app.crypto import DEFAULT_VAULT, VAULT_NAME_RE, current_vault, mark_used
+from app.db.database import RequestSQLStats, current_request_sql, sql_stats
+
+VAULT_HEADER = b"x-keypilot-vault"
+PATH_PREFIX = "/v/"
+
+
+class VaultMiddleware:
+    """Pure ASGI middleware (no extra task), so the vault stays set for streamed responses too."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        vault = DEFAULT_VAULT
+        path = scope["path"]
+        if path.startswith(PATH_PREFIX):
+            vault, _, rest = path[len(PATH_PREFIX):].partition("/")
+            scope = dict(scope, path="/" + rest, raw_path=("/" + rest).encode("utf-8"))
+        else:
+            header = dict(scope.get("headers") or []).get(VAULT_HEADER)
+            if header:
+                vault = header.decode("latin-1").strip()
+        if not VAULT_NAME_RE.match(vault):
+            await _reject(send, "Invalid vault name (lowercase letters, digits, '-' and '_', max 63 characters).")
+            return
+        token = current_vault.set(vault)
+        try:
+            mark_used(vault)
+            await self.app(scope, receive, send)
+        finally:
+            current_vault.reset(token)
+
+
+class SQLStatsMiddleware:
+    """Counts the statements of each request: X-KeyPilot-SQL response header and per-route totals."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or sql_stats is None:
+            await self.app(scope, receive, send)
+            return
+        stats = RequestSQLStats()
+        token = current_request_sql.set(stats)
+
+        async def send_with_header(message) -> None:
+            if message["type"] == "http.response.start":
+                value = f"queries={stats.queries}; ms={stats.total_ms:.1f}".encode("ascii")
+                message = dict(message, headers=[*message.get("headers", []), (b"x-keypilot-sql", value)])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_header)
+        finally:
+            current_request_sql.reset(token)
+            route = scope.get("route")  # set by the router on this scope
+            sql_stats.record_request(f"{scope['method']} {route.path if route else 'unmatched'}", stats)
+
+
+async def _reject(send, detail: str) -> None:
+    body = json.dumps({"detail": detail}).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": 400,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
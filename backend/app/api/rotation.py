@@ -0,0 +1,86 @@
+# Rotation: bulk secret rotation by policy (type/category/age), policies for the scheduler, reports
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.database import get_db
+from app.db.models import RotationPolicy, RotationReport
+from app.models.schemas import (
+    RotationPolicyCreate,
+    RotationPolicyResponse,
+    RotationPolicyUpdate,
+    RotationReportResponse,
+    RotationRunRequest,
+)
+from app.services import rotation as svc
+
+router = APIRouter(prefix="/rotation", tags=["rotation"])
+
+
+async def _get_policy(db: AsyncSession, policy_id: int) -> RotationPolicy:
+    policy = await db.get(RotationPolicy, policy_id)
+    if not policy:
+        raise HTTPException(status_code=404, detail="Rotation policy not found")
+    return policy
+
+
+@router.post("/run", response_model=RotationReportResponse)
+async def run(req: RotationRunRequest, db: AsyncSession = Depends(get_db)):
+    """Rotate all matching credentials now (dry_run: only list them)."""
+    report = await svc.rotate(db, req, dry_run=req.dry_run)
+    return svc.report_to_response(report)
+
+
+@router.get("/policies", response_model=list[RotationPolicyResponse])
+async def list_policies(db: AsyncSession = Depends(get_db)):
+    r = await db.execute(select(RotationPolicy).order_by(RotationPolicy.id))
+    return list(r.scalars().all())
+
+
+@router.post("/policies", response_model=RotationPolicyResponse)
+async def create_policy(data: RotationPolicyCreate, db: AsyncSession = Depends(get_db)):
+    svc.validate_selector(data)
+    policy = RotationPolicy(**data.model_dump())
+    db.add(policy)
+    await db.commit()
+    await db.refresh(policy)
+    return policy
+
+
+@router.patch("/policies/{policy_id}", response_model=RotationPolicyResponse)
+async def update_policy(policy_id: int, data: RotationPolicyUpdate, db: AsyncSession = Depends(get_db)):
+    policy = await _get_policy(db, policy_id)
+    for field, value in data.model_dump(exclude_unset=True).items():
+        setattr(policy, field, value)
+    svc.validate_selector(svc.policy_selector(policy))
+    await db.commit()
+    await db.refresh(policy)
+    return policy
+
+
+@router.delete("/policies/{policy_id}", status_code=204)
+async def delete_policy(policy_id: int, db: AsyncSession = Depends(get_db)):
+    policy = await _get_policy(db, policy_id)
+    await db.delete(policy)
+    await db.commit()
+
+
+@router.post("/policies/{policy_id}/run", response_model=RotationReportResponse)
+async def run_policy(policy_id: int, db: AsyncSession = Depends(get_db)):
+    policy = await _get_policy(db, policy_id)
+    report = await svc.run_policy(db, policy)
+    return svc.report_to_response(report)
+
+
+@router.get("/reports", response_model=list[RotationReportResponse])
+async def list_reports(limit: int = 20, db: AsyncSession = Depends(get_db)):
+    r = await db.execute(select(RotationReport).order_by(RotationReport.id.desc()).limit(max(1, min(limit, 200))))
+    return [svc.report_to_response(rep) for rep in r.scalars().all()]
+
+
+@router.get("/reports/{report_id}", response_model=RotationReportResponse)
+async def get_report(report_id: int, db: AsyncSession = Depends(get_db)):
+    report = await db.get(RotationReport, report_id)
+    if not report:
+        raise HTTPException(status_code=404, detail="Rotation report not found")
+    return svc.report_to_response(report)
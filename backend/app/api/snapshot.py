@@ -0,0 +1,53 @@
+# Snapshot export: read-only encrypted file for offline hosts. The key travels only in JSON bodies,
+# never in headers or URLs (proxies and access logs record those).
+import os
+import tempfile
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi.responses import FileResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.background import BackgroundTask
+
+from app.crypto import DEFAULT_VAULT, current_vault
+from app.db.database import get_db
+from app.models.schemas import SnapshotExportRequest, SnapshotKeyResponse
+from app.services.snapshot import write_snapshot
+from app.snapshot.format import SnapshotError, decode_key, generate_key
+
+router = APIRouter(prefix="/snapshot", tags=["snapshot"])
+
+
+@router.post("/key", response_model=SnapshotKeyResponse)
+def new_key(response: Response):
+    """A fresh random snapshot key for clients that do not generate one themselves. Not kept here."""
+    response.headers["Cache-Control"] = "no-store"
+    return SnapshotKeyResponse(key=generate_key())
+
+
+@router.post("/export")
+async def export(req: SnapshotExportRequest, db: AsyncSession = Depends(get_db)):
+    """
+    Download a .kps snapshot of all (or type/category filtered) credentials, encrypted under the
+    caller's key. Use a new key per export and store it separately from the file.
+    """
+    try:
+        key = decode_key(req.key)
+    except SnapshotError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    fd, path = tempfile.mkstemp(suffix=".kps")
+    try:
+        with os.fdopen(fd, "w+b") as f:
+            count = await write_snapshot(db, f, key, type_filter=req.type, category=req.category)
+    except BaseException:
+        os.unlink(path)
+        raise
+    vault = current_vault.get()
+    prefix = "keypilot" if vault == DEFAULT_VAULT else vault
+    return FileResponse(
+        path,
+        media_type="application/octet-stream",
+        filename=f"{prefix}_snapshot_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.kps",
+        headers={"X-KeyPilot-Snapshot-Entries": str(count), "Cache-Control": "no-store"},
+        background=BackgroundTask(os.unlink, path),
+    )
@@ -0,0 +1,17 @@
+# Server-Sent Events helpers (text/event-stream)
+import json
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",  # nginx: do not buffer the stream
+}
+
+
+def sse_event(event: str, data: dict, event_id: int | None = None) -> str:
+    """Format one SSE message; data is sent as a single JSON line."""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, default=str)}")
+    return "\n".join(lines) + "\n\n"
@@ -9,7 +9,10 @@ from fastapi import APIRouter, HTTPException, UploadFile
 from fastapi.responses import FileResponse
 
 from app.config import Settings
-from app.models.schemas import GeneratePasswordResponse
+from app.crypto import DEFAULT_VAULT, current_vault, get_container
+from app.db import database
+from app.models.schemas import GeneratePasswordResponse, GenerateSSHKeyResponse
+from app.services.sshkeys import get_key_pool, validate_key_spec
 
 router = APIRouter(prefix="/utils", tags=["utils"])
 
@@ -20,6 +23,14 @@ def generate_password(length: int = 24):
     return GeneratePasswordResponse(password=secrets.token_urlsafe(length))
 
 
+@router.get("/generate-ssh-key", response_model=GenerateSSHKeyResponse)
+async def generate_ssh_key(algorithm: str = "ed25519", bits: int | None = None):
+    """Generate an SSH key pair (OpenSSH format) without storing it, e.g. to fill the create form."""
+    size = validate_key_spec(algorithm, bits)
+    private_key, public_key = await get_key_pool().take(algorithm, size)
+    return GenerateSSHKeyResponse(private_key=private_key, public_key=public_key)
+
+
 def _sqlite_db_path() -> Path | None:
     """Path to SQLite file (from KEYPILOT_DATA_DIR / config), or None if not SQLite."""
     url = Settings().database_url
@@ -51,27 +62,34 @@ def app_info():
     return {"data_dir": None, "db_path": None, "database": "other"}
 
 
+def _vault_backup_name(vault: str) -> str:
+    prefix = "keypilot" if vault == DEFAULT_VAULT else vault
+    return f"{prefix}_backup_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.db"
+
+
 @router.get("/backup")
-def download_backup():
-    """Download DB as file (SQLite only)."""
-    path = _sqlite_db_path()
-    if not path or not path.exists():
+async def download_backup():
+    """Download the selected vault's DB as file (SQLite only)."""
+    vault = current_vault.get()
+    path = _sqlite_db_path() if vault == DEFAULT_VAULT else Path((await database.get_engine(vault)).url.database or "")
+    if not path or not path.name or not path.exists():
         raise HTTPException(status_code=404, detail="Backup only available with local SQLite DB.")
-    date_str = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
     return FileResponse(
         path,
         media_type="application/octet-stream",
-        filename=f"keypilot_backup_{date_str}.db",
+        filename=_vault_backup_name(vault),
     )
 
 
 @router.post("/restore")
 async def restore_backup(file: UploadFile):
     """
-    Replace current DB with uploaded backup (.db). SQLite only.
-    Restart the backend after restore for the new DB to take effect.
+    Replace the selected vault's DB with uploaded backup (.db). SQLite only.
+    Default vault: restart the backend after restore for the new DB to take effect. Other vaults are
+    sealed and their DB is reopened on the next request (unseal with the backup's master key).
     """
-    path = _sqlite_db_path()
+    vault = current_vault.get()
+    path = _sqlite_db_path() if vault == DEFAULT_VAULT else database.vault_db_path(vault)
     if not path:
         raise HTTPException(status_code=404, detail="Restore only available with local SQLite DB.")
     # Always use absolute path so we write to the correct location (CWD-independent)
@@ -86,6 +104,12 @@ async def restore_backup(file: UploadFile):
         with tempfile.NamedTemporaryFile(delete=False, dir=str(path.parent), suffix=".db") as tmp:
             tmp.write(content)
             tmp_path = tmp.name
+        if vault != DEFAULT_VAULT:
+            # The backup may use another master key; the open engine must not keep the replaced file
+            container = get_container(vault)
+            if not container.is_sealed:
+                container.seal()
+            await database.close_vault(vault)
         os.replace(tmp_path, str(path))
     except OSError as e:
         errmsg = str(e) if e.strerror else repr(e)
@@ -93,6 +117,8 @@ async def restore_backup(file: UploadFile):
             status_code=500,
             detail=f"Could not write to {path}. {errmsg} Stop the backend, then use: ./scripts/restore.sh <yourfile.db>",
         ) from e
+    if vault != DEFAULT_VAULT:
+        return {"message": f"Backup restored to vault '{vault}' ({path}). Unseal it with the backup's master key."}
     return {
         "message": f"Backup restored to {path}. Restart the backend (e.g. docker compose restart backend) so the new DB is used.",
     }
@@ -1,13 +1,15 @@
-# Vault: Unseal / Seal / Status / Reset
+# Vault: Unseal / Seal / Status / Reset (of the vault selected by header or /v/<vault>/ prefix), list vaults
 import base64
+
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy import select, delete
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.crypto import get_container
-from app.db.database import get_db
-from app.db.models import VaultMeta, Credential
+from app.crypto import get_container, unsealed_vaults
+from app.db.database import get_db, get_db_or_create, list_vaults
+from app.db.models import Attachment, AttachmentChunk, Credential, CredentialFingerprint, VaultMeta
 from app.models.schemas import UnsealRequest, UnsealResponse, VaultStatusResponse
+from app.services.events import publish
 
 router = APIRouter(prefix="/vault", tags=["vault"])
 
@@ -21,11 +23,18 @@ async def _get_meta(db_session: AsyncSession, key: str) -> str | None:
 @router.get("/status", response_model=VaultStatusResponse)
 def vault_status():
     container = get_container()
-    return VaultStatusResponse(sealed=container.is_sealed)
+    return VaultStatusResponse(sealed=container.is_sealed, vault=container.vault)
+
+
+@router.get("/list", response_model=list[VaultStatusResponse])
+def vault_list():
+    """All vaults on this backend; a new vault is created by its first unseal."""
+    unsealed = set(unsealed_vaults())
+    return [VaultStatusResponse(sealed=name not in unsealed, vault=name) for name in list_vaults()]
 
 
 @router.post("/unseal", response_model=UnsealResponse)
-async def unseal(req: UnsealRequest, db: AsyncSession = Depends(get_db)):
+async def unseal(req: UnsealRequest, db: AsyncSession = Depends(get_db_or_create)):
     container = get_container()
     if not container.is_sealed:
         return UnsealResponse()
@@ -35,23 +44,25 @@ async def unseal(req: UnsealRequest, db: AsyncSession = Depends(get_db)):
     salt = base64.b64decode(salt_b64) if salt_b64 else None
 
     try:
-        new_salt = container.unseal(req.master_key, salt, key_check_b64)
+        # Key derivation is deliberately slow: runs in a thread (in the key agent's, with several workers)
+        new_salt = await container.unseal_async(req.master_key, salt, key_check_b64)
     except ValueError as e:
         raise HTTPException(status_code=403, detail=str(e))
 
     if salt is None:
         meta_salt = VaultMeta(key="kdf_salt", value=base64.b64encode(new_salt).decode("ascii"))
         db.add(meta_salt)
-        check_cipher = container.encrypt(container.KEY_CHECK_PLAINTEXT)
+        check_cipher = (await container.encrypt_many_async([container.KEY_CHECK_PLAINTEXT]))[0]
         meta_check = VaultMeta(key="key_check", value=check_cipher)
         db.add(meta_check)
         await db.commit()
     elif not key_check_b64:
-        check_cipher = container.encrypt(container.KEY_CHECK_PLAINTEXT)
+        check_cipher = (await container.encrypt_many_async([container.KEY_CHECK_PLAINTEXT]))[0]
         meta_check = VaultMeta(key="key_check", value=check_cipher)
         db.add(meta_check)
         await db.commit()
 
+    publish("vault.unsealed")
     return UnsealResponse()
 
 
@@ -59,7 +70,7 @@ async def unseal(req: UnsealRequest, db: AsyncSession = Depends(get_db)):
 def seal():
     container = get_container()
     container.seal()
-    return VaultStatusResponse(sealed=True)
+    return VaultStatusResponse(sealed=True, vault=container.vault)
 
 
 @router.post("/reset")
@@ -71,6 +82,10 @@ async def reset(db: AsyncSession = Depends(get_db)):
     container = get_container()
     container.seal()
     await db.execute(delete(Credential))
+    await db.execute(delete(CredentialFingerprint))
+    await db.execute(delete(AttachmentChunk))
+    await db.execute(delete(Attachment))
     await db.execute(delete(VaultMeta))
     await db.commit()
+    publish("vault.reset")
     return {"status": "reset", "message": "Vault reset. Choose a new master key on next open."}
@@ -23,6 +23,74 @@ class Settings(BaseSettings):
     # Ollama (local LLM)
     ollama_base_url: str = "http://localhost:11434"
     ollama_model: str = "llama3.2"  # or mistral, codellama, etc.
+    # Shared client: parallel generations, waiting requests (beyond -> 429), timeouts in seconds
+    ollama_max_concurrency: int = 2
+    ollama_max_queue: int = 16
+    ollama_connect_timeout: float = 5.0
+    ollama_read_timeout: float = 60.0
+    ollama_queue_timeout: float = 30.0
+    # Model stays loaded this long after a request (Ollama duration, e.g. "30m"; "-1" = forever)
+    ollama_keep_alive: str = "30m"
+    # Earlier user messages sent along for follow-ups (assistant replies never); load model + system prompt at startup
+    ollama_context_messages: int = 6
+    ollama_warmup: bool = True
+    # Semantic search (GET /credentials/semantic-search, chat name resolution): embedding model, opt-in
+    # (empty = off; when set, every unseal sends all decrypted credential names to Ollama), texts per
+    # /api/embed request, similarity from which the chat suggests the best match for a name
+    ollama_embed_model: str = ""
+    embed_batch_size: int = 64
+    semantic_min_score: float = 0.6
+
+    # Chat fast path: rule-based intents for common commands; LLM only below this confidence
+    chat_fast_path: bool = True
+    chat_fast_path_min_confidence: float = 0.8
+    # Cache of parsed LLM intents for repeated messages (entries, seconds); 0 disables
+    intent_cache_size: int = 256
+    intent_cache_ttl: float = 600.0
+
+    # Bulk rotation: credentials per UPDATE/commit; scheduler check interval in seconds (0 = off)
+    rotation_chunk_size: int = 500
+    rotation_scheduler_interval: float = 60.0
+    # Background jobs running at the same time (others wait queued)
+    job_workers: int = 2
+
+    # SSH key generation: pre-generated RSA keys kept per size (2048, 4096), generator processes
+    ssh_key_pool_size: int = 2
+    ssh_keygen_workers: int = 2
+
+    # Multiple vaults (header X-KeyPilot-Vault or path prefix /v/<vault>/): each has its own DB file
+    # under <data dir>/vaults/. Unsealed vaults kept in memory (LRU beyond that is sealed), minutes
+    # without requests before a vault is sealed (0 = never), open vault databases (LRU closed beyond)
+    vault_max_unsealed: int = 16
+    vault_idle_seal_minutes: float = 0
+    vault_max_open_databases: int = 32
+
+    # Change feed (GET /events): events kept per vault for resume (Last-Event-ID), keep-alive comment interval
+    event_buffer_size: int = 1000
+    event_keepalive_seconds: float = 15.0
+
+    # Password health scan (GET /credentials/health): secrets decrypted per batch, batches in parallel,
+    # score below which a secret is weak (0..4), age in days after which an entry is stale, list of common
+    # passwords (one per line, e.g. SecLists' 10k most common; unset = only a short built-in list)
+    health_scan_batch_size: int = 250
+    health_scan_workers: int = 4
+    health_min_score: int = 3
+    health_stale_days: int = 365
+    health_common_passwords_file: str | None = None
+
+    # Attachments: plaintext bytes per encrypted chunk (memory per upload/download is about one chunk), max size
+    attachment_chunk_size: int = 1024 * 1024
+    attachment_max_size_mb: int = 100
+
+    # SQL instrumentation (GET /admin/sql-stats): off by default. Statements slower than sql_slow_ms are
+    # logged with their query plan; the last sql_stats_window executions are kept for the top-N list
+    sql_stats: bool = False
+    sql_slow_ms: float = 100.0
+    sql_stats_window: int = 10000
+
+    # Set by the supervisor (python -m app.supervisor) for its uvicorn workers: Unix socket of the
+    # key agent that holds the unsealed keys for all workers. Unset = keys in this process.
+    key_agent_socket: str | None = None
 
     @model_validator(mode="after")
     def set_database_url_default(self):
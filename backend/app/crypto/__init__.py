@@ -1,4 +1,30 @@
-from .container import CryptoContainer, get_container
+from .container import (
+    DEFAULT_VAULT,
+    VAULT_NAME_RE,
+    CryptoContainer,
+    VaultSealedError,
+    add_seal_listener,
+    current_vault,
+    get_container,
+    mark_used,
+    seal_idle,
+    unsealed_vaults,
+    use_vault,
+)
 from .kdf import derive_key, generate_salt
 
-__all__ = ["CryptoContainer", "get_container", "derive_key", "generate_salt"]
+__all__ = [
+    "DEFAULT_VAULT",
+    "VAULT_NAME_RE",
+    "CryptoContainer",
+    "VaultSealedError",
+    "add_seal_listener",
+    "current_vault",
+    "get_container",
+    "mark_used",
+    "seal_idle",
+    "unsealed_vaults",
+    "use_vault",
+    "derive_key",
+    "generate_salt",
+]
@@ -0,0 +1,423 @@
+# Key agent: one process (the supervisor) holds the unsealed keys; uvicorn workers encrypt/decrypt
+# through it over a Unix socket. Protocol: one JSON object per line, request -> one response line.
+# Subscribers ({"op": "subscribe"}) instead receive {"event": "sealed" | "unsealed", "vault": ...} lines
+# and the change feed: {"event": "change", "seq", "vault", "type", "data"} (numbered here, see events.py).
+import asyncio
+import base64
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import datetime
+from typing import Any, Optional
+
+from app.config import Settings
+
+from .container import (
+    CryptoContainer,
+    VaultSealedError,
+    _containers,
+    _notify_sealed,
+    add_seal_listener,
+    get_container,
+    mark_used,
+    unsealed_vaults,
+)
+
+logger = logging.getLogger(__name__)
+settings = Settings()
+
+SEALED = "sealed"
+WRONG_KEY = "wrong_key"
+# Longest protocol line on either side (asyncio's default of 64 KiB is hit by ~1000 ciphertexts), and values
+# per encrypt/decrypt/fingerprint call: RemoteCryptoContainer splits larger batches, lines stay a few MB
+LINE_LIMIT = 64 * 1024 * 1024
+BATCH_SIZE = 500
+
+
+class KeyAgentServer:
+    """Runs in the supervisor; uses the normal in-process containers (LRU, idle seal) for every vault."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.started_at = datetime.utcnow()
+        self.seq_start = self._seq = int(time.time() * 1000) * 1000
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._subscribers: set[asyncio.StreamWriter] = set()
+
+    async def start(self) -> None:
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        old_umask = os.umask(0o177)  # socket is created 0600: only this user can talk to the agent
+        try:
+            self._server = await asyncio.start_unix_server(self._handle, path=self.path, limit=LINE_LIMIT)
+        finally:
+            os.umask(old_umask)
+        os.chmod(self.path, 0o600)
+        add_seal_listener(self._on_seal)
+
+    async def stop(self) -> None:
+        for container in list(_containers.values()):
+            if not container.is_sealed:
+                container.seal()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        for writer in list(self._subscribers):
+            writer.close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def _on_seal(self, container: CryptoContainer) -> None:
+        self._broadcast({"event": "sealed", "vault": container.vault})
+        self._publish(container.vault, "vault.sealed", {})
+
+    def _publish(self, vault: str, type: str, data: dict) -> int:
+        self._seq += 1
+        self._broadcast({"event": "change", "seq": self._seq, "vault": vault, "type": type, "data": data})
+        return self._seq
+
+    def _broadcast(self, message: dict) -> None:
+        line = (json.dumps(message) + "\n").encode("utf-8")
+        for writer in list(self._subscribers):
+            try:
+                writer.write(line)
+            except Exception:
+                self._subscribers.discard(writer)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:  # over LINE_LIMIT: the stream dropped the line, answer instead of disconnecting
+                    response = {"error": f"Request longer than {LINE_LIMIT} bytes"}
+                else:
+                    if not line:
+                        break
+                    request = json.loads(line)
+                    if request.get("op") == "subscribe":
+                        self._subscribers.add(writer)
+                        continue
+                    try:
+                        response = await self.dispatch(request)
+                    except Exception as e:
+                        logger.exception("Key agent request %s failed", request.get("op"))
+                        response = {"error": f"{type(e).__name__}: {e}"}
+                writer.write((json.dumps(response) + "\n").encode("utf-8"))
+                await writer.drain()
+        except (ConnectionError, json.JSONDecodeError):
+            pass
+        finally:
+            self._subscribers.discard(writer)
+            writer.close()
+
+    async def dispatch(self, request: dict) -> dict:
+        op = request.get("op")
+        if op == "info":
+            return {"started_at": self.started_at.isoformat(), "seq_start": self.seq_start}
+        if op == "unsealed":
+            return {"vaults": unsealed_vaults()}
+        vault = request["vault"]
+        if op == "publish":
+            return {"seq": self._publish(vault, request["type"], request.get("data") or {})}
+        container = get_container(vault)
+        if op == "status":
+            return {"sealed": container.is_sealed}
+        if op == "unseal":
+            salt = base64.b64decode(request["salt"]) if request.get("salt") else None
+            try:
+                # Key derivation in a thread: requests of other connections (workers) go on meanwhile
+                new_salt = await container.unseal_async(request["master_key"], salt, request.get("key_check"))
+            except ValueError:
+                return {"error": WRONG_KEY}
+            self._broadcast({"event": "unsealed", "vault": vault})
+            return {"salt": base64.b64encode(new_salt).decode("ascii")}
+        if op == "seal":
+            container.seal()
+            return {}
+        if container.is_sealed:
+            return {"error": SEALED}
+        mark_used(vault)
+        if op == "encrypt":
+            return {"values": container.encrypt_many(request["values"])}
+        if op == "decrypt":
+            return {"values": container.decrypt_many(request["values"])}
+        if op == "fingerprint":
+            return {"values": container.fingerprint_many(request["values"])}
+        return {"error": f"Unknown op '{op}'"}
+
+
+class KeyAgentClient:
+    """
+    One persistent connection per worker process for each side: call() blocks (sync endpoints in the
+    threadpool, startup), acall() is for the event loop, so a slow agent (e.g. key derivation on
+    unseal) never stalls other requests. Batch APIs keep list requests at one call.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()  # sync endpoints run in the threadpool
+        self._sock: Optional[socket.socket] = None
+        self._file = None
+        self._alock: Optional[asyncio.Lock] = None
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+
+    def _connect(self) -> None:
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.connect(self.path)
+        self._file = self._sock.makefile("rb")
+
+    def _close(self) -> None:
+        if self._sock is not None:
+            self._sock.close()
+        self._sock = self._file = None
+
+    def call(self, op: str, **fields: Any) -> dict:
+        data = (json.dumps({"op": op, **fields}) + "\n").encode("utf-8")
+        with self._lock:
+            for attempt in (1, 2):  # one reconnect, e.g. after the agent closed an idle connection
+                try:
+                    if self._sock is None:
+                        self._connect()
+                    self._sock.sendall(data)
+                    line = self._file.readline()
+                    if not line:
+                        raise ConnectionError("Key agent closed the connection")
+                    break
+                except OSError:
+                    self._close()
+                    if attempt == 2:
+                        raise RuntimeError("Key agent not reachable. Is the supervisor running?")
+        return self._result(line)
+
+    async def acall(self, op: str, **fields: Any) -> dict:
+        data = (json.dumps({"op": op, **fields}) + "\n").encode("utf-8")
+        if self._alock is None:
+            self._alock = asyncio.Lock()
+        async with self._alock:  # FIFO: calls (e.g. published events) reach the agent in order
+            for attempt in (1, 2):
+                try:
+                    if self._writer is None:
+                        self._reader, self._writer = await asyncio.open_unix_connection(self.path, limit=LINE_LIMIT)
+                    self._writer.write(data)
+                    await self._writer.drain()
+                    line = await self._reader.readline()
+                    if not line:
+                        raise ConnectionError("Key agent closed the connection")
+                    break
+                except OSError:
+                    if self._writer is not None:
+                        self._writer.close()
+                    self._reader = self._writer = None
+                    if attempt == 2:
+                        raise RuntimeError("Key agent not reachable. Is the supervisor running?")
+        return self._result(line)
+
+    @staticmethod
+    def _result(line: bytes) -> dict:
+        response = json.loads(line)
+        error = response.get("error")
+        if error == SEALED:
+            raise VaultSealedError("Vault is sealed. Unseal with master key first.")
+        if error == WRONG_KEY:
+            raise ValueError("Wrong master key")
+        if error:
+            raise RuntimeError(f"Key agent: {error}")
+        return response
+
+    def started_at(self) -> datetime:
+        return datetime.fromisoformat(self.call("info")["started_at"])
+
+
+class RemoteCryptoContainer(CryptoContainer):
+    """Same interface as CryptoContainer; state and key live in the key agent, shared by all workers."""
+
+    def __init__(self, vault: str) -> None:
+        super().__init__(vault)
+        self._client = get_agent_client()
+
+    @property
+    def is_sealed(self) -> bool:
+        # Kept current by the agent subscription. While that is down the state is unknown: fail closed
+        # (sealed, 503) until it reconnects, instead of a blocking agent call on the event loop.
+        watcher = get_seal_watcher()
+        sealed = watcher.sealed(self.vault) if watcher is not None else None
+        return True if sealed is None else sealed
+
+    def unseal(self, master_key: str, salt: Optional[bytes] = None, key_check_b64: Optional[str] = None) -> bytes:
+        r = self._client.call(
+            "unseal",
+            vault=self.vault,
+            master_key=master_key,
+            salt=base64.b64encode(salt).decode("ascii") if salt else None,
+            key_check=key_check_b64,
+        )
+        watcher = get_seal_watcher()
+        if watcher is not None:
+            watcher.set_sealed(self.vault, False)  # before this worker's own event comes back
+        return base64.b64decode(r["salt"])
+
+    async def unseal_async(
+        self, master_key: str, salt: Optional[bytes] = None, key_check_b64: Optional[str] = None
+    ) -> bytes:
+        # The agent answers only after the key derivation: use the blocking connection in a thread, so
+        # the shared async connection (encrypt/decrypt of other requests) does not wait behind it
+        return await asyncio.to_thread(self.unseal, master_key, salt, key_check_b64)
+
+    def seal(self) -> None:
+        # Listeners run when the agent's "sealed" event arrives (in every worker, this one included)
+        self._client.call("seal", vault=self.vault)
+        watcher = get_seal_watcher()
+        if watcher is not None:
+            watcher.set_sealed(self.vault, True)
+
+    def encrypt(self, plaintext: str) -> str:
+        return self.encrypt_many([plaintext])[0]
+
+    def decrypt(self, ciphertext_b64: str) -> str:
+        value = self.decrypt_many([ciphertext_b64])[0]
+        if value is None:
+            raise ValueError("Decryption failed")
+        return value
+
+    def _batched(self, op: str, values: list) -> list:
+        result = []
+        for start in range(0, len(values), BATCH_SIZE):
+            result += self._client.call(op, vault=self.vault, values=values[start:start + BATCH_SIZE])["values"]
+        return result
+
+    async def _abatched(self, op: str, values: list) -> list:
+        result = []
+        for start in range(0, len(values), BATCH_SIZE):
+            result += (await self._client.acall(op, vault=self.vault, values=values[start:start + BATCH_SIZE]))["values"]
+        return result
+
+    def encrypt_many(self, plaintexts: list[str]) -> list[str]:
+        return self._batched("encrypt", plaintexts)
+
+    def decrypt_many(self, ciphertexts: list[str]) -> list[Optional[str]]:
+        return self._batched("decrypt", ciphertexts)
+
+    def fingerprint_many(self, plaintexts: list[str]) -> list[str]:
+        return self._batched("fingerprint", plaintexts)
+
+    async def encrypt_many_async(self, plaintexts: list[str]) -> list[str]:
+        return await self._abatched("encrypt", plaintexts)
+
+    async def decrypt_many_async(self, ciphertexts: list[str]) -> list[Optional[str]]:
+        return await self._abatched("decrypt", ciphertexts)
+
+    async def fingerprint_many_async(self, plaintexts: list[str]) -> list[str]:
+        return await self._abatched("fingerprint", plaintexts)
+
+
+class SealWatcher:
+    """
+    Worker side: subscribes to the agent, runs the local seal listeners (jobs, caches) on seal and
+    feeds change events into the local event bus. Also keeps the set of unsealed vaults (snapshot
+    after subscribing, then "sealed"/"unsealed" events), so is_sealed needs no agent call.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._task: Optional[asyncio.Task] = None
+        self._unsealed: Optional[set[str]] = None  # None while not subscribed: state unknown
+        self._last_unsealed: set[str] = set()  # as of the last lost subscription, see _loop
+        self._subscribed = asyncio.Event()
+
+    def sealed(self, vault: str) -> Optional[bool]:
+        """Cached seal state; None if the subscription is down (ask the agent)."""
+        unsealed = self._unsealed
+        return None if unsealed is None else vault not in unsealed
+
+    def unsealed_vaults(self) -> Optional[list[str]]:
+        unsealed = self._unsealed
+        return None if unsealed is None else sorted(unsealed)
+
+    def set_sealed(self, vault: str, sealed: bool) -> None:
+        unsealed = self._unsealed
+        if unsealed is not None:
+            if sealed:
+                unsealed.discard(vault)
+            else:
+                unsealed.add(vault)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def wait_subscribed(self, timeout: float) -> bool:
+        """Wait until the seal state is known (vaults count as sealed before); False on timeout."""
+        try:
+            await asyncio.wait_for(self._subscribed.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                reader, writer = await asyncio.open_unix_connection(self.path, limit=LINE_LIMIT)
+                writer.write(b'{"op": "subscribe"}\n')
+                await writer.drain()
+                # Subscribed first: every change after this snapshot arrives below, in order
+                self._unsealed = set((await get_agent_client().acall("unsealed"))["vaults"])
+                self._subscribed.set()
+                # Sealed while the subscription was down (or the agent restarted): the event was missed
+                for vault in self._last_unsealed - self._unsealed:
+                    _notify_sealed(_containers.get(vault) or RemoteCryptoContainer(vault))
+                while line := await reader.readline():
+                    event = json.loads(line)
+                    if event.get("event") == "sealed":
+                        vault = event["vault"]
+                        self.set_sealed(vault, True)
+                        _notify_sealed(_containers.get(vault) or RemoteCryptoContainer(vault))
+                    elif event.get("event") == "unsealed":
+                        self.set_sealed(event["vault"], False)
+                    elif event.get("event") == "change":
+                        from app.services.events import Event, get_event_bus
+                        get_event_bus().deliver(Event(event["seq"], event["vault"], event["type"], event["data"]))
+                writer.close()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Key agent subscription lost (%s), reconnecting", e)
+            finally:
+                if self._unsealed is not None:
+                    self._last_unsealed = self._unsealed
+                self._unsealed = None
+                self._subscribed.clear()
+            await asyncio.sleep(1.0)
+
+
+# Singletons for a worker process
+_client: Optional[KeyAgentClient] = None
+_watcher: Optional[SealWatcher] = None
+
+
+def get_agent_client() -> KeyAgentClient:
+    global _client
+    if _client is None:
+        _client = KeyAgentClient(settings.key_agent_socket or "")
+    return _client
+
+
+def get_seal_watcher() -> Optional[SealWatcher]:
+    """None unless this process is a supervisor worker."""
+    global _watcher
+    if _watcher is None and settings.key_agent_socket:
+        _watcher = SealWatcher(settings.key_agent_socket)
+    return _watcher
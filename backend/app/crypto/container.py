@@ -1,14 +1,48 @@
 # Crypto container: AES-256-GCM, seal/unseal with master key.
 # Master key is never stored on disk, only in memory after unseal.
+# One container per vault; the vault of the current request is in current_vault.
+import asyncio
+import hashlib
+import hmac
+import logging
+import re
 import secrets
 import base64
-from typing import Optional
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterator, Optional
 
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from cryptography.hazmat.backends import default_backend
 
+from app.config import Settings
+
 from .kdf import derive_key, generate_salt
 
+logger = logging.getLogger(__name__)
+settings = Settings()
+
+DEFAULT_VAULT = "default"
+VAULT_NAME_RE = re.compile(r"^[a-z0-9][a-z0-9_-]{0,62}$")
+
+# Vault addressed by the current request (set by the vault middleware) or background task
+current_vault: ContextVar[str] = ContextVar("keypilot_vault", default=DEFAULT_VAULT)
+
+# Called with the container after every seal() (caches holding vault-derived data drop it here).
+_seal_listeners: list[Callable[["CryptoContainer"], None]] = []
+
+
+class VaultSealedError(RuntimeError):
+    """Raised by encrypt/decrypt/fingerprint while the vault is sealed (also when sealed mid-operation)."""
+
+
+def add_seal_listener(listener: Callable[["CryptoContainer"], None]) -> None:
+    """Register a callback that runs whenever a container is sealed."""
+    if listener not in _seal_listeners:
+        _seal_listeners.append(listener)
+
 
 class CryptoContainer:
     """
@@ -17,9 +51,12 @@ class CryptoContainer:
     - Seal: discard data key; container unusable until next unseal.
     """
 
-    def __init__(self) -> None:
+    def __init__(self, vault: str = DEFAULT_VAULT) -> None:
+        self.vault = vault
         self._aes: Optional[AESGCM] = None  # set only when unsealed
+        self._fingerprint_key: Optional[bytes] = None  # HMAC key for fingerprint_many, derived from the data key
         self._sealed: bool = True
+        self.last_used = time.monotonic()  # last request on this vault (idle auto-seal, LRU)
 
     @property
     def is_sealed(self) -> bool:
@@ -41,30 +78,45 @@ class CryptoContainer:
         """
         if salt is None:
             salt = generate_salt()
-        key_material = master_key.encode("utf-8") if isinstance(master_key, str) else master_key
-        key = derive_key(key_material, salt, length=32)
-        self._aes = AESGCM(key)
-        self._sealed = False
-        if key_check_b64:
-            try:
-                dec = self.decrypt(key_check_b64)
-                if dec != self.KEY_CHECK_PLAINTEXT:
-                    self.seal()
-                    raise ValueError("Wrong master key")
-            except Exception:
-                self.seal()
-                raise ValueError("Wrong master key")
+        self._use_key(_derive(master_key, salt), key_check_b64)
         return salt
 
+    async def unseal_async(
+        self,
+        master_key: str,
+        salt: Optional[bytes] = None,
+        key_check_b64: Optional[str] = None,
+    ) -> bytes:
+        """unseal() for the event loop: only the (deliberately slow) key derivation runs in a thread."""
+        if salt is None:
+            salt = generate_salt()
+        self._use_key(await asyncio.to_thread(_derive, master_key, salt), key_check_b64)
+        return salt
+
+    def _use_key(self, key: bytes, key_check_b64: Optional[str]) -> None:
+        """Second half of unseal: verify the derived key against the stored check, then install it."""
+        aes = AESGCM(key)
+        if key_check_b64 and not _decrypts_key_check(aes, key_check_b64):
+            # Nothing was installed: the container keeps its state and no seal listeners run
+            raise ValueError("Wrong master key")
+        self._aes = aes
+        self._fingerprint_key = hmac.new(key, b"keypilot-fingerprint", hashlib.sha256).digest()
+        self._sealed = False
+        self.last_used = time.monotonic()
+        _containers[self.vault] = self  # may have been a transient container (see get_container)
+        _enforce_unsealed_limit(keep=self)
+
     def seal(self) -> None:
         """Discard key; no read/write possible afterwards."""
         self._aes = None
+        self._fingerprint_key = None
         self._sealed = True
+        _notify_sealed(self)
 
     def encrypt(self, plaintext: str) -> str:
         """Encrypt a string; returns base64(nonce + ciphertext)."""
         if self._sealed or self._aes is None:
-            raise RuntimeError("Vault is sealed. Unseal with master key first.")
+            raise VaultSealedError("Vault is sealed. Unseal with master key first.")
         nonce = secrets.token_bytes(12)
         ct = self._aes.encrypt(nonce, plaintext.encode("utf-8"), None)
         return base64.b64encode(nonce + ct).decode("ascii")
@@ -72,19 +124,137 @@ class CryptoContainer:
     def decrypt(self, ciphertext_b64: str) -> str:
         """Decrypt a string produced by encrypt()."""
         if self._sealed or self._aes is None:
-            raise RuntimeError("Vault is sealed. Unseal with master key first.")
+            raise VaultSealedError("Vault is sealed. Unseal with master key first.")
         raw = base64.b64decode(ciphertext_b64.encode("ascii"))
         nonce, ct = raw[:12], raw[12:]
         pt = self._aes.decrypt(nonce, ct, None)
         return pt.decode("utf-8")
 
+    def encrypt_many(self, plaintexts: list[str]) -> list[str]:
+        """Batch encrypt (one round trip to the key agent in multi-worker mode)."""
+        return [self.encrypt(p) for p in plaintexts]
+
+    def decrypt_many(self, ciphertexts: list[str]) -> list[Optional[str]]:
+        """Batch decrypt; None for values that do not decrypt (e.g. legacy plaintext). Raises if sealed."""
+        if self._sealed or self._aes is None:
+            raise VaultSealedError("Vault is sealed. Unseal with master key first.")
+        result: list[Optional[str]] = []
+        for value in ciphertexts:
+            try:
+                result.append(self.decrypt(value))
+            except Exception:
+                result.append(None)
+        return result
+
+    def fingerprint_many(self, plaintexts: list[str]) -> list[str]:
+        """Keyed hash (HMAC-SHA256, hex) per value: equal secrets compare equal, but cannot be guessed offline."""
+        if self._sealed or self._fingerprint_key is None:
+            raise VaultSealedError("Vault is sealed. Unseal with master key first.")
+        return [hmac.new(self._fingerprint_key, p.encode("utf-8"), hashlib.sha256).hexdigest() for p in plaintexts]
+
+    # For async code. In-process these are the sync batch calls (AES only, no I/O); the key agent's
+    # RemoteCryptoContainer overrides them, so its socket round trips do not block the event loop.
+    async def encrypt_many_async(self, plaintexts: list[str]) -> list[str]:
+        return self.encrypt_many(plaintexts)
+
+    async def decrypt_many_async(self, ciphertexts: list[str]) -> list[Optional[str]]:
+        return self.decrypt_many(ciphertexts)
+
+    async def fingerprint_many_async(self, plaintexts: list[str]) -> list[str]:
+        return self.fingerprint_many(plaintexts)
+
+
+def _decrypts_key_check(aes: AESGCM, key_check_b64: str) -> bool:
+    try:
+        raw = base64.b64decode(key_check_b64.encode("ascii"))
+        return aes.decrypt(raw[:12], raw[12:], None).decode("utf-8") == CryptoContainer.KEY_CHECK_PLAINTEXT
+    except Exception:
+        return False
+
+
+def _derive(master_key: str, salt: bytes) -> bytes:
+    key_material = master_key.encode("utf-8") if isinstance(master_key, str) else master_key
+    return derive_key(key_material, salt, length=32)
+
+
+def _notify_sealed(container: CryptoContainer) -> None:
+    if container.vault != DEFAULT_VAULT and _containers.get(container.vault) is container:
+        del _containers[container.vault]  # sealed containers hold nothing; recreated on next access
+    for listener in list(_seal_listeners):
+        try:
+            listener(container)
+        except Exception:
+            logger.exception("Seal listener %r failed", listener)
+
+
+# Containers by vault, least recently used first. Only unsealed ones (and default) stay registered.
+_containers: "OrderedDict[str, CryptoContainer]" = OrderedDict()
+
+
+def get_container(vault: Optional[str] = None) -> CryptoContainer:
+    """
+    Container of the given vault, default: the vault of the current request.
+    A sealed vault other than default gets a transient container that registers itself on unseal,
+    so requests naming arbitrary (or unknown) vaults do not grow the registry.
+    """
+    name = vault or current_vault.get()
+    container = _containers.get(name)
+    if container is None:
+        if settings.key_agent_socket:
+            from .agent import RemoteCryptoContainer  # worker of the supervisor: key lives in the agent
+            container = RemoteCryptoContainer(name)
+        else:
+            container = CryptoContainer(name)
+        if name == DEFAULT_VAULT or not container.is_sealed:
+            _containers[name] = container
+    return container
+
+
+def mark_used(vault: str) -> None:
+    """Called per request: moves the vault to the end of the LRU and resets its idle timer."""
+    container = _containers.get(vault)
+    if container is not None:
+        container.last_used = time.monotonic()
+        _containers.move_to_end(vault)
+
+
+def unsealed_vaults() -> list[str]:
+    if settings.key_agent_socket:
+        from .agent import get_seal_watcher
+        # Same rule as RemoteCryptoContainer.is_sealed: unknown while the subscription is down = all sealed
+        watcher = get_seal_watcher()
+        cached = watcher.unsealed_vaults() if watcher is not None else None
+        return cached if cached is not None else []
+    return [name for name, c in _containers.items() if not c.is_sealed]
+
+
+@contextmanager
+def use_vault(vault: str) -> Iterator[None]:
+    """Run background work (scheduler, jobs) against a specific vault."""
+    token = current_vault.set(vault)
+    try:
+        yield
+    finally:
+        current_vault.reset(token)
+
 
-# Singleton for the app
-_container: Optional[CryptoContainer] = None
+def _enforce_unsealed_limit(keep: CryptoContainer) -> None:
+    """At most vault_max_unsealed keys in memory: seal the least recently used other vaults."""
+    limit = max(1, settings.vault_max_unsealed)
+    unsealed = [c for c in _containers.values() if not c.is_sealed and c is not keep]
+    unsealed.sort(key=lambda c: c.last_used)
+    while len(unsealed) + 1 > limit:
+        victim = unsealed.pop(0)
+        logger.info("Sealing vault %s (more than %d vaults unsealed)", victim.vault, limit)
+        victim.seal()
 
 
-def get_container() -> CryptoContainer:
-    global _container
-    if _container is None:
-        _container = CryptoContainer()
-    return _container
+def seal_idle(max_idle_seconds: float) -> list[str]:
+    """Seal every vault without requests for max_idle_seconds. Returns the sealed vault names."""
+    now = time.monotonic()
+    sealed = []
+    for container in list(_containers.values()):
+        if not container.is_sealed and now - container.last_used >= max_idle_seconds:
+            container.seal()
+            sealed.append(container.vault)
+    return sealed
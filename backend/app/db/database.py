@@ -1,12 +1,26 @@
 # DB: SQLite only – async Session
+# The default vault uses the configured DB; every other vault its own file under <data dir>/vaults/,
+# opened on first use and closed again when more than vault_max_open_databases are open.
+# SQL_STATS=true: engine events record statement timings (rolling window) and query counts per request.
+import asyncio
 import logging
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
 from pathlib import Path
+from typing import AsyncIterator, Awaitable, Callable, Optional
 
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+from fastapi import HTTPException
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import NullPool, StaticPool
 
 from app.config import Settings
+from app.crypto import DEFAULT_VAULT, current_vault
 
 logger = logging.getLogger(__name__)
 settings = Settings()
@@ -25,15 +39,120 @@ def _sqlite_url_with_absolute_path(url: str) -> str:
     return f"sqlite+aiosqlite:///{path.as_posix()}"
 
 
+@dataclass
+class RequestSQLStats:
+    """Statements run while handling one request (set by the SQL stats middleware)."""
+    queries: int = 0
+    total_ms: float = 0.0
+
+
+current_request_sql: ContextVar[Optional[RequestSQLStats]] = ContextVar("keypilot_request_sql", default=None)
+
+_EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+
+
+class SQLStats:
+    """
+    Last `window` statement executions (SQL text with placeholders, never parameters) and per-route
+    query counts. Only engines built while SQL_STATS is on get the event listeners.
+    """
+
+    def __init__(self, window: int, slow_ms: float) -> None:
+        self.slow_ms = slow_ms
+        self._executions: deque[tuple[str, float]] = deque(maxlen=max(1, window))
+        self._routes: dict[str, list[float]] = {}  # route -> [requests, queries, max queries, sql ms]
+
+    def attach(self, async_engine: AsyncEngine) -> None:
+        event.listen(async_engine.sync_engine, "before_cursor_execute", self._before)
+        event.listen(async_engine.sync_engine, "after_cursor_execute", self._after)
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        # Per execution context, not per connection: the StaticPool connection is shared by interleaved sessions
+        if context is not None:
+            context._keypilot_started = time.perf_counter()
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        started = getattr(context, "_keypilot_started", None)
+        if started is None:
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self._executions.append((statement, elapsed_ms))
+        request = current_request_sql.get()
+        if request is not None:
+            request.queries += 1
+            request.total_ms += elapsed_ms
+        if elapsed_ms >= self.slow_ms:
+            logger.warning("Slow SQL (%.1f ms): %s\n  plan: %s", elapsed_ms, statement, self._explain(conn, statement, parameters, executemany))
+
+    @staticmethod
+    def _explain(conn, statement: str, parameters, executemany: bool) -> str:
+        if executemany or not statement.lstrip().upper().startswith(_EXPLAINABLE):
+            return "-"
+        try:
+            # Raw DBAPI cursor: no engine events for the EXPLAIN itself
+            cursor = conn.connection.dbapi_connection.cursor()
+            try:
+                cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters or ())
+                return "; ".join(str(row[-1]) for row in cursor.fetchall()) or "-"
+            finally:
+                cursor.close()
+        except Exception as e:
+            return f"(EXPLAIN failed: {e})"
+
+    def record_request(self, route: str, stats: RequestSQLStats) -> None:
+        entry = self._routes.setdefault(route, [0, 0, 0, 0.0])
+        entry[0] += 1
+        entry[1] += stats.queries
+        entry[2] = max(entry[2], stats.queries)
+        entry[3] += stats.total_ms
+
+    def top_statements(self, limit: int) -> list[dict]:
+        """Statements in the window, slowest total time first."""
+        grouped: dict[str, list[float]] = {}
+        for statement, ms in list(self._executions):
+            entry = grouped.setdefault(statement, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += ms
+            entry[2] = max(entry[2], ms)
+        top = sorted(grouped.items(), key=lambda item: -item[1][1])[:limit]
+        return [
+            {"statement": st, "count": int(n), "total_ms": round(total, 3), "mean_ms": round(total / n, 3), "max_ms": round(mx, 3)}
+            for st, (n, total, mx) in top
+        ]
+
+    def routes(self, limit: int) -> list[dict]:
+        """Routes by queries per request, most first (N+1 patterns show up here)."""
+        top = sorted(self._routes.items(), key=lambda item: -item[1][1] / item[1][0])[:limit]
+        return [
+            {"route": route, "requests": int(n), "queries_mean": round(q / n, 2), "queries_max": int(mx), "sql_ms_mean": round(ms / n, 3)}
+            for route, (n, q, mx, ms) in top
+        ]
+
+    def reset(self) -> None:
+        self._executions.clear()
+        self._routes.clear()
+
+    @property
+    def window(self) -> int:
+        return len(self._executions)
+
+
+# Singleton; None while SQL_STATS is off
+sql_stats: Optional[SQLStats] = SQLStats(settings.sql_stats_window, settings.sql_slow_ms) if settings.sql_stats else None
+
+
 def _build_engine_for_url(url: str):
     """Create engine for SQLite URL."""
     url = _sqlite_url_with_absolute_path(url)
-    return create_async_engine(
+    new_engine = create_async_engine(
         url,
         echo=settings.debug,
         connect_args={"check_same_thread": False},
         poolclass=StaticPool,
     )
+    if sql_stats is not None:
+        sql_stats.attach(new_engine)
+    return new_engine
 
 
 # Config validator already set database_url (from KEYPILOT_DATA_DIR or default)
@@ -65,6 +184,159 @@ class Base(DeclarativeBase):
     pass
 
 
+@dataclass
+class _VaultDB:
+    engine: AsyncEngine
+    sessionmaker: async_sessionmaker
+    in_use: int = 0
+
+
+# Open databases of non-default vaults, least recently used first
+_vault_dbs: "OrderedDict[str, _VaultDB]" = OrderedDict()
+_open_lock = asyncio.Lock()
+# Called with (vault, sessionmaker) after a vault DB is opened (e.g. to recover interrupted jobs)
+_open_listeners: list[Callable[[str, async_sessionmaker], Awaitable[None]]] = []
+
+
+def add_open_listener(listener: Callable[[str, async_sessionmaker], Awaitable[None]]) -> None:
+    if listener not in _open_listeners:
+        _open_listeners.append(listener)
+
+
+def vault_db_path(vault: str) -> Path:
+    default_path = Path(engine.url.database or "keypilot.db")
+    return default_path.parent / "vaults" / f"{vault}.db"
+
+
+def vault_exists(vault: str) -> bool:
+    return vault == DEFAULT_VAULT or vault in _vault_dbs or vault_db_path(vault).exists()
+
+
+def list_vaults() -> list[str]:
+    vaults_dir = vault_db_path(DEFAULT_VAULT).parent
+    names = {p.stem for p in vaults_dir.glob("*.db")} if vaults_dir.is_dir() else set()
+    return [DEFAULT_VAULT] + sorted(names - {DEFAULT_VAULT})
+
+
+async def _open_vault(vault: str, create: bool) -> _VaultDB:
+    async with _open_lock:
+        vdb = _vault_dbs.get(vault)
+        if vdb is not None:
+            _vault_dbs.move_to_end(vault)
+            return vdb
+        path = vault_db_path(vault)
+        if not create and not path.exists():
+            raise HTTPException(status_code=404, detail=f"Vault '{vault}' not found. Unseal it once to create it.")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        vault_engine = _build_engine_for_url(f"sqlite+aiosqlite:///{path.as_posix()}")
+        try:
+            async with vault_engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+        except OperationalError:
+            # Another worker process created the tables at the same moment: they exist now
+            async with vault_engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+        vdb = _vault_dbs[vault] = _VaultDB(
+            vault_engine, async_sessionmaker(vault_engine, class_=AsyncSession, expire_on_commit=False)
+        )
+        for listener in list(_open_listeners):
+            try:
+                await listener(vault, vdb.sessionmaker)
+            except Exception:
+                logger.exception("Vault open listener %r failed", listener)
+        await _close_idle_vaults(keep=vault)
+        return vdb
+
+
+async def _close_idle_vaults(keep: str) -> None:
+    """Dispose least recently used engines without open sessions beyond vault_max_open_databases."""
+    limit = max(1, settings.vault_max_open_databases)
+    for name in list(_vault_dbs):
+        if len(_vault_dbs) <= limit:
+            break
+        vdb = _vault_dbs[name]
+        if name != keep and vdb.in_use == 0:
+            del _vault_dbs[name]
+            await vdb.engine.dispose()
+
+
+async def get_engine(vault: Optional[str] = None) -> AsyncEngine:
+    name = vault or current_vault.get()
+    if name == DEFAULT_VAULT:
+        return engine
+    return (await _open_vault(name, create=False)).engine
+
+
+@asynccontextmanager
+async def session(vault: Optional[str] = None, create: bool = False) -> AsyncIterator[AsyncSession]:
+    """Session on the given vault's DB (default: vault of the current request). create: new vault file."""
+    name = vault or current_vault.get()
+    if name == DEFAULT_VAULT:
+        async with AsyncSessionLocal() as s:
+            yield s
+        return
+    vdb = await _open_vault(name, create)
+    vdb.in_use += 1
+    try:
+        async with vdb.sessionmaker() as s:
+            yield s
+    finally:
+        vdb.in_use -= 1
+
+
+@asynccontextmanager
+async def _own_connection_session(vault: Optional[str]) -> AsyncIterator[AsyncSession]:
+    url = (await get_engine(vault)).url
+    own_engine = create_async_engine(url, connect_args={"check_same_thread": False}, poolclass=NullPool)
+    if sql_stats is not None:
+        sql_stats.attach(own_engine)
+    try:
+        async with AsyncSession(own_engine, expire_on_commit=False) as s:
+            yield s
+    finally:
+        await own_engine.dispose()
+
+
+@asynccontextmanager
+async def read_session(vault: Optional[str] = None) -> AsyncIterator[AsyncSession]:
+    """
+    Read-only session on a connection of its own, for background tasks (e.g. the semantic index).
+    Sessions of the engine share one connection: closing a background session there rolls back
+    whatever a request has written but not yet committed. This one only sees committed data.
+    """
+    async with _own_connection_session(vault) as s:
+        yield s
+
+
+@asynccontextmanager
+async def background_session(vault: Optional[str] = None) -> AsyncIterator[AsyncSession]:
+    """
+    Read-write session on a connection of its own, for background jobs. On the shared connection a
+    request closing its session would roll back the job's uncommitted writes (and the other way round);
+    here SQLite's file lock orders the two instead.
+    """
+    async with _own_connection_session(vault) as s:
+        yield s
+
+
+async def close_vault(vault: str) -> None:
+    """Dispose one vault's engine (e.g. its file was replaced); the next session opens the file again."""
+    vdb = _vault_dbs.pop(vault, None)
+    if vdb is not None:
+        await vdb.engine.dispose()
+
+
+async def close_vaults() -> None:
+    for name in list(_vault_dbs):
+        await _vault_dbs.pop(name).engine.dispose()
+
+
 async def get_db() -> AsyncSession:
-    async with AsyncSessionLocal() as session:
-        yield session
+    async with session() as s:
+        yield s
+
+
+async def get_db_or_create() -> AsyncSession:
+    """Like get_db, but creates the vault DB if missing (unseal of a new vault)."""
+    async with session(create=True) as s:
+        yield s
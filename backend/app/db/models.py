@@ -1,5 +1,5 @@
 # Tables: credential metadata + encrypted secrets, vault salt
-from sqlalchemy import String, Text, DateTime, Enum as SQLEnum
+from sqlalchemy import Boolean, Integer, LargeBinary, String, Text, DateTime, Enum as SQLEnum
 from sqlalchemy.orm import Mapped, mapped_column
 from datetime import datetime
 import enum
@@ -30,6 +30,43 @@ class Credential(Base):
     updated_at: Mapped[datetime] = mapped_column(DateTime(), default=datetime.utcnow, onupdate=datetime.utcnow)
 
 
+class Attachment(Base):
+    """File attached to a credential. Content is in attachment_chunks, encrypted with its own data key."""
+    __tablename__ = "attachments"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    credential_id: Mapped[int] = mapped_column(Integer, index=True)
+    uid: Mapped[str] = mapped_column(String(32), unique=True)  # random; bound into every chunk (AAD)
+    filename: Mapped[str] = mapped_column(Text)  # ciphertext
+    content_type: Mapped[str] = mapped_column(String(255), default="application/octet-stream")
+    size: Mapped[int] = mapped_column(Integer)  # plaintext bytes
+    stored_size: Mapped[int] = mapped_column(Integer)  # encrypted bytes in attachment_chunks
+    compression: Mapped[str] = mapped_column(String(10), default="none")  # none | zlib
+    chunk_count: Mapped[int] = mapped_column(Integer)
+    wrapped_key: Mapped[str] = mapped_column(Text)  # data key, encrypted with the vault key
+    created_at: Mapped[datetime] = mapped_column(DateTime(), default=datetime.utcnow)
+
+
+class AttachmentChunk(Base):
+    """nonce (12 bytes) + AES-GCM ciphertext of one fixed-size piece of the (compressed) content."""
+    __tablename__ = "attachment_chunks"
+
+    attachment_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    seq: Mapped[int] = mapped_column(Integer, primary_key=True)
+    data: Mapped[bytes] = mapped_column(LargeBinary)
+
+
+class CredentialFingerprint(Base):
+    """Health scan state per credential: keyed hash and strength of the secret (never the secret itself)."""
+    __tablename__ = "credential_fingerprints"
+
+    credential_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    secret_updated_at: Mapped[datetime] = mapped_column(DateTime())  # credential.updated_at when scanned
+    fingerprint: Mapped[str] = mapped_column(String(64), index=True)  # HMAC-SHA256 hex, "" = undecryptable
+    score: Mapped[int | None] = mapped_column(Integer, nullable=True)  # 0..4; None = not scored (ssh_key)
+    reasons: Mapped[str] = mapped_column(Text, default="[]")  # JSON list of weakness reasons
+
+
 class VaultMeta(Base):
     """One row: salt for key derivation (persistent). Never store master key."""
     __tablename__ = "vault_meta"
@@ -37,3 +74,54 @@ class VaultMeta(Base):
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     key: Mapped[str] = mapped_column(String(64), unique=True)  # z. B. "kdf_salt"
     value: Mapped[str] = mapped_column(Text)  # Salt als base64-String
+
+
+class RotationPolicy(Base):
+    """Which credentials to rotate (type/category/age) and how to generate new secrets."""
+    __tablename__ = "rotation_policies"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    name: Mapped[str] = mapped_column(String(255))
+    type: Mapped[str | None] = mapped_column(String(20), nullable=True)  # None = all types
+    category: Mapped[str | None] = mapped_column(String(255), nullable=True)  # None = all categories
+    older_than_days: Mapped[int | None] = mapped_column(Integer, nullable=True)  # by updated_at; None = any age
+    length: Mapped[int] = mapped_column(Integer, default=32)
+    alphabet: Mapped[str] = mapped_column(String(20), default="urlsafe")  # see services/rotation.ALPHABETS
+    interval_minutes: Mapped[int | None] = mapped_column(Integer, nullable=True)  # scheduler; None = manual only
+    enabled: Mapped[bool] = mapped_column(Boolean, default=True)
+    last_run_at: Mapped[datetime | None] = mapped_column(DateTime(), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(), default=datetime.utcnow)
+
+
+class RotationReport(Base):
+    """Result of one rotation run (never contains secrets)."""
+    __tablename__ = "rotation_reports"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    policy_id: Mapped[int | None] = mapped_column(Integer, nullable=True, index=True)
+    trigger: Mapped[str] = mapped_column(String(20), default="manual")  # manual | schedule
+    dry_run: Mapped[bool] = mapped_column(Boolean, default=False)
+    started_at: Mapped[datetime] = mapped_column(DateTime(), default=datetime.utcnow)
+    finished_at: Mapped[datetime | None] = mapped_column(DateTime(), nullable=True)
+    selected: Mapped[int] = mapped_column(Integer, default=0)
+    rotated: Mapped[int] = mapped_column(Integer, default=0)
+    failed: Mapped[int] = mapped_column(Integer, default=0)
+    details: Mapped[str] = mapped_column(Text, default="{}")  # JSON: rotated credential_ids, errors
+
+
+class Job(Base):
+    """Background job (rotation, re-encryption, backup, ...); progress is kept live in memory while running."""
+    __tablename__ = "jobs"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    kind: Mapped[str] = mapped_column(String(50))
+    status: Mapped[str] = mapped_column(String(20), default="queued", index=True)  # queued|running|succeeded|failed|cancelled|aborted
+    params: Mapped[str] = mapped_column(Text, default="{}")  # JSON
+    done: Mapped[int] = mapped_column(Integer, default=0)
+    total: Mapped[int] = mapped_column(Integer, default=0)
+    message: Mapped[str] = mapped_column(Text, default="")
+    result: Mapped[str | None] = mapped_column(Text, nullable=True)  # JSON, never secrets
+    error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(), default=datetime.utcnow)
+    started_at: Mapped[datetime | None] = mapped_column(DateTime(), nullable=True)
+    finished_at: Mapped[datetime | None] = mapped_column(DateTime(), nullable=True)
@@ -1,4 +1,5 @@
 # KeyPilot Backend – FastAPI
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 
@@ -12,8 +13,18 @@ logger = logging.getLogger(__name__)
 from app.db import database
 from app.db.database import Base, get_db, switch_to_fallback_sqlite
 from app.db import models  # noqa: F401 – register tables with Base
-from app.api import vault_router, credentials_router, chat_router
+from app.api import vault_router, credentials_router, chat_router, rotation_router, jobs_router, snapshot_router, events_router, attachments_router, admin_router
+from app.api.middleware import SQLStatsMiddleware, VaultMiddleware
+from app.crypto.agent import get_seal_watcher
 from app.api.utils import router as utils_router
+from app.services.agent import warm_up as warm_up_ollama
+from app.services.events import get_event_bus
+from app.services.jobs import get_job_runner
+from app.services.ollama import get_ollama
+from app.services.rotation import get_scheduler as get_rotation_scheduler
+from app.services.semantic import get_semantic_index
+from app.services.sshkeys import get_key_pool
+from app.services.vaults import get_auto_sealer
 
 
 def _add_username_column_if_missing(sync_conn):
@@ -30,8 +41,8 @@ def _add_username_column_if_missing(sync_conn):
         pass
 
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
+async def init_db() -> None:
+    """Create tables and migrate; the supervisor runs it once before starting its workers."""
     try:
         async with database.engine.begin() as conn:
             await conn.run_sync(Base.metadata.create_all)
@@ -45,7 +56,37 @@ async def lifespan(app: FastAPI):
                 await conn.run_sync(_add_username_column_if_missing)
         else:
             raise
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await init_db()
+    get_event_bus().start()
+    get_semantic_index().start()
+    await get_ollama().start()
+    warmup = asyncio.create_task(warm_up_ollama()) if Settings().ollama_warmup else None
+    await get_job_runner().start()
+    get_rotation_scheduler().start()
+    get_key_pool().start()
+    watcher = get_seal_watcher()
+    if watcher:
+        watcher.start()
+        if not await watcher.wait_subscribed(5.0):
+            logger.warning("Key agent subscription not up yet: vaults count as sealed until it is")
+    else:
+        get_auto_sealer().start()  # supervisor workers: the key agent seals idle vaults
     yield
+    if watcher:
+        await watcher.stop()
+    await get_auto_sealer().stop()
+    await get_key_pool().stop()
+    await get_rotation_scheduler().stop()
+    await get_job_runner().stop()
+    await get_semantic_index().stop()
+    if warmup and not warmup.done():
+        warmup.cancel()
+    await get_ollama().close()
+    await database.close_vaults()
     await database.engine.dispose()
 
 
@@ -56,6 +97,9 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+if database.sql_stats is not None:
+    app.add_middleware(SQLStatsMiddleware)  # inside VaultMiddleware: sees the routed scope
+app.add_middleware(VaultMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:5173", "http://127.0.0.1:5173"],
@@ -66,7 +110,13 @@ app.add_middleware(
 
 app.include_router(vault_router)
 app.include_router(credentials_router)
+app.include_router(attachments_router)
 app.include_router(chat_router)
+app.include_router(rotation_router)
+app.include_router(jobs_router)
+app.include_router(snapshot_router)
+app.include_router(events_router)
+app.include_router(admin_router)
 app.include_router(utils_router)
 
 
@@ -1,7 +1,7 @@
 # Pydantic schemas for API
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, field_validator
 from datetime import datetime
-from typing import Optional
+from typing import Any, Optional
 
 
 class UnsealRequest(BaseModel):
@@ -14,6 +14,7 @@ class UnsealResponse(BaseModel):
 
 class VaultStatusResponse(BaseModel):
     sealed: bool
+    vault: str = "default"
 
 
 class CredentialBase(BaseModel):
@@ -55,6 +56,10 @@ class CredentialWithSecret(CredentialResponse):
     secret: str  # nur bei expliziter Abfrage (z. B. "Passwort anzeigen")
 
 
+class SecretsRequest(BaseModel):
+    ids: list[int]  # many secrets in one request (CLI, scripts); max 500
+
+
 class ChatMessage(BaseModel):
     role: str  # user | assistant
     content: str
@@ -62,12 +67,204 @@ class ChatMessage(BaseModel):
 
 class ChatRequest(BaseModel):
     message: str
+    history: list[ChatMessage] = []  # earlier turns (oldest first) for follow-up questions
 
 
 class ChatResponse(BaseModel):
     reply: str
     action_performed: Optional[str] = None  # z. B. "credential_created"
+    handled_by: Optional[str] = None  # "fast_path" (rules), "cache" (earlier LLM result) or "llm" (Ollama)
+
+
+class ChatStatsResponse(BaseModel):
+    fast_path: int
+    cache: int
+    llm: int
+    total: int
+    offload_rate: float  # share of messages handled without the LLM
 
 
 class GeneratePasswordResponse(BaseModel):
     password: str
+
+
+class SSHKeyCreate(BaseModel):
+    name: str
+    username: str = ""
+    category: str = ""
+    description: str = ""
+    algorithm: str = "ed25519"  # ed25519 | rsa
+    bits: Optional[int] = None  # RSA only: 2048 | 4096 (default 4096)
+
+
+class SSHKeyCreateResponse(CredentialResponse):
+    public_key: str  # private key is stored as the secret, never returned here
+
+
+class PublicKeyResponse(BaseModel):
+    public_key: str
+
+
+class GenerateSSHKeyResponse(BaseModel):
+    private_key: str
+    public_key: str
+
+
+class RotationSelector(BaseModel):
+    type: Optional[str] = None  # None = all types except ssh_key (rotated only when selected explicitly)
+    category: Optional[str] = None  # None = all categories
+    older_than_days: Optional[int] = None  # updated_at older than this; None = any age
+    length: int = 32
+    alphabet: str = "urlsafe"  # urlsafe | alphanumeric | hex | ascii
+
+
+class RotationPolicyCreate(RotationSelector):
+    name: str
+    interval_minutes: Optional[int] = Field(None, gt=0)  # run by scheduler every N minutes; None = manual only
+    enabled: bool = True
+
+
+class RotationPolicyUpdate(BaseModel):
+    """Only the fields sent are changed; null clears type, category, older_than_days and interval_minutes."""
+    name: Optional[str] = None
+    type: Optional[str] = None
+    category: Optional[str] = None
+    older_than_days: Optional[int] = None
+    length: Optional[int] = None
+    alphabet: Optional[str] = None
+    interval_minutes: Optional[int] = Field(None, gt=0)
+    enabled: Optional[bool] = None
+
+    @field_validator("name", "length", "alphabet", "enabled")
+    @classmethod
+    def _not_null(cls, value):
+        # Runs only for fields that were sent: omitted means unchanged, an explicit null is an error
+        if value is None:
+            raise ValueError("must not be null")
+        return value
+
+
+class RotationPolicyResponse(RotationPolicyCreate):
+    id: int
+    interval_minutes: Optional[int] = None  # as stored (no bounds: older rows must still list)
+    last_run_at: Optional[datetime] = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class RotationRunRequest(RotationSelector):
+    dry_run: bool = False  # only report what would be rotated
+
+
+class RotationReportResponse(BaseModel):
+    id: int
+    policy_id: Optional[int] = None
+    trigger: str
+    dry_run: bool
+    started_at: datetime
+    finished_at: Optional[datetime] = None
+    selected: int
+    rotated: int
+    failed: int
+    credential_ids: list[int] = []
+    errors: list[str] = []
+    key_fingerprints: dict[int, str] = {}  # SSH key rotation: SHA256 fingerprint of each new public key
+
+
+class JobCreate(BaseModel):
+    kind: str  # rotation | reencrypt | backup
+    params: dict[str, Any] = {}
+
+
+class JobResponse(BaseModel):
+    id: int
+    kind: str
+    status: str
+    done: int
+    total: int
+    message: str = ""
+    result: Optional[dict[str, Any]] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    eta_seconds: Optional[float] = None  # running jobs with known total only
+
+
+class SnapshotKeyResponse(BaseModel):
+    key: str  # fresh random snapshot key (base64url), to pass to POST /snapshot/export
+
+
+class SnapshotExportRequest(BaseModel):
+    key: str  # snapshot key chosen by the caller: 32 bytes, base64url (e.g. from POST /snapshot/key)
+    type: Optional[str] = None
+    category: Optional[str] = None
+
+
+class HealthEntry(BaseModel):
+    id: int
+    type: str
+    name: str
+    category: str = ""
+    updated_at: datetime
+
+
+class WeakEntry(HealthEntry):
+    score: int  # 0 (very weak) .. 4 (strong)
+    reasons: list[str] = []
+
+
+class StaleEntry(HealthEntry):
+    age_days: int
+
+
+class HealthReport(BaseModel):
+    """Never contains secrets: reuse is detected by keyed fingerprints, strength by score and reasons."""
+    generated_at: datetime
+    total: int
+    rescanned: int  # credentials decrypted for this report (new or changed since the last scan)
+    unreadable: list[int] = []  # IDs whose secret does not decrypt
+    reused: list[list[HealthEntry]] = []  # groups of credentials sharing one secret
+    weak: list[WeakEntry] = []
+    stale: list[StaleEntry] = []
+    stale_days: int
+
+
+class AttachmentResponse(BaseModel):
+    id: int
+    credential_id: int
+    filename: str
+    content_type: str
+    size: int  # bytes as uploaded
+    stored_size: int  # bytes stored (compressed + encrypted)
+    compression: str  # none | zlib
+    created_at: datetime
+
+
+class SQLStatementStats(BaseModel):
+    statement: str  # SQL with placeholders, never parameter values
+    count: int
+    total_ms: float
+    mean_ms: float
+    max_ms: float
+
+
+class SQLRouteStats(BaseModel):
+    route: str  # "GET /credentials/{credential_id}"
+    requests: int
+    queries_mean: float
+    queries_max: int
+    sql_ms_mean: float
+
+
+class SQLStatsResponse(BaseModel):
+    window: int  # statement executions the list is based on
+    slow_ms: float
+    statements: list[SQLStatementStats] = []
+    routes: list[SQLRouteStats] = []
+
+
+class SemanticSearchResult(CredentialResponse):
+    score: float  # cosine similarity of the query and name/type/category/description, -1..1
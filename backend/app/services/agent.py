@@ -1,12 +1,21 @@
 # AI agent: natural language -> intent -> credential API (Ollama local)
 import json
+import logging
 import re
+from typing import AsyncIterator
+
 import httpx
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import Settings
+from app.crypto import current_vault
+from app.models.schemas import CredentialResponse
 from app.services import credentials as cred_svc
+from app.services.intent_cache import get_intent_cache, prompt_hash
+from app.services.ollama import get_ollama, keep_alive
+from app.services.semantic import get_semantic_index
 
+logger = logging.getLogger(__name__)
 settings = Settings()
 
 # Simplified intent: send user message to Ollama with a system prompt that requires
@@ -47,35 +56,118 @@ def _ollama_model_name() -> str:
     return name
 
 
-async def _call_ollama(prompt: str, user_message: str) -> str:
-    url = f"{settings.ollama_base_url.rstrip('/')}/api/generate"
-    model = _ollama_model_name()
-    try:
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            r = await client.post(
-                url,
-                json={
-                    "model": model,
-                    "prompt": f"{prompt}\n\nUser: {user_message}\n\nAssistant:",
-                    "stream": False,
-                },
-            )
-            r.raise_for_status()
-            data = r.json()
-            return (data.get("response") or "").strip()
-    except httpx.ConnectError as e:
-        raise RuntimeError(
+def _ollama_error(e: httpx.HTTPError, model: str) -> RuntimeError:
+    """Map httpx errors to a RuntimeError with a message the user can act on (API -> 503)."""
+    if isinstance(e, httpx.ConnectError):
+        return RuntimeError(
             f"Cannot reach Ollama at {settings.ollama_base_url}. "
             "Is Ollama running? If the backend runs in Docker, set OLLAMA_BASE_URL=http://host.docker.internal:11434"
-        ) from e
-    except httpx.HTTPStatusError as e:
+        )
+    if isinstance(e, httpx.TimeoutException):
+        return RuntimeError(
+            f"Ollama did not answer in time (read timeout {settings.ollama_read_timeout:g}s). "
+            "Try a smaller model or raise OLLAMA_READ_TIMEOUT."
+        )
+    if isinstance(e, httpx.HTTPStatusError):
         body = e.response.text
         if e.response.status_code == 404:
-            raise RuntimeError(
+            return RuntimeError(
                 f"Ollama model '{model}' not found. Run: ollama pull {settings.ollama_model or 'llama3.2'}. "
                 "Or check available models with: ollama list — then set OLLAMA_MODEL in backend/.env to the exact name."
-            ) from e
-        raise RuntimeError(f"Ollama error ({e.response.status_code}): {body[:200]}") from e
+            )
+        return RuntimeError(f"Ollama error ({e.response.status_code}): {body[:200]}")
+    return RuntimeError(f"Ollama request failed: {e}")
+
+
+def _chat_payload(user_message: str, history: list[dict] | None = None) -> dict:
+    """
+    /api/chat request: the system prompt is always the identical first message, so Ollama can reuse
+    the processed prefix; keep_alive keeps the model loaded between chats.
+    history: earlier turns [{"role": "user"|"assistant", "content": ...}]. Only the last few user turns
+    are sent: assistant replies can carry decrypted secrets (credential_show) and never reach the model.
+    """
+    messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+    window = settings.ollama_context_messages
+    user_turns = [turn["content"] for turn in history or [] if turn.get("role") == "user" and turn.get("content")]
+    for content in user_turns[-window:] if window > 0 else []:
+        messages.append({"role": "user", "content": content})
+    messages.append({"role": "user", "content": user_message})
+    return {
+        "model": _ollama_model_name(),
+        "messages": messages,
+        "stream": False,
+        "keep_alive": keep_alive(settings.ollama_keep_alive),
+    }
+
+
+async def _call_ollama(user_message: str, history: list[dict] | None = None) -> str:
+    payload = _chat_payload(user_message, history)
+    try:
+        r = await get_ollama().post("/api/chat", payload)
+    except httpx.HTTPError as e:
+        raise _ollama_error(e, payload["model"]) from e
+    data = r.json()
+    return ((data.get("message") or {}).get("content") or "").strip()
+
+
+async def _stream_ollama(user_message: str, history: list[dict] | None = None) -> AsyncIterator[str]:
+    """Yield response fragments as Ollama generates them."""
+    payload = _chat_payload(user_message, history)
+    try:
+        async for chunk in get_ollama().stream("/api/chat", payload):
+            content = (chunk.get("message") or {}).get("content")
+            if content:
+                yield content
+            if chunk.get("done"):
+                break
+    except httpx.HTTPError as e:
+        raise _ollama_error(e, payload["model"]) from e
+
+
+async def warm_up() -> None:
+    """
+    Load the model and process the system prompt once at startup, so the first chat does not pay
+    the model-load latency. Failures are only logged (Ollama may start after the backend).
+    """
+    payload = _chat_payload("ping")
+    payload["options"] = {"num_predict": 1}
+    try:
+        await get_ollama().post("/api/chat", payload)
+        logger.info("Ollama model %s loaded (keep_alive=%s)", payload["model"], payload["keep_alive"])
+    except httpx.HTTPError as e:
+        logger.warning("Ollama warm-up failed: %s", _ollama_error(e, payload["model"]))
+
+
+_INTENT_PREFIX = "INTENT:"
+
+
+def _intent_line_end(text: str) -> int | None:
+    """
+    End index of a complete "INTENT: <name> | PARAMS: {...}" line in text (balanced braces,
+    JSON strings respected), or None while it is still incomplete.
+    """
+    m = re.match(r"\s*INTENT:\s*\w+\s*\|\s*PARAMS:\s*\{", text)
+    if not m:
+        return None
+    depth, in_string, escaped = 0, False, False
+    for i in range(m.end() - 1, len(text)):
+        ch = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == "{":
+            depth += 1
+        elif ch == "}":
+            depth -= 1
+            if depth == 0:
+                return i + 1
+    return None
 
 
 def _parse_response(response: str) -> tuple[str, dict]:
@@ -91,17 +183,247 @@ def _parse_response(response: str) -> tuple[str, dict]:
     return intent, params
 
 
+# --- Fast path: rule-based intents for common commands (no LLM round trip) ---
+
+_TYPE_WORDS = r"passwords?|ssh[\s-]?keys?|api[\s-]?keys?|credentials?|secrets?|keys?|entries|entry"
+_ITEM_WORDS = r"credential|password|secret|entry|ssh[\s-]?key|api[\s-]?key|key"
+_VERB_INTENTS = {
+    "show": "credential_show", "display": "credential_show", "get": "credential_show", "reveal": "credential_show",
+}
+_VERBS = "|".join(_VERB_INTENTS)
+# Rotate and delete cannot be undone: only with an explicit ID ("delete id 17", "rotate #4"). By name or
+# with a bare number ("remove prod db", "delete 17") they go to the LLM like any other message.
+_DESTRUCTIVE_VERB_INTENTS = {
+    "rotate": "credential_rotate", "renew": "credential_rotate", "regenerate": "credential_rotate",
+    "delete": "credential_delete", "remove": "credential_delete",
+}
+_DESTRUCTIVE_VERBS = "|".join(_DESTRUCTIVE_VERB_INTENTS)
+# Words that start a question or a sentence, or refer back to earlier turns ("show it", "get that one
+# again"): not a credential name.
+_NOT_A_NAME = {
+    "me", "how", "what", "why", "which", "all", "my", "some", "any", "a", "an", "is", "are", "can", "do",
+    "it", "its", "this", "that", "these", "those", "them", "they", "one", "same", "again", "previous", "last",
+}
+
+_RE_LIST = re.compile(
+    rf"^(?P<verb>list|show|display|get)(?:\s+me)?(?P<all>\s+all)?\s*(?:(?:my|the)\s+)?(?P<what>{_TYPE_WORDS})?"
+    r"(?:\s+(?:in|for|under|from|of)\s+(?:the\s+)?(?:category\s+|group\s+)?(?P<cat>.+?))?$",
+    re.IGNORECASE,
+)
+_RE_BY_ID = re.compile(
+    rf"^(?P<verb>{_VERBS})\s+(?:the\s+)?(?:(?:{_ITEM_WORDS})\s+)?(?:(?:with|of|for)\s+)?(?:the\s+)?"
+    r"(?:id\s*:?\s*|#|no\.?\s*|number\s+)?(?P<id>\d+)$",
+    re.IGNORECASE,
+)
+_RE_BY_EXPLICIT_ID = re.compile(
+    rf"^(?P<verb>{_DESTRUCTIVE_VERBS})\s+(?:the\s+)?(?:(?:{_ITEM_WORDS})\s+)?(?:(?:with|of|for)\s+)?(?:the\s+)?"
+    r"(?:id\s*:?\s*|#\s*)(?P<id>\d+)$",
+    re.IGNORECASE,
+)
+_RE_BY_NAME = re.compile(
+    rf"^(?P<verb>{_VERBS})\s+(?:the\s+)?(?:(?:{_ITEM_WORDS})\s+)?(?:(?:for|of|named|called)\s+)?(?P<name>.+)$",
+    re.IGNORECASE,
+)
+_RE_GENERIC_NAME = re.compile(rf"^(?:(?:the|my|a|an|this|that)\s+)?(?:{_TYPE_WORDS})$", re.IGNORECASE)
+_RE_CREATE = re.compile(
+    rf"^(?:create|add|save|store|generate)\s+(?:(?:a|an|new)\s+)*(?P<what>{_ITEM_WORDS})\s+"
+    r"(?:for|named|called|with\s+(?:the\s+)?name|under\s+the\s+name)\s+(?P<name>.+?)"
+    r"(?:\s+(?:in|under)\s+(?:the\s+)?(?:category|group)\s+(?P<cat>.+))?$",
+    re.IGNORECASE,
+)
+
+
+def _type_from_words(words: str | None) -> str | None:
+    w = (words or "").lower().replace("-", " ")
+    if w.startswith("password"):
+        return "password"
+    if w.startswith("ssh"):
+        return "ssh_key"
+    if w.startswith("api"):
+        return "api_key"
+    return None  # credentials, secrets, keys, entries: all types
+
+
+def _clean_name(raw: str) -> tuple[str, bool]:
+    """Strip quotes around a name. Returns (name, was_quoted)."""
+    name = raw.strip()
+    if len(name) >= 2 and name[0] == name[-1] and name[0] in "\"'“”":
+        return name[1:-1].strip(), True
+    if len(name) >= 2 and name[0] == "“" and name[-1] == "”":
+        return name[1:-1].strip(), True
+    return name, False
+
+
+def _name_confidence(name: str, quoted: bool) -> float:
+    if not name:
+        return 0.0
+    if quoted:
+        return 0.95
+    words = name.split()
+    if words[0].lower() in _NOT_A_NAME or words[-1].lower() == "again" or len(words) > 6:
+        return 0.3
+    # "show password", "rotate the key": a generic noun, not a name – leave to the LLM
+    if _RE_GENERIC_NAME.match(name):
+        return 0.3
+    return 0.85
+
+
+def _fast_parse(message: str) -> tuple[str, dict, float] | None:
+    """
+    Recognize list/show/create commands, and rotate/delete by explicit ID, without the LLM.
+    Returns (intent, params, confidence) or None if no rule matches.
+    """
+    text = re.sub(r"\s+", " ", message).strip().rstrip(".!")
+    text = re.sub(r"^please\s+", "", text, flags=re.IGNORECASE)
+    if not text or "?" in text:
+        return None
+
+    m = _RE_BY_ID.match(text)
+    if m:
+        return _VERB_INTENTS[m.group("verb").lower()], {"id": int(m.group("id"))}, 1.0
+    m = _RE_BY_EXPLICIT_ID.match(text)
+    if m:
+        return _DESTRUCTIVE_VERB_INTENTS[m.group("verb").lower()], {"id": int(m.group("id"))}, 1.0
+
+    m = _RE_LIST.match(text)
+    # "list ..." always lists; show/get/display only with "all" or a plural ("show passwords"),
+    # "show password for X" is a single credential.
+    if m and (
+        m.group("verb").lower() == "list"
+        or (m.group("what") and (m.group("all") or m.group("what").lower().endswith(("s", "entries"))))
+    ):
+        params = {"type": _type_from_words(m.group("what")), "category": None}
+        if m.group("cat"):
+            params["category"], _ = _clean_name(m.group("cat"))
+        return "credential_list", params, 0.95
+
+    m = _RE_CREATE.match(text)
+    if m:
+        name, quoted = _clean_name(m.group("name"))
+        # "for server X under the name Y": name and description mixed – leave to the LLM.
+        if not quoted and re.search(r"\b(under|named|called|with|for)\b", name, re.IGNORECASE):
+            return None
+        params = {"type": _type_from_words(m.group("what")) or "password", "name": name}
+        if m.group("cat"):
+            params["category"], _ = _clean_name(m.group("cat"))
+        return "credential_create", params, min(0.9, _name_confidence(name, quoted))
+
+    m = _RE_BY_NAME.match(text)
+    if m:
+        name, quoted = _clean_name(m.group("name"))
+        return _VERB_INTENTS[m.group("verb").lower()], {"name": name}, _name_confidence(name, quoted)
+    return None
+
+
+def _fast_intent(message: str) -> tuple[str, dict] | None:
+    """Fast-path result if enabled and confident enough, else None (-> LLM)."""
+    if not settings.chat_fast_path:
+        return None
+    parsed = _fast_parse(message)
+    if parsed is None or parsed[2] < settings.chat_fast_path_min_confidence:
+        return None
+    return parsed[0], parsed[1]
+
+
+_SYSTEM_PROMPT_HASH = prompt_hash(SYSTEM_PROMPT)
+
+# Words that point back into the conversation ("rotate it", "show the second one"): the intent of such
+# a message depends on the earlier turns, not on its text alone.
+_RE_CONTEXT_WORDS = re.compile(
+    r"\b(?:it|its|it's|this|that|these|those|them|they|their|same|again|one|ones|above|previous|last|former|latter)\b",
+    re.IGNORECASE,
+)
+
+
+def _depends_on_context(message: str, history: list[dict] | None) -> bool:
+    """True for a follow-up that refers to earlier turns; its LLM result must not be cached or reused."""
+    return bool(history) and _RE_CONTEXT_WORDS.search(message) is not None
+
+
+def _known_intent(message: str, history: list[dict] | None = None) -> tuple[str, dict, str] | None:
+    """
+    Intent without generating: fast path, then cached LLM result. Returns (intent, params, handled_by).
+    Self-contained messages use both even when history is given (the UI always sends it); follow-ups
+    that refer to earlier turns ("show it again") skip both and are resolved by the LLM with the history.
+    """
+    if _depends_on_context(message, history):
+        return None
+    fast = _fast_intent(message)
+    if fast:
+        return fast[0], fast[1], "fast_path"
+    cached = get_intent_cache().get(message, _ollama_model_name(), _SYSTEM_PROMPT_HASH)
+    if cached:
+        return cached[0], cached[1], "cache"
+    return None
+
+
+def _remember_intent(message: str, history: list[dict] | None, intent: str, params: dict) -> None:
+    if _depends_on_context(message, history):
+        return
+    get_intent_cache().put(message, _ollama_model_name(), _SYSTEM_PROMPT_HASH, intent, params)
+
+
+# Which path handled each chat message (GET /chat/stats)
+_path_counts = {"fast_path": 0, "cache": 0, "llm": 0}
+
+
+def _count_path(path: str, intent: str) -> None:
+    _path_counts[path] += 1
+    logger.debug("Chat message handled by %s (intent=%s)", path, intent)
+
+
+def get_path_stats() -> dict:
+    total = sum(_path_counts.values())
+    offloaded = _path_counts["fast_path"] + _path_counts["cache"]
+    return {**_path_counts, "total": total, "offload_rate": offloaded / total if total else 0.0}
+
+
 async def execute(
     db: AsyncSession,
     user_message: str,
-) -> tuple[str, str | None]:
+    history: list[dict] | None = None,
+) -> tuple[str, str | None, str]:
     """
-    Send message to Ollama, parse intent+params, execute action.
-    Returns: (response text for user, optional action_performed).
+    Recognize intent+params (fast path, intent cache, else Ollama), execute action.
+    history: earlier chat turns for follow-ups (see _chat_payload).
+    Returns: (response text for user, optional action_performed, handled_by "fast_path" | "cache" | "llm").
     """
-    raw = await _call_ollama(SYSTEM_PROMPT, user_message)
+    known = _known_intent(user_message, history)
+    if known:
+        intent, params, handled_by = known
+        _count_path(handled_by, intent)
+        reply, action = await _dispatch(db, intent, params, "")
+        return reply, action, handled_by
+    raw = await _call_ollama(user_message, history)
     intent, params = _parse_response(raw)
+    _remember_intent(user_message, history, intent, params)
+    _count_path("llm", intent)
+    reply, action = await _dispatch(db, intent, params, raw)
+    return reply, action, "llm"
+
+
+async def _find_by_name(db: AsyncSession, name: str) -> tuple[CredentialResponse | None, bool]:
+    """Exact name first, else the semantically closest credential (services/semantic). Returns (credential, exact)."""
+    all_ = await cred_svc.list_credentials(db)
+    cred = next((c for c in all_ if c.name == name), None)
+    if cred:
+        return cred, True
+    cid = await get_semantic_index().best_match(current_vault.get(), name)
+    return next((c for c in all_ if c.id == cid), None), False
+
+
+def _suggestion(name: str, cred: CredentialResponse, action: str) -> str:
+    """Reply for a similarity match: secrets are never shown, rotated or deleted on a guess."""
+    return f"Credential \"{name}\" not found. Did you mean \"{cred.name}\" (ID {cred.id})? Use the exact name or the ID to {action} it."
 
+
+async def _dispatch(
+    db: AsyncSession,
+    intent: str,
+    params: dict,
+    raw: str,
+) -> tuple[str, str | None]:
+    """Execute a parsed intent. raw: model output (reply for intent "chat")."""
     if intent == "chat":
         return raw or "Understood. Can you be more specific about what you want to do with the credentials?", None
 
@@ -123,30 +445,34 @@ async def execute(
     if intent == "credential_show":
         name = params.get("name")
         cid = params.get("id")
+        exact = True
         if name:
-            all_ = await cred_svc.list_credentials(db)
-            cred = next((c for c in all_ if c.name == name), None)
+            cred, exact = await _find_by_name(db, name)
         elif cid is not None:
             cred = await cred_svc.get_credential(db, int(cid))
         else:
             return "Please specify name or ID.", None
         if not cred:
             return "Credential not found.", None
+        if not exact:
+            return _suggestion(name, cred, "show"), None
         _, secret = await cred_svc.get_credential_decrypted(db, cred.id)
         return f"**{cred.name}** ({cred.type})\nSecret: {secret}", "credential_show"
 
     if intent == "credential_rotate":
         name = params.get("name")
         cid = params.get("id")
+        exact = True
         if name:
-            all_ = await cred_svc.list_credentials(db)
-            cred = next((c for c in all_ if c.name == name), None)
+            cred, exact = await _find_by_name(db, name)
         elif cid is not None:
             cred = await cred_svc.get_credential(db, int(cid))
         else:
             return "Please specify name or ID.", None
         if not cred:
             return "Credential not found.", None
+        if not exact:
+            return _suggestion(name, cred, "rotate"), None
         from secrets import token_urlsafe
         from app.models.schemas import CredentialUpdate
         await cred_svc.update_credential(db, cred.id, CredentialUpdate(secret=token_urlsafe(24)))
@@ -155,16 +481,78 @@ async def execute(
     if intent == "credential_delete":
         name = params.get("name")
         cid = params.get("id")
+        exact = True
         if name:
-            all_ = await cred_svc.list_credentials(db)
-            cred = next((c for c in all_ if c.name == name), None)
+            cred, exact = await _find_by_name(db, name)
         elif cid is not None:
             cred = await cred_svc.get_credential(db, int(cid))
         else:
             return "Please specify name or ID.", None
         if not cred:
             return "Credential not found.", None
+        if not exact:
+            return _suggestion(name, cred, "delete"), None
         await cred_svc.delete_credential(db, cred.id)
         return f"Credential \"{cred.name}\" deleted.", "credential_deleted"
 
     return raw or "Action could not be performed.", None
+
+
+async def execute_stream(
+    db: AsyncSession,
+    user_message: str,
+    history: list[dict] | None = None,
+) -> AsyncIterator[tuple[str, dict]]:
+    """
+    Streaming variant of execute(). Yields (event, data):
+    - ("token", {"text": ...}): free-text reply fragments as the model generates them.
+    - ("intent", {"intent": ..., "handled_by": ...}): as soon as the intent is known (fast path, cache: at once;
+      LLM: when the INTENT line is complete – the rest of the generation is not awaited, except for "chat").
+    - ("result", {"reply": ..., "action_performed": ..., "handled_by": ...}): always last.
+    """
+    known = _known_intent(user_message, history)
+    if known:
+        intent, params, handled_by = known
+        _count_path(handled_by, intent)
+        yield "intent", {"intent": intent, "handled_by": handled_by}
+        reply, action = await _dispatch(db, intent, params, "")
+        yield "result", {"reply": reply, "action_performed": action, "handled_by": handled_by}
+        return
+    raw = ""
+    mode = "undecided"  # -> "intent" (INTENT line being generated) or "text" (forwarded as tokens)
+    intent, params, parsed = "chat", {}, False
+    tokens = _stream_ollama(user_message, history)
+    try:
+        async for fragment in tokens:
+            raw += fragment
+            if mode == "text":
+                yield "token", {"text": fragment}
+                continue
+            if mode == "undecided":
+                head = raw.lstrip()
+                if _INTENT_PREFIX.startswith(head):
+                    continue  # may still become "INTENT:"
+                if not head.startswith(_INTENT_PREFIX):
+                    mode = "text"
+                    yield "token", {"text": raw}
+                    continue
+                mode = "intent"
+            end = _intent_line_end(raw)
+            if end is None:
+                continue
+            intent, params = _parse_response(raw[:end])
+            parsed = True
+            yield "intent", {"intent": intent, "handled_by": "llm"}
+            if intent != "chat":
+                break  # stop the generation; the action does not need the rest
+            mode = "text"
+            if raw[end:].strip():
+                yield "token", {"text": raw[end:]}
+    finally:
+        await tokens.aclose()
+    if not parsed:
+        intent, params = _parse_response(raw)
+    _remember_intent(user_message, history, intent, params)
+    _count_path("llm", intent)
+    reply, action = await _dispatch(db, intent, params, raw.strip())
+    yield "result", {"reply": reply, "action_performed": action, "handled_by": "llm"}
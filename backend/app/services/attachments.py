@@ -0,0 +1,207 @@
+# Attachments (kubeconfigs, certificate bundles, keystores, ...): streamed in and out with constant memory.
+# Content is optionally zlib-compressed, then split into fixed-size chunks, each encrypted with AES-GCM
+# under a per-attachment data key (wrapped with the vault key) and a fresh nonce. The AAD binds every
+# chunk to its attachment and credential, position and "last" flag, so reordered, swapped or truncated
+# chunks fail, and so does an attachment row moved to another credential.
+import base64
+import secrets
+import struct
+import tempfile
+import zlib
+from typing import AsyncIterator
+
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from fastapi import HTTPException
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import Settings
+from app.crypto import current_vault, get_container
+from app.db import database
+from app.db.models import Attachment, AttachmentChunk, Credential
+from app.models.schemas import AttachmentResponse
+from app.services.credentials import _decrypt_fields, ensure_unsealed
+from app.services.events import publish
+
+settings = Settings()
+
+NONCE_SIZE = 12
+TAG_SIZE = 16
+
+
+def _aad(uid: str, credential_id: int, seq: int, last: bool) -> bytes:
+    return bytes.fromhex(uid) + struct.pack("<QIB", credential_id, seq, last)
+
+
+def _to_response(att: Attachment, filename: str) -> AttachmentResponse:
+    return AttachmentResponse(
+        id=att.id,
+        credential_id=att.credential_id,
+        filename=filename,
+        content_type=att.content_type,
+        size=att.size,
+        stored_size=att.stored_size,
+        compression=att.compression,
+        created_at=att.created_at,
+    )
+
+
+async def store_attachment(
+    db: AsyncSession,
+    credential_id: int,
+    filename: str,
+    content_type: str,
+    stream: AsyncIterator[bytes],
+    compress: bool = True,
+) -> AttachmentResponse:
+    """
+    Encrypt the stream chunk by chunk into a temporary file (ciphertext only), then copy the chunks into
+    the DB in one short transaction – no transaction stays open while the client is still sending.
+    """
+    ensure_unsealed()
+    if not filename.strip() or len(filename) > 255:
+        raise HTTPException(status_code=400, detail="filename must be 1 to 255 characters.")
+    if (await db.execute(select(Credential.id).where(Credential.id == credential_id))).scalar_one_or_none() is None:
+        raise HTTPException(status_code=404, detail="Credential not found")
+    container = get_container()
+    chunk_size = max(1024, settings.attachment_chunk_size)
+    max_size = settings.attachment_max_size_mb * 1024 * 1024
+    key = AESGCM.generate_key(bit_length=256)
+    aes = AESGCM(key)
+    uid = secrets.token_hex(16)
+    compressor = zlib.compressobj(6) if compress else None
+
+    with tempfile.TemporaryFile() as spool:
+        count = 0
+
+        def seal_chunk(data: bytes, last: bool) -> None:
+            nonlocal count
+            nonce = secrets.token_bytes(NONCE_SIZE)
+            spool.write(nonce + aes.encrypt(nonce, data, _aad(uid, credential_id, count, last)))
+            count += 1
+
+        size = 0
+        buf = bytearray()
+        async for piece in stream:
+            size += len(piece)
+            if size > max_size:
+                raise HTTPException(status_code=413, detail=f"Attachment larger than {settings.attachment_max_size_mb} MB.")
+            buf += compressor.compress(piece) if compressor else piece
+            # A full chunk is only written once more data follows: the last one must carry the flag
+            while len(buf) > chunk_size:
+                seal_chunk(bytes(buf[:chunk_size]), last=False)
+                del buf[:chunk_size]
+        if compressor:
+            buf += compressor.flush()
+        while len(buf) > chunk_size:
+            seal_chunk(bytes(buf[:chunk_size]), last=False)
+            del buf[:chunk_size]
+        seal_chunk(bytes(buf), last=True)
+
+        ensure_unsealed()  # the vault may have been sealed during a long upload
+        stored_size = spool.tell()
+        encrypted_filename, wrapped_key = await container.encrypt_many_async(
+            [filename.strip(), base64.b64encode(key).decode("ascii")]
+        )
+        att = Attachment(
+            credential_id=credential_id,
+            uid=uid,
+            filename=encrypted_filename,
+            content_type=content_type or "application/octet-stream",
+            size=size,
+            stored_size=stored_size,
+            compression="zlib" if compressor else "none",
+            chunk_count=count,
+            wrapped_key=wrapped_key,
+        )
+        db.add(att)
+        await db.flush()
+        spool.seek(0)
+        stored_chunk = NONCE_SIZE + chunk_size + TAG_SIZE
+        for seq in range(count):
+            # Core insert: chunks do not pile up in the session
+            await db.execute(insert(AttachmentChunk).values(attachment_id=att.id, seq=seq, data=spool.read(stored_chunk)))
+        await db.commit()
+    await db.refresh(att)
+    resp = _to_response(att, filename.strip())
+    publish("attachment.created", resp.model_dump(mode="json"))
+    return resp
+
+
+async def list_attachments(db: AsyncSession, credential_id: int) -> list[AttachmentResponse]:
+    ensure_unsealed()
+    container = get_container()
+    r = await db.execute(select(Attachment).where(Attachment.credential_id == credential_id).order_by(Attachment.id))
+    attachments = list(r.scalars().all())
+    filenames = await _decrypt_fields(container, [att.filename for att in attachments])
+    return [_to_response(att, filename) for att, (filename, _) in zip(attachments, filenames)]
+
+
+async def get_attachment(db: AsyncSession, credential_id: int, attachment_id: int) -> Attachment:
+    r = await db.execute(
+        select(Attachment).where(Attachment.id == attachment_id, Attachment.credential_id == credential_id)
+    )
+    att = r.scalar_one_or_none()
+    if att is None:
+        raise HTTPException(status_code=404, detail="Attachment not found")
+    return att
+
+
+async def open_attachment(att: Attachment) -> tuple[str, AsyncIterator[bytes]]:
+    """
+    Filename and plaintext of the attachment as an async iterator: one chunk is read, decrypted and
+    decompressed at a time (each in its own short session), so memory stays at about one chunk.
+    """
+    ensure_unsealed()
+    vault = current_vault.get()
+    container = get_container()
+    filename = (await _decrypt_fields(container, [att.filename]))[0][0]
+    data_key = (await container.decrypt_many_async([att.wrapped_key]))[0]
+    if data_key is None:
+        raise HTTPException(status_code=500, detail=f"Key of attachment {att.id} cannot be decrypted.")
+    aes = AESGCM(base64.b64decode(data_key))
+    uid, attachment_id, count, compressed = att.uid, att.id, att.chunk_count, att.compression == "zlib"
+    credential_id = att.credential_id
+    out_size = max(1024, settings.attachment_chunk_size)
+
+    async def chunks() -> AsyncIterator[bytes]:
+        decompressor = zlib.decompressobj() if compressed else None
+        for seq in range(count):
+            if get_container(vault).is_sealed:
+                raise RuntimeError("Vault was sealed during download")
+            async with database.session(vault) as db:
+                r = await db.execute(
+                    select(AttachmentChunk.data).where(
+                        AttachmentChunk.attachment_id == attachment_id, AttachmentChunk.seq == seq
+                    )
+                )
+                data = r.scalar_one_or_none()
+            if data is None:
+                raise RuntimeError(f"Chunk {seq} of attachment {attachment_id} is missing")
+            try:
+                plain = aes.decrypt(data[:NONCE_SIZE], data[NONCE_SIZE:], _aad(uid, credential_id, seq, seq == count - 1))
+            except InvalidTag:
+                raise RuntimeError(f"Chunk {seq} of attachment {attachment_id} failed authentication (modified or reordered)")
+            if decompressor is None:
+                yield plain
+                continue
+            # max_length: a small chunk may inflate to a lot of data; hand it out piece by piece
+            piece = decompressor.decompress(plain, out_size)
+            while piece:
+                yield piece
+                piece = decompressor.decompress(decompressor.unconsumed_tail, out_size)
+        if decompressor is not None:
+            rest = decompressor.flush()
+            if rest:
+                yield rest
+
+    return filename, chunks()
+
+
+async def delete_attachment(db: AsyncSession, att: Attachment) -> None:
+    await db.execute(delete(AttachmentChunk).where(AttachmentChunk.attachment_id == att.id))
+    await db.delete(att)
+    await db.commit()
+    publish("attachment.deleted", {"id": att.id, "credential_id": att.credential_id})
+
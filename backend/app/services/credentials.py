@@ -1,25 +1,24 @@
 # Credential-CRUD: name/username and secret encrypted in DB; decrypted only when vault is unsealed
+import hashlib
+
 from fastapi import HTTPException
-from sqlalchemy import select
+from sqlalchemy import delete, func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.crypto import get_container
-from app.db.models import Credential
-from app.models.schemas import CredentialCreate, CredentialUpdate, CredentialResponse
+from app.crypto import current_vault, get_container
+from app.db.models import Attachment, AttachmentChunk, Credential
+from app.models.schemas import CredentialCreate, CredentialUpdate, CredentialResponse, CredentialWithSecret
+from app.services.events import publish
+
+UNREADABLE = "[unreadable]"  # shown for name/username that look encrypted but do not decrypt
 
 
-def _ensure_unsealed():
+def ensure_unsealed():
+    """503 while the vault of the current request (or background task) is sealed."""
     if get_container().is_sealed:
         raise HTTPException(status_code=503, detail="Vault is sealed. Unseal first.")
 
 
-def _encrypt_field(container, value: str) -> str:
-    """Encrypt string for storage; empty string stays empty."""
-    if not value or not value.strip():
-        return ""
-    return container.encrypt(value.strip())
-
-
 def _looks_like_ciphertext(value: str) -> bool:
     """Heuristic: our ciphertext is base64, typically long and no spaces."""
     s = value.strip()
@@ -29,26 +28,39 @@ def _looks_like_ciphertext(value: str) -> bool:
     return all(c in allowed for c in s) and " " not in s
 
 
-def _decrypt_field(container, value: str) -> tuple[str, bool]:
+async def _encrypt_fields(container, values: list[str]) -> list[str]:
+    """Encrypt strings for storage with one batch call (stripped); empty strings stay empty."""
+    present = [v.strip() for v in values if v and v.strip()]
+    encrypted = iter(await container.encrypt_many_async(present))
+    return [next(encrypted) if v and v.strip() else "" for v in values]
+
+
+async def _decrypt_fields(container, values: list[str]) -> list[tuple[str, bool]]:
     """
-    Decrypt name/username from DB. Returns (plaintext, was_legacy).
-    On success: (decrypted, False). Legacy plaintext: (value as-is, True) for migration.
+    Decrypt names/usernames from DB with one batch call. Per value (plaintext, was_legacy):
+    on success (decrypted, False). Legacy plaintext: (value as-is, True) for migration.
     When value looks like ciphertext but decrypt fails: ("[unreadable]", False) – never expose ciphertext in the UI.
     """
-    if not value or not value.strip():
-        return "", False
-    try:
-        return container.decrypt(value), False
-    except Exception:
-        if _looks_like_ciphertext(value):
-            return "[unreadable]", False
-        return value, True
+    present = [v for v in values if v and v.strip()]
+    decrypted = iter(await container.decrypt_many_async(present))
+    result = []
+    for value in values:
+        if not value or not value.strip():
+            result.append(("", False))
+            continue
+        plain = next(decrypted)
+        if plain is not None:
+            result.append((plain, False))
+        elif _looks_like_ciphertext(value):
+            result.append((UNREADABLE, False))
+        else:
+            result.append((value, True))
+    return result
 
 
-def _credential_to_response(container, cred: Credential) -> CredentialResponse:
+async def _credential_to_response(container, cred: Credential) -> CredentialResponse:
     """Build CredentialResponse with decrypted name and username."""
-    dec_name, name_legacy = _decrypt_field(container, cred.name)
-    dec_username, username_legacy = _decrypt_field(container, cred.username or "")
+    (dec_name, _), (dec_username, _) = await _decrypt_fields(container, [cred.name, cred.username or ""])
     return CredentialResponse(
         id=cred.id,
         type=cred.type,
@@ -62,20 +74,23 @@ def _credential_to_response(container, cred: Credential) -> CredentialResponse:
 
 
 async def create_credential(db: AsyncSession, data: CredentialCreate) -> CredentialResponse:
-    _ensure_unsealed()
+    ensure_unsealed()
     container = get_container()
+    name, username = await _encrypt_fields(container, [data.name, data.username or ""])
     cred = Credential(
         type=data.type,
-        name=_encrypt_field(container, data.name),
-        username=_encrypt_field(container, data.username or ""),
+        name=name,
+        username=username,
         category=data.category or "",
         description=data.description or "",
-        ciphertext=container.encrypt(data.secret),
+        ciphertext=(await container.encrypt_many_async([data.secret]))[0],
     )
     db.add(cred)
     await db.commit()
     await db.refresh(cred)
-    return _credential_to_response(container, cred)
+    resp = await _credential_to_response(container, cred)
+    publish("credential.created", resp.model_dump(mode="json"))
+    return resp
 
 
 async def list_credentials(
@@ -83,7 +98,7 @@ async def list_credentials(
     type_filter: str | None = None,
     category: str | None = None,
 ) -> list[CredentialResponse]:
-    _ensure_unsealed()
+    ensure_unsealed()
     container = get_container()
     q = select(Credential)
     if type_filter:
@@ -94,9 +109,9 @@ async def list_credentials(
     rows = list(r.scalars().all())
     result = []
     to_migrate = []
-    for cred in rows:
-        dec_name, name_legacy = _decrypt_field(container, cred.name)
-        dec_username, username_legacy = _decrypt_field(container, cred.username or "")
+    fields = await _decrypt_fields(container, [v for cred in rows for v in (cred.name, cred.username or "")])
+    for i, cred in enumerate(rows):
+        (dec_name, name_legacy), (dec_username, username_legacy) = fields[2 * i], fields[2 * i + 1]
         if name_legacy or username_legacy:
             to_migrate.append((cred, dec_name, dec_username))
         result.append(
@@ -112,35 +127,106 @@ async def list_credentials(
             )
         )
     result.sort(key=lambda c: c.name.lower())
-    for cred, dec_name, dec_username in to_migrate:
-        cred.name = _encrypt_field(container, dec_name) if dec_name else ""
-        cred.username = _encrypt_field(container, dec_username) if dec_username else ""
-        db.add(cred)
     if to_migrate:
+        encrypted = await _encrypt_fields(container, [v for _, name, username in to_migrate for v in (name, username)])
+        for i, (cred, _, _) in enumerate(to_migrate):
+            cred.name, cred.username = encrypted[2 * i], encrypted[2 * i + 1]
+            db.add(cred)
         await db.commit()
     return result
 
 
+async def list_etag(db: AsyncSession, type_filter: str | None = None, category: str | None = None) -> str:
+    """
+    Validator for list_credentials without decrypting: changes with every create (count, max id),
+    update (max updated_at) and delete (count).
+    """
+    q = select(func.count(Credential.id), func.max(Credential.id), func.max(Credential.updated_at))
+    if type_filter:
+        q = q.where(Credential.type == type_filter)
+    if category:
+        q = q.where(Credential.category == category)
+    count, max_id, max_updated = (await db.execute(q)).one()
+    raw = f"{current_vault.get()}|{type_filter}|{category}|{count}|{max_id}|{max_updated}"
+    return 'W/"' + hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32] + '"'
+
+
+async def get_credentials_by_ids(db: AsyncSession, ids: list[int]) -> dict[int, CredentialResponse]:
+    """Several credentials without secrets, one batch decrypt; unknown IDs are missing from the result."""
+    ensure_unsealed()
+    container = get_container()
+    r = await db.execute(select(Credential).where(Credential.id.in_(ids)))
+    rows = list(r.scalars().all())
+    fields = await _decrypt_fields(container, [v for cred in rows for v in (cred.name, cred.username or "")])
+    return {
+        cred.id: CredentialResponse(
+            id=cred.id,
+            type=cred.type,
+            name=fields[2 * i][0],
+            username=fields[2 * i + 1][0],
+            category=cred.category,
+            description=cred.description,
+            created_at=cred.created_at,
+            updated_at=cred.updated_at,
+        )
+        for i, cred in enumerate(rows)
+    }
+
+
+async def get_secrets_decrypted(db: AsyncSession, ids: list[int]) -> list[CredentialWithSecret]:
+    """Several credentials with secret, one batch decrypt; unknown IDs are skipped."""
+    ensure_unsealed()
+    container = get_container()
+    r = await db.execute(select(Credential).where(Credential.id.in_(ids)).order_by(Credential.id))
+    rows = list(r.scalars().all())
+    fields = await _decrypt_fields(container, [v for cred in rows for v in (cred.name, cred.username or "")])
+    plain = await container.decrypt_many_async([cred.ciphertext for cred in rows])
+    result = []
+    for i, cred in enumerate(rows):
+        if plain[i] is None:
+            raise HTTPException(status_code=500, detail=f"Secret of credential {cred.id} cannot be decrypted.")
+        result.append(
+            CredentialWithSecret(
+                id=cred.id,
+                type=cred.type,
+                name=fields[2 * i][0],
+                username=fields[2 * i + 1][0],
+                category=cred.category,
+                description=cred.description,
+                created_at=cred.created_at,
+                updated_at=cred.updated_at,
+                secret=plain[i],
+            )
+        )
+    return result
+
+
 async def get_credential(db: AsyncSession, credential_id: int) -> Credential | None:
     r = await db.execute(select(Credential).where(Credential.id == credential_id))
     return r.scalar_one_or_none()
 
 
+async def _migrate_fields(db: AsyncSession, container, cred: Credential) -> tuple[str, str]:
+    """Decrypted name and username; legacy plaintext values are encrypted in the DB on the way."""
+    (dec_name, name_legacy), (dec_username, username_legacy) = await _decrypt_fields(
+        container, [cred.name, cred.username or ""]
+    )
+    if name_legacy or username_legacy:
+        cred.name, cred.username = await _encrypt_fields(container, [dec_name, dec_username])
+        db.add(cred)
+        await db.commit()
+    return dec_name, dec_username
+
+
 async def get_credential_response(
     db: AsyncSession, credential_id: int
 ) -> CredentialResponse | None:
     cred = await get_credential(db, credential_id)
     if not cred:
         return None
-    _ensure_unsealed()
+    ensure_unsealed()
     container = get_container()
-    dec_name, name_legacy = _decrypt_field(container, cred.name)
-    dec_username, username_legacy = _decrypt_field(container, cred.username or "")
-    if name_legacy or username_legacy:
-        cred.name = _encrypt_field(container, dec_name) if dec_name else ""
-        cred.username = _encrypt_field(container, dec_username) if dec_username else ""
-        db.add(cred)
-        await db.commit()
+    dec_name, dec_username = await _migrate_fields(db, container, cred)
     return CredentialResponse(
         id=cred.id,
         type=cred.type,
@@ -159,16 +245,12 @@ async def get_credential_decrypted(
     cred = await get_credential(db, credential_id)
     if not cred:
         return None
-    _ensure_unsealed()
+    ensure_unsealed()
     container = get_container()
-    dec_name, name_legacy = _decrypt_field(container, cred.name)
-    dec_username, username_legacy = _decrypt_field(container, cred.username or "")
-    if name_legacy or username_legacy:
-        cred.name = _encrypt_field(container, dec_name) if dec_name else ""
-        cred.username = _encrypt_field(container, dec_username) if dec_username else ""
-        db.add(cred)
-        await db.commit()
-    secret = container.decrypt(cred.ciphertext)
+    dec_name, dec_username = await _migrate_fields(db, container, cred)
+    secret = (await container.decrypt_many_async([cred.ciphertext]))[0]
+    if secret is None:
+        raise HTTPException(status_code=500, detail=f"Secret of credential {cred.id} cannot be decrypted.")
     resp = CredentialResponse(
         id=cred.id,
         type=cred.type,
@@ -188,27 +270,35 @@ async def update_credential(
     cred = await get_credential(db, credential_id)
     if not cred:
         return None
-    _ensure_unsealed()
+    ensure_unsealed()
     container = get_container()
-    if data.name is not None:
-        cred.name = _encrypt_field(container, data.name)
-    if data.username is not None:
-        cred.username = _encrypt_field(container, data.username)
+    if data.name is not None or data.username is not None:
+        name, username = await _encrypt_fields(container, [data.name or "", data.username or ""])
+        if data.name is not None:
+            cred.name = name
+        if data.username is not None:
+            cred.username = username
     if data.category is not None:
         cred.category = data.category
     if data.description is not None:
         cred.description = data.description
     if data.secret is not None:
-        cred.ciphertext = container.encrypt(data.secret)
+        cred.ciphertext = (await container.encrypt_many_async([data.secret]))[0]
     await db.commit()
     await db.refresh(cred)
-    return _credential_to_response(container, cred)
+    resp = await _credential_to_response(container, cred)
+    publish("credential.updated", resp.model_dump(mode="json"))
+    return resp
 
 
 async def delete_credential(db: AsyncSession, credential_id: int) -> bool:
     cred = await get_credential(db, credential_id)
     if not cred:
         return False
+    attachment_ids = select(Attachment.id).where(Attachment.credential_id == credential_id)
+    await db.execute(delete(AttachmentChunk).where(AttachmentChunk.attachment_id.in_(attachment_ids)))
+    await db.execute(delete(Attachment).where(Attachment.credential_id == credential_id))
     await db.delete(cred)
     await db.commit()
+    publish("credential.deleted", {"id": credential_id})
     return True
@@ -0,0 +1,177 @@
+# Change feed: in-process event bus per vault (credential created/updated/deleted/rotated, vault sealed/
+# unsealed/reset). Sequence IDs increase monotonically (also across restarts: they start at the current
+# time in ms * 1000); the last event_buffer_size events per vault are kept for resume (Last-Event-ID).
+# With the supervisor, workers publish through the key agent, which numbers and fans out the events.
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+
+from app.config import Settings
+from app.crypto import CryptoContainer, add_seal_listener, current_vault
+
+logger = logging.getLogger(__name__)
+settings = Settings()
+
+
+def initial_sequence() -> int:
+    return int(time.time() * 1000) * 1000
+
+
+@dataclass
+class Event:
+    seq: int
+    vault: str
+    type: str
+    data: dict[str, Any] = field(default_factory=dict)
+
+
+class Subscription:
+    """Queue of one /events client; overflowed = client too slow, must resync (reset event)."""
+
+    def __init__(self, vault: str, maxsize: int) -> None:
+        self.vault = vault
+        self.queue: asyncio.Queue[Event] = asyncio.Queue(maxsize)
+        self.overflowed = False
+
+    def put(self, event: Event) -> None:
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+
+class EventBus:
+    def __init__(self, buffer_size: int) -> None:
+        self.buffer_size = max(1, buffer_size)
+        self._seq = initial_sequence()
+        self._first_seq = self._seq  # IDs below are from an earlier run: resume there means resync
+        self._lock = threading.Lock()  # publish may come from threadpool endpoints (e.g. POST /vault/seal)
+        self._buffers: dict[str, deque[Event]] = {}
+        # Per vault: highest seq dropped from the buffer (or cleared); resume below it has a gap
+        self._dropped: dict[str, int] = {}
+        self._subscribers: set[Subscription] = set()
+        # In-process consumers (e.g. the semantic index); called on the event loop for every event of every vault
+        self._listeners: list[Callable[[Event], None]] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending: set[asyncio.Task] = set()  # publishes on their way to the key agent
+
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        if settings.key_agent_socket:
+            # The key agent numbers the events (and publishes vault.sealed itself)
+            from app.crypto.agent import get_agent_client
+            self._first_seq = self._seq = get_agent_client().call("info")["seq_start"]
+        add_seal_listener(self._on_seal)
+
+    def publish(self, type: str, data: Optional[dict] = None, vault: Optional[str] = None) -> None:
+        vault = vault or current_vault.get()
+        if settings.key_agent_socket:
+            self._publish_remote(vault, type, data or {})
+            return  # comes back numbered via the agent subscription (deliver)
+        with self._lock:
+            self._seq += 1
+            event = Event(self._seq, vault, type, data or {})
+        self.deliver(event)
+
+    def _publish_remote(self, vault: str, type: str, data: dict) -> None:
+        from app.crypto.agent import get_agent_client
+        client = get_agent_client()
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            client.call("publish", vault=vault, type=type, data=data)  # threadpool: may block
+            return
+        # On the event loop: do not wait for the agent. acall() keeps the order of publishes.
+        task = loop.create_task(client.acall("publish", vault=vault, type=type, data=data))
+        self._pending.add(task)
+        task.add_done_callback(self._publish_done)
+
+    def _publish_done(self, task: asyncio.Task) -> None:
+        self._pending.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("Publishing an event through the key agent failed: %s", task.exception())
+
+    def deliver(self, event: Event) -> None:
+        """Buffer the event and hand it to the subscribers of its vault."""
+        with self._lock:
+            self._seq = max(self._seq, event.seq)
+            buffer = self._buffers.setdefault(event.vault, deque())
+            buffer.append(event)
+            while len(buffer) > self.buffer_size:
+                self._dropped[event.vault] = buffer.popleft().seq
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if self._loop is not None and running is not self._loop:
+            self._loop.call_soon_threadsafe(self._fan_out, event)
+        else:
+            self._fan_out(event)
+
+    def add_listener(self, listener: Callable[[Event], None]) -> None:
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def _fan_out(self, event: Event) -> None:
+        for sub in list(self._subscribers):
+            if sub.vault == event.vault:
+                sub.put(event)
+        for listener in list(self._listeners):
+            try:
+                listener(event)
+            except Exception:
+                logger.exception("Event listener %r failed", listener)
+
+    def subscribe(self, vault: str, last_id: Optional[int]) -> tuple[list[Event], Subscription, bool]:
+        """
+        Returns (events after last_id, subscription, gap). gap: events after last_id are no longer
+        buffered (or last_id is unknown) – the client must reload the full state.
+        """
+        sub = Subscription(vault, self.buffer_size)
+        with self._lock:
+            buffer = list(self._buffers.get(vault, ()))
+            self._subscribers.add(sub)
+            dropped = self._dropped.get(vault)
+            first_seq, seq = self._first_seq, self._seq  # consistent with buffer: deliver() may run on another thread
+        if last_id is None:
+            return [], sub, False
+        gap = last_id < first_seq or (dropped is not None and last_id < dropped) or last_id > seq
+        return [e for e in buffer if e.seq > last_id], sub, gap
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        self._subscribers.discard(sub)
+
+    def clear(self, vault: str) -> None:
+        """Drop buffered events (they contain decrypted names) – resume across a seal means resync."""
+        with self._lock:
+            buffer = self._buffers.pop(vault, None)
+            if buffer:
+                self._dropped[vault] = buffer[-1].seq
+
+    def _on_seal(self, container: CryptoContainer) -> None:
+        self.clear(container.vault)
+        if not settings.key_agent_socket:
+            self.publish("vault.sealed", vault=container.vault)
+
+    @property
+    def last_seq(self) -> int:
+        return self._seq
+
+
+# Singleton for the app
+_bus: Optional[EventBus] = None
+
+
+def get_event_bus() -> EventBus:
+    global _bus
+    if _bus is None:
+        _bus = EventBus(settings.event_buffer_size)
+    return _bus
+
+
+def publish(type: str, data: Optional[dict] = None, vault: Optional[str] = None) -> None:
+    get_event_bus().publish(type, data, vault)
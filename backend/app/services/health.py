@@ -0,0 +1,216 @@
+# Password health: reused secrets (keyed fingerprints), weak secrets (strength score) and stale entries
+# (updated_at). Incremental: credential_fingerprints keeps one row per credential, a scan decrypts only
+# credentials that are new or changed since the last one. Reports never contain secrets; they are cached
+# per vault until the next write (list ETag changes) or seal.
+import asyncio
+import json
+import logging
+import math
+import string
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import Settings
+from app.crypto import CryptoContainer, add_seal_listener, current_vault, get_container
+from app.db.models import Credential, CredentialFingerprint
+from app.models.schemas import HealthEntry, HealthReport, StaleEntry, WeakEntry
+from app.services.credentials import _decrypt_fields, ensure_unsealed, list_etag
+
+logger = logging.getLogger(__name__)
+
+# Built-in: defaults and the few passwords at the top of every leak list (score 0 regardless of length/
+# classes). Far too short to call anything else "common": that needs a real list (HEALTH_COMMON_PASSWORDS_FILE).
+WELL_KNOWN_PASSWORDS = frozenset({
+    "123456", "123456789", "12345678", "12345", "1234567", "1234567890", "111111", "000000", "123123",
+    "password", "password1", "password123", "passwort", "qwerty", "qwertz", "qwerty123", "abc123", "admin",
+    "administrator", "letmein", "welcome", "welcome1", "iloveyou", "monkey", "dragon", "master", "login",
+    "secret", "changeme", "root", "toor", "test", "test123", "guest", "default", "hallo", "hallo123",
+})
+SEQUENCES = ("abcdefghijklmnopqrstuvwxyz", "0123456789", "qwertyuiop", "asdfghjkl", "yxcvbnm", "zxcvbnm", "qwertzuiop")
+UNSCORED_TYPES = ("ssh_key",)  # key material: reuse is checked, strength is not
+
+
+def load_common_passwords(path: Optional[str]) -> frozenset[str]:
+    """Password list, one per line (e.g. SecLists' 10k most common), lower-cased; empty if unset or unreadable."""
+    if not path:
+        return frozenset()
+    try:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            return frozenset(line.strip().lower() for line in f if line.strip())
+    except OSError as e:
+        logger.warning("Common password list not loaded: %s", e)
+        return frozenset()
+
+
+def score_secret(secret: str, common: frozenset[str] = frozenset()) -> tuple[int, list[str]]:
+    """
+    Strength 0 (very weak) .. 4 (strong) from estimated entropy, plus the reasons it was lowered.
+    common: lower-cased list of common passwords (load_common_passwords); they score 0.
+    """
+    reasons = []
+    pool = 0
+    classes = 0
+    for chars, size in ((string.ascii_lowercase, 26), (string.ascii_uppercase, 26), (string.digits, 10)):
+        if any(c in chars for c in secret):
+            pool += size
+            classes += 1
+    if any(not (c.isascii() and c.isalnum()) for c in secret):
+        pool += 33
+        classes += 1
+    bits = len(secret) * math.log2(pool) if pool else 0.0
+    if secret.lower() in common:
+        return 0, ["common password"]
+    if secret.lower() in WELL_KNOWN_PASSWORDS:
+        return 0, ["well-known password"]
+    if len(set(secret)) * 2 < len(secret):
+        reasons.append("many repeated characters")
+        bits *= len(set(secret)) * 2 / len(secret)
+    lower = secret.lower()
+    if any(seq[i:i + 4] in lower or seq[::-1][i:i + 4] in lower for seq in SEQUENCES for i in range(len(seq) - 3)):
+        reasons.append("contains a keyboard or alphabet sequence")
+        bits *= 0.75
+    if classes < 3 and len(secret) < 20:
+        reasons.append("few character classes")
+    score = 0 if bits < 28 else 1 if bits < 36 else 2 if bits < 60 else 3 if bits < 80 else 4
+    if len(secret) < 12:
+        reasons.append("shorter than 12 characters")
+        score = min(score, 2)
+    return score, reasons
+
+
+def _analyse(container: CryptoContainer, rows: list, common: frozenset[str]) -> list[dict]:
+    """Runs in a worker thread: decrypt one batch, return fingerprint rows (plaintext stays in here)."""
+    plain = container.decrypt_many([row.ciphertext for row in rows])
+    fingerprints = iter(container.fingerprint_many([p for p in plain if p is not None]))
+    result = []
+    for row, secret in zip(rows, plain):
+        values = {"credential_id": row.id, "secret_updated_at": row.updated_at, "score": None, "reasons": "[]"}
+        if secret is None:
+            values["fingerprint"] = ""
+        else:
+            values["fingerprint"] = next(fingerprints)
+            if row.type not in UNSCORED_TYPES:
+                score, reasons = score_secret(secret, common)
+                values["score"], values["reasons"] = score, json.dumps(reasons)
+        result.append(values)
+    return result
+
+
+class HealthScanner:
+    def __init__(self, batch_size: int, workers: int, min_score: int, common: frozenset[str] = frozenset()) -> None:
+        self.batch_size = max(1, batch_size)
+        self.workers = max(1, workers)
+        self.min_score = min_score
+        self.common = common
+        self._reports: dict[str, tuple[tuple, HealthReport]] = {}  # vault -> (cache key, report)
+        self._lock = asyncio.Lock()  # one scan at a time: concurrent scans would decrypt the same rows
+
+    def clear(self, vault: str) -> None:
+        self._reports.pop(vault, None)
+
+    async def report(self, db: AsyncSession, stale_days: int) -> HealthReport:
+        ensure_unsealed()
+        vault = current_vault.get()
+        async with self._lock:
+            # Stale flags depend on today's date; everything else only changes with a write
+            key = (await list_etag(db), stale_days, date.today())
+            cached = self._reports.get(vault)
+            if cached and cached[0] == key:
+                return cached[1]
+            rescanned = await self._update_fingerprints(db, get_container())
+            report = await self._build(db, stale_days, rescanned)
+            self._reports[vault] = (key, report)
+            return report
+
+    async def _update_fingerprints(self, db: AsyncSession, container: CryptoContainer) -> int:
+        current = dict((await db.execute(select(Credential.id, Credential.updated_at))).all())
+        scanned = dict((await db.execute(
+            select(CredentialFingerprint.credential_id, CredentialFingerprint.secret_updated_at)
+        )).all())
+        orphans = [cid for cid in scanned if cid not in current]
+        if orphans:
+            await db.execute(delete(CredentialFingerprint).where(CredentialFingerprint.credential_id.in_(orphans)))
+        changed = sorted(cid for cid, updated in current.items() if scanned.get(cid) != updated)
+        # Up to `workers` batches are decrypted and scored in threads at once; the event loop stays free
+        step = self.batch_size * self.workers
+        for start in range(0, len(changed), step):
+            r = await db.execute(
+                select(Credential.id, Credential.type, Credential.updated_at, Credential.ciphertext)
+                .where(Credential.id.in_(changed[start:start + step]))
+            )
+            rows = list(r.all())
+            batches = [rows[i:i + self.batch_size] for i in range(0, len(rows), self.batch_size)]
+            results = await asyncio.gather(*(asyncio.to_thread(_analyse, container, b, self.common) for b in batches))
+            for values in (v for batch in results for v in batch):
+                stmt = insert(CredentialFingerprint).values(**values)
+                await db.execute(stmt.on_conflict_do_update(index_elements=["credential_id"], set_=values))
+        await db.commit()
+        return len(changed)
+
+    async def _build(self, db: AsyncSession, stale_days: int, rescanned: int) -> HealthReport:
+        r = await db.execute(
+            select(Credential.id, Credential.updated_at, CredentialFingerprint)
+            .join(CredentialFingerprint, CredentialFingerprint.credential_id == Credential.id)
+        )
+        rows = list(r.all())
+        groups: dict[str, list[int]] = {}
+        weak: dict[int, CredentialFingerprint] = {}
+        unreadable = []
+        for cid, _, fp in rows:
+            if not fp.fingerprint:
+                unreadable.append(cid)
+                continue
+            groups.setdefault(fp.fingerprint, []).append(cid)
+            if fp.score is not None and fp.score < self.min_score:
+                weak[cid] = fp
+        reused = sorted((sorted(ids) for ids in groups.values() if len(ids) > 1), key=lambda ids: (-len(ids), ids[0]))
+        now = datetime.utcnow()
+        stale = {cid: (now - updated).days for cid, updated, _ in rows if updated < now - timedelta(days=stale_days)}
+
+        # Only flagged credentials get their name decrypted
+        flagged = sorted({cid for ids in reused for cid in ids} | set(weak) | set(stale))
+        entries: dict[int, HealthEntry] = {}
+        if flagged:
+            creds = list((await db.execute(select(Credential).where(Credential.id.in_(flagged)))).scalars().all())
+            names = await _decrypt_fields(get_container(), [c.name for c in creds])
+            for cred, (name, _) in zip(creds, names):
+                entries[cred.id] = HealthEntry(
+                    id=cred.id, type=cred.type, name=name, category=cred.category, updated_at=cred.updated_at
+                )
+        return HealthReport(
+            generated_at=now,
+            total=len(rows),
+            rescanned=rescanned,
+            unreadable=sorted(unreadable),
+            reused=[[entries[cid] for cid in ids] for ids in reused],
+            weak=sorted(
+                (WeakEntry(**entries[cid].model_dump(), score=fp.score, reasons=json.loads(fp.reasons))
+                 for cid, fp in weak.items()),
+                key=lambda e: (e.score, e.name.lower()),
+            ),
+            stale=sorted(
+                (StaleEntry(**entries[cid].model_dump(), age_days=age) for cid, age in stale.items()),
+                key=lambda e: -e.age_days,
+            ),
+            stale_days=stale_days,
+        )
+
+
+# Singleton for the app
+_scanner: Optional[HealthScanner] = None
+
+
+def get_health_scanner() -> HealthScanner:
+    global _scanner
+    if _scanner is None:
+        settings = Settings()
+        _scanner = HealthScanner(
+            settings.health_scan_batch_size, settings.health_scan_workers, settings.health_min_score,
+            load_common_passwords(settings.health_common_passwords_file),
+        )
+        add_seal_listener(lambda container: _scanner.clear(container.vault))
+    return _scanner
@@ -0,0 +1,103 @@
+# Intent cache: (intent, params) parsed from LLM replies, for repeated chat messages.
+# Keys are hashes (message text is not kept); entries expire after a TTL and are dropped on seal.
+import copy
+import hashlib
+import re
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from app.config import Settings
+from app.crypto import add_seal_listener
+
+# Read-only intents only: a repeated "delete prod db" or "rotate ..." must go through the model again,
+# never run from the cache (a create would add a second credential).
+CACHEABLE_INTENTS = {"credential_show", "credential_list"}
+# Params that may carry a secret value – such results are never cached.
+_SECRET_KEYS = {"secret", "password", "token", "key", "private_key", "api_key"}
+
+
+def normalize_message(message: str) -> str:
+    """Case, whitespace and trailing punctuation do not change the intent."""
+    return re.sub(r"\s+", " ", message).strip().rstrip(".!?").strip().lower()
+
+
+def prompt_hash(prompt: str) -> str:
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16]
+
+
+class IntentCache:
+    """
+    Bounded LRU with TTL. get()/put() take model and prompt hash; when either differs from the
+    previous call, all entries are dropped (they were produced by another model or prompt).
+    """
+
+    def __init__(self, max_size: int, ttl: float) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, str, dict]] = OrderedDict()
+        self._generation: Optional[tuple[str, str]] = None
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0 and self.ttl > 0
+
+    def _key(self, message: str, model: str, prompt_digest: str) -> str:
+        if self._generation != (model, prompt_digest):
+            self.clear()
+            self._generation = (model, prompt_digest)
+        raw = f"{model}\x00{prompt_digest}\x00{normalize_message(message)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, message: str, model: str, prompt_digest: str) -> Optional[tuple[str, dict]]:
+        if not self.enabled:
+            return None
+        key = self._key(message, model, prompt_digest)
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1], copy.deepcopy(entry[2])
+
+    def put(self, message: str, model: str, prompt_digest: str, intent: str, params: dict) -> bool:
+        """Store a parsed result; returns False if it must not be cached."""
+        if not self.enabled or not cacheable(intent, params):
+            return False
+        key = self._key(message, model, prompt_digest)
+        self._entries[key] = (time.monotonic() + self.ttl, intent, copy.deepcopy(params))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        return True
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def cacheable(intent: str, params: dict) -> bool:
+    """Only read-only actions without secret values; "chat" replies are free text and never cached."""
+    if intent not in CACHEABLE_INTENTS:
+        return False
+    return not any(k.lower() in _SECRET_KEYS for k in params)
+
+
+# Singleton for the app
+_cache: Optional[IntentCache] = None
+
+
+def get_intent_cache() -> IntentCache:
+    global _cache
+    if _cache is None:
+        settings = Settings()
+        _cache = IntentCache(settings.intent_cache_size, settings.intent_cache_ttl)
+        add_seal_listener(lambda _container: _cache.clear())
+    return _cache
@@ -0,0 +1,336 @@
+# Background jobs: long vault operations run as in-process asyncio tasks instead of inside one HTTP request.
+# Records persist in SQLite (jobs table); progress is live in memory while a job runs.
+# Jobs belong to the vault they were started in; sealing it aborts its jobs that need the key.
+import asyncio
+import json
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.config import Settings
+from app.crypto import DEFAULT_VAULT, CryptoContainer, VaultSealedError, add_seal_listener, current_vault, get_container
+from app.crypto.agent import get_agent_client
+from app.db import database
+from app.db.models import Attachment, Credential, Job
+from app.models.schemas import JobResponse, RotationRunRequest
+from app.services import rotation
+from app.services.credentials import UNREADABLE, _decrypt_fields, _encrypt_fields, ensure_unsealed
+
+logger = logging.getLogger(__name__)
+settings = Settings()
+
+FINISHED = ("succeeded", "failed", "cancelled", "aborted")
+
+
+class JobContext:
+    """Passed to handlers: report progress; the runner reads it for GET /jobs/{id}."""
+
+    def __init__(self, job_id: int, kind: str, vault: str = DEFAULT_VAULT) -> None:
+        self.job_id = job_id
+        self.kind = kind
+        self.vault = vault
+        self.done = 0
+        self.total = 0
+        self.message = ""
+        self.started: Optional[float] = None  # monotonic
+        self.abort_reason: Optional[str] = None
+
+    def progress(self, done: int, total: int, message: Optional[str] = None) -> None:
+        self.done, self.total = done, total
+        if message is not None:
+            self.message = message
+
+    def eta_seconds(self) -> Optional[float]:
+        if self.started is None or not self.total or not self.done:
+            return None
+        elapsed = time.monotonic() - self.started
+        return elapsed / self.done * (self.total - self.done)
+
+
+@dataclass
+class JobKind:
+    handler: Callable[[JobContext, AsyncSession, dict], Awaitable[dict]]
+    requires_unsealed: bool
+
+
+_KINDS: dict[str, JobKind] = {}
+
+
+def job_handler(kind: str, requires_unsealed: bool = True):
+    """Register an async handler(ctx, db, params) -> result dict for a job kind."""
+    def register(fn):
+        _KINDS[kind] = JobKind(fn, requires_unsealed)
+        return fn
+    return register
+
+
+class JobRunner:
+    """At most job_workers jobs run at once (over all vaults); the others stay queued."""
+
+    def __init__(self, workers: int) -> None:
+        self._semaphore = asyncio.Semaphore(max(1, workers))
+        # Job IDs are per vault DB: keyed by (vault, job_id)
+        self._tasks: dict[tuple[str, int], asyncio.Task] = {}
+        self._live: dict[tuple[str, int], JobContext] = {}
+        self._started_at = datetime.utcnow()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        # Jobs created since the backend started belong to a live process (with supervisor workers:
+        # any worker, so the cutoff is the key agent's start)
+        self._started_at = get_agent_client().started_at() if settings.key_agent_socket else datetime.utcnow()
+        await self._recover(DEFAULT_VAULT, database.AsyncSessionLocal)
+        database.add_open_listener(self._recover)
+        add_seal_listener(self._on_seal)
+
+    async def _recover(self, vault: str, sessionmaker: async_sessionmaker) -> None:
+        """Jobs left queued/running by a previous process cannot resume: mark them failed."""
+        async with sessionmaker() as db:
+            await db.execute(
+                update(Job)
+                .where(Job.status.in_(("queued", "running")), Job.created_at < self._started_at)
+                .values(status="failed", error="Interrupted by backend restart", finished_at=datetime.utcnow())
+            )
+            await db.commit()
+
+    async def stop(self) -> None:
+        for key, task in list(self._tasks.items()):
+            self._live[key].abort_reason = "Backend shutdown"
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+    async def submit(self, kind: str, params: dict) -> Job:
+        if kind not in _KINDS:
+            raise HTTPException(status_code=400, detail=f"Unknown job kind '{kind}'. Allowed: {', '.join(_KINDS)}")
+        if _KINDS[kind].requires_unsealed:
+            ensure_unsealed()
+        vault = current_vault.get()
+        async with database.session(vault) as db:
+            job = Job(kind=kind, status="queued", params=json.dumps(params))
+            db.add(job)
+            await db.commit()
+            await db.refresh(job)
+        key = (vault, job.id)
+        self._live[key] = JobContext(job.id, kind, vault)
+        self._tasks[key] = asyncio.create_task(self._run(key, kind, params))
+        return job
+
+    def cancel(self, job_id: int) -> bool:
+        task = self._tasks.get((current_vault.get(), job_id))
+        if task is None:
+            return False
+        task.cancel()
+        return True
+
+    def _on_seal(self, container: CryptoContainer) -> None:
+        # May run in a threadpool thread (sync seal endpoint): the tasks and their dicts belong to the loop
+        if self._loop is None:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._abort_vault(container.vault)
+        else:
+            self._loop.call_soon_threadsafe(self._abort_vault, container.vault)
+
+    def _abort_vault(self, vault: str) -> None:
+        for key, task in list(self._tasks.items()):
+            ctx = self._live[key]
+            if ctx.vault == vault and _KINDS[ctx.kind].requires_unsealed:
+                ctx.abort_reason = "Vault was sealed"
+                task.cancel()
+
+    async def _run(self, key: tuple[str, int], kind: str, params: dict) -> None:
+        vault, job_id = key
+        ctx = self._live[key]
+        status, result, error = "failed", None, None
+        try:
+            async with self._semaphore:
+                if _KINDS[kind].requires_unsealed and get_container(vault).is_sealed:
+                    # Sealed while queued (and the seal listener did not cancel it first): never starts
+                    status, error = "aborted", "Vault is sealed"
+                else:
+                    ctx.started = time.monotonic()
+                    await self._save(vault, job_id, status="running", started_at=datetime.utcnow())
+                    async with database.background_session(vault) as db:
+                        result = await _KINDS[kind].handler(ctx, db, params)
+                    status = "succeeded"
+        except asyncio.CancelledError:
+            status = "aborted" if ctx.abort_reason else "cancelled"
+            error = ctx.abort_reason or "Cancelled by user"
+        except VaultSealedError:
+            # Sealed from another thread: the job reached the vault before its cancellation
+            status, error = "aborted", "Vault was sealed"
+        except HTTPException as e:
+            error = str(e.detail)
+        except Exception as e:
+            logger.exception("Job %s (%s) failed", job_id, kind)
+            error = f"{type(e).__name__}: {e}"
+        finally:
+            self._tasks.pop(key, None)
+            self._live.pop(key, None)
+        await self._save(
+            vault,
+            job_id,
+            status=status,
+            done=ctx.done,
+            total=ctx.total,
+            message=ctx.message,
+            result=json.dumps(result) if result is not None else None,
+            error=error,
+            finished_at=datetime.utcnow(),
+        )
+
+    async def _save(self, vault: str, job_id: int, **values: Any) -> None:
+        async with database.background_session(vault) as db:
+            await db.execute(update(Job).where(Job.id == job_id).values(**values))
+            await db.commit()
+
+    def to_response(self, job: Job) -> JobResponse:
+        ctx = self._live.get((current_vault.get(), job.id)) if job.status not in FINISHED else None
+        return JobResponse(
+            id=job.id,
+            kind=job.kind,
+            status=job.status,
+            done=ctx.done if ctx else job.done,
+            total=ctx.total if ctx else job.total,
+            message=ctx.message if ctx else job.message,
+            result=json.loads(job.result) if job.result else None,
+            error=job.error,
+            created_at=job.created_at,
+            started_at=job.started_at,
+            finished_at=job.finished_at,
+            eta_seconds=ctx.eta_seconds() if ctx else None,
+        )
+
+
+# --- Job kinds ---
+
+@job_handler("rotation")
+async def _rotation_job(ctx: JobContext, db: AsyncSession, params: dict) -> dict:
+    """params: RotationRunRequest fields (type, category, older_than_days, length, alphabet, dry_run)."""
+    spec = RotationRunRequest(**params)
+    report = await rotation.rotate(db, spec, trigger="job", dry_run=spec.dry_run, progress=ctx.progress)
+    return {"report_id": report.id, "selected": report.selected, "rotated": report.rotated, "failed": report.failed}
+
+
+@job_handler("reencrypt")
+async def _reencrypt_job(ctx: JobContext, db: AsyncSession, params: dict) -> dict:
+    """
+    Encrypt every stored value again under the same vault key: fresh nonces for name, username and secret
+    of each credential (also migrates legacy plaintext), and for the filename and wrapped data key of
+    each attachment (chunks keep their own key). The master key does not change.
+    Credentials and attachments are read in chunks of rotation_chunk_size, one commit per chunk.
+    updated_at is written back unchanged: a new nonce is not a new secret (health scan, rotation by age).
+    Rows that do not decrypt with the current key are left as they are and reported as skipped.
+    """
+    ensure_unsealed()
+    container = get_container()
+    ids = list((await db.execute(select(Credential.id).order_by(Credential.id))).scalars().all())
+    attachment_ids = list((await db.execute(select(Attachment.id).order_by(Attachment.id))).scalars().all())
+    total = len(ids) + len(attachment_ids)
+    chunk_size = max(1, settings.rotation_chunk_size)
+    skipped: list[int] = []
+    ctx.progress(0, total)
+    for start in range(0, len(ids), chunk_size):
+        r = await db.execute(
+            select(Credential.id, Credential.name, Credential.username, Credential.ciphertext, Credential.updated_at)
+            .where(Credential.id.in_(ids[start:start + chunk_size]))
+        )
+        rows = list(r.all())
+        secrets = await container.decrypt_many_async([row.ciphertext for row in rows])
+        fields = await _decrypt_fields(container, [v for row in rows for v in (row.name, row.username or "")])
+        readable = []
+        for i, (row, secret) in enumerate(zip(rows, secrets)):
+            name, username = fields[2 * i][0], fields[2 * i + 1][0]
+            if secret is None or UNREADABLE in (name, username):
+                skipped.append(row.id)
+            else:
+                readable.append((row, name, username, secret))
+        encrypted = await _encrypt_fields(container, [v for _, name, username, _ in readable for v in (name, username)])
+        ciphertexts = await container.encrypt_many_async([secret for *_, secret in readable])
+        values = [
+            {
+                "id": row.id,
+                "name": encrypted[2 * i],
+                "username": encrypted[2 * i + 1],
+                "ciphertext": ciphertexts[i],
+                "updated_at": row.updated_at,
+            }
+            for i, (row, *_) in enumerate(readable)
+        ]
+        if values:
+            await db.execute(update(Credential), values)
+        await db.commit()
+        ctx.progress(min(start + chunk_size, len(ids)), total)
+        await asyncio.sleep(0)
+    reencrypted_attachments = 0
+    for start in range(0, len(attachment_ids), chunk_size):
+        r = await db.execute(
+            select(Attachment.id, Attachment.filename, Attachment.wrapped_key)
+            .where(Attachment.id.in_(attachment_ids[start:start + chunk_size]))
+        )
+        rows = list(r.all())
+        filenames = await _decrypt_fields(container, [row.filename for row in rows])
+        data_keys = await container.decrypt_many_async([row.wrapped_key for row in rows])
+        readable_attachments = [
+            (row, filename, data_key)
+            for row, (filename, _), data_key in zip(rows, filenames, data_keys)
+            if data_key is not None and filename != UNREADABLE
+        ]
+        new_filenames = await _encrypt_fields(container, [filename for _, filename, _ in readable_attachments])
+        new_keys = await container.encrypt_many_async([data_key for *_, data_key in readable_attachments])
+        values = [
+            {"id": row.id, "filename": filename, "wrapped_key": wrapped_key}
+            for (row, _, _), filename, wrapped_key in zip(readable_attachments, new_filenames, new_keys)
+        ]
+        if values:
+            await db.execute(update(Attachment), values)
+        await db.commit()
+        reencrypted_attachments += len(values)
+        ctx.progress(len(ids) + min(start + chunk_size, len(attachment_ids)), total)
+        await asyncio.sleep(0)
+    if skipped:
+        logger.warning("Re-encryption skipped %d unreadable credentials: %s", len(skipped), skipped)
+    return {"reencrypted": len(ids) - len(skipped), "skipped": skipped, "attachments": reencrypted_attachments}
+
+
+@job_handler("backup", requires_unsealed=False)
+async def _backup_job(ctx: JobContext, db: AsyncSession, params: dict) -> dict:
+    """Consistent copy of the vault's SQLite DB (VACUUM INTO) to backups/ next to it."""
+    engine = await database.get_engine(ctx.vault)
+    db_path = Path(engine.url.database or "")
+    if not db_path.name:
+        raise HTTPException(status_code=404, detail="Backup only available with local SQLite DB.")
+    target_dir = db_path.parent / "backups"
+    target_dir.mkdir(parents=True, exist_ok=True)
+    prefix = "keypilot" if ctx.vault == DEFAULT_VAULT else ctx.vault
+    target = target_dir / f"{prefix}_backup_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}_{ctx.job_id}.db"
+    ctx.progress(0, 1, "Copying database")
+    await db.close()  # VACUUM must not run inside a transaction
+    async with engine.connect() as conn:
+        await conn.exec_driver_sql("VACUUM INTO ?", (str(target),))
+    ctx.progress(1, 1, "Done")
+    return {"path": str(target), "size": target.stat().st_size}
+
+
+# Singleton for the app
+_runner: Optional[JobRunner] = None
+
+
+def get_job_runner() -> JobRunner:
+    global _runner
+    if _runner is None:
+        _runner = JobRunner(settings.job_workers)
+    return _runner
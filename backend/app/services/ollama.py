@@ -0,0 +1,119 @@
+# Ollama HTTP client: one pooled client for the app lifetime, bounded concurrency with a wait queue.
+# A local Ollama runs one or two generations efficiently; more parallel requests only slow all of them down.
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Optional
+
+import httpx
+
+from app.config import Settings
+
+
+def keep_alive(value: str) -> str | int:
+    """OLLAMA_KEEP_ALIVE as Ollama expects it: plain numbers (seconds, -1 = forever) as int, durations ("30m") as str."""
+    value = value.strip()
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
+class OllamaBusyError(RuntimeError):
+    """All generation slots are taken and the wait queue is full (or the wait timed out)."""
+
+
+class OllamaClient:
+    """
+    Shared httpx.AsyncClient (keep-alive pool) in front of Ollama.
+    - start()/close(): called from the FastAPI lifespan.
+    - slot(): at most ollama_max_concurrency requests run at once; up to ollama_max_queue wait,
+      each at most ollama_queue_timeout seconds. Beyond that: OllamaBusyError (API -> 429).
+    """
+
+    def __init__(self, settings: Settings) -> None:
+        self.base_url = settings.ollama_base_url.rstrip("/")
+        self.max_concurrency = max(1, settings.ollama_max_concurrency)
+        self.max_queue = max(0, settings.ollama_max_queue)
+        self.queue_timeout = settings.ollama_queue_timeout
+        self._timeout = httpx.Timeout(
+            connect=settings.ollama_connect_timeout,
+            read=settings.ollama_read_timeout,
+            write=settings.ollama_connect_timeout,
+            pool=settings.ollama_connect_timeout,
+        )
+        self._limits = httpx.Limits(
+            max_connections=self.max_concurrency + 2,
+            max_keepalive_connections=self.max_concurrency + 2,
+        )
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._waiting = 0
+
+    async def start(self) -> None:
+        if self._client is None:
+            self._client = httpx.AsyncClient(base_url=self.base_url, timeout=self._timeout, limits=self._limits)
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            # Used outside the lifespan (e.g. scripts): create lazily, closed by close().
+            self._client = httpx.AsyncClient(base_url=self.base_url, timeout=self._timeout, limits=self._limits)
+        return self._client
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Hold one generation slot; wait in the bounded queue if all are busy."""
+        if self._semaphore.locked():
+            if self._waiting >= self.max_queue:
+                raise OllamaBusyError("The assistant is busy (too many chats at once). Please try again shortly.")
+            self._waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+            except asyncio.TimeoutError:
+                raise OllamaBusyError("The assistant is busy (queue wait timed out). Please try again shortly.")
+            finally:
+                self._waiting -= 1
+        else:
+            await self._semaphore.acquire()
+        try:
+            yield
+        finally:
+            self._semaphore.release()
+
+    async def post(self, path: str, payload: dict) -> httpx.Response:
+        """POST JSON to Ollama inside a slot; raises httpx errors to the caller."""
+        async with self.slot():
+            r = await self.client.post(path, json=payload)
+            r.raise_for_status()
+            return r
+
+    async def stream(self, path: str, payload: dict) -> AsyncIterator[dict[str, Any]]:
+        """
+        POST with "stream": true; yields one decoded JSON object per NDJSON line.
+        The slot is held until the caller stops iterating; closing early aborts the generation.
+        """
+        async with self.slot():
+            async with self.client.stream("POST", path, json={**payload, "stream": True}) as r:
+                if r.status_code >= 400:
+                    await r.aread()  # so the caller can read e.response.text
+                r.raise_for_status()
+                async for line in r.aiter_lines():
+                    if line.strip():
+                        yield json.loads(line)
+
+
+# Singleton for the app
+_ollama: Optional[OllamaClient] = None
+
+
+def get_ollama() -> OllamaClient:
+    global _ollama
+    if _ollama is None:
+        _ollama = OllamaClient(Settings())
+    return _ollama
@@ -0,0 +1,307 @@
+# Rotation engine: select credentials by type/category/age, generate new secrets per policy,
+# encrypt and write them in chunks (one commit per chunk), record a report. Optional scheduler.
+import asyncio
+import json
+import logging
+import secrets
+import string
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import Settings
+from app.crypto import VaultSealedError, get_container, unsealed_vaults, use_vault
+from app.db import database
+from app.db.models import Credential, RotationPolicy, RotationReport
+from app.models.schemas import RotationReportResponse, RotationSelector
+from app.services.credentials import ensure_unsealed
+from app.services.events import publish
+from app.services.sshkeys import fingerprint, get_key_pool, key_spec
+
+logger = logging.getLogger(__name__)
+settings = Settings()
+
+ALPHABETS = {
+    "urlsafe": string.ascii_letters + string.digits + "-_",
+    "alphanumeric": string.ascii_letters + string.digits,
+    "hex": "0123456789abcdef",
+    "ascii": string.ascii_letters + string.digits + "!#$%&()*+,-./:;<=>?@[]^_{|}~",
+}
+MIN_LENGTH, MAX_LENGTH = 8, 4096
+KEY_TYPES = ("ssh_key",)  # rotated to a new key pair, never to a random string; only when selected by type
+MIN_RSA_BITS = 2048  # smaller RSA keys are replaced by keys of this size
+
+
+def validate_selector(spec: RotationSelector) -> None:
+    if spec.alphabet not in ALPHABETS:
+        raise HTTPException(status_code=400, detail=f"Unknown alphabet '{spec.alphabet}'. Allowed: {', '.join(ALPHABETS)}")
+    if not MIN_LENGTH <= spec.length <= MAX_LENGTH:
+        raise HTTPException(status_code=400, detail=f"Length must be between {MIN_LENGTH} and {MAX_LENGTH}.")
+    if spec.older_than_days is not None and spec.older_than_days < 0:
+        raise HTTPException(status_code=400, detail="older_than_days must not be negative.")
+
+
+def generate_secret(length: int = 32, alphabet: str = "urlsafe") -> str:
+    """Random secret of exactly `length` characters from the named alphabet."""
+    chars = ALPHABETS[alphabet]
+    return "".join(secrets.choice(chars) for _ in range(length))
+
+
+def _selection_query(spec: RotationSelector, now: datetime):
+    q = select(Credential.id).order_by(Credential.id)
+    if spec.type:
+        q = q.where(Credential.type == spec.type)
+    else:
+        q = q.where(Credential.type.not_in(KEY_TYPES))
+    if spec.category:
+        q = q.where(Credential.category == spec.category)
+    if spec.older_than_days is not None:
+        q = q.where(Credential.updated_at < now - timedelta(days=spec.older_than_days))
+    return q
+
+
+async def _new_secrets(spec: RotationSelector, count: int) -> list[str]:
+    return [generate_secret(spec.length, spec.alphabet) for _ in range(count)]
+
+
+async def _new_key_pairs(db: AsyncSession, container, ids: list[int]) -> tuple[dict[int, tuple[str, str]], list[str]]:
+    """
+    New key pair per SSH key credential with the algorithm and size of its current key (RSA at least
+    MIN_RSA_BITS). Returns ({id: (private key, public key)}, errors for keys that cannot be read).
+    """
+    r = await db.execute(select(Credential.id, Credential.ciphertext).where(Credential.id.in_(ids)).order_by(Credential.id))
+    rows = r.all()
+    current = await container.decrypt_many_async([ciphertext for _, ciphertext in rows])
+    pool = get_key_pool()
+    pairs: dict[int, tuple[str, str]] = {}
+    errors: list[str] = []
+    for (cid, _), private_key in zip(rows, current):
+        try:
+            if private_key is None:
+                raise ValueError("secret does not decrypt")
+            algorithm, bits = key_spec(private_key)
+        except ValueError as e:
+            errors.append(f"ID {cid}: {e}")
+            continue
+        pairs[cid] = await pool.take(algorithm, max(bits, MIN_RSA_BITS) if algorithm == "rsa" else 0)
+    return pairs, errors
+
+
+async def rotate(
+    db: AsyncSession,
+    spec: RotationSelector,
+    *,
+    policy_id: Optional[int] = None,
+    trigger: str = "manual",
+    dry_run: bool = False,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> RotationReport:
+    """
+    Rotate all credentials matching spec. Chunks of settings.rotation_chunk_size are encrypted and
+    written with one bulk UPDATE and one commit each; a failing chunk is recorded and skipped.
+    SSH keys are only rotated when spec.type is "ssh_key", each to a new key pair of the same algorithm
+    and size; the report lists the new public key fingerprints.
+    If the vault is sealed during the run, it stops and the report lists what was rotated until then.
+    progress(done, total) is called after every chunk.
+    """
+    ensure_unsealed()
+    validate_selector(spec)
+    container = get_container()
+    started = datetime.utcnow()
+    ids = list((await db.execute(_selection_query(spec, started))).scalars().all())
+    rotated_ids: list[int] = []
+    fingerprints: dict[int, str] = {}
+    errors: list[str] = []
+    chunk_size = max(1, settings.rotation_chunk_size)
+    if progress:
+        progress(0, len(ids))
+    if not dry_run:
+        for start in range(0, len(ids), chunk_size):
+            chunk = ids[start:start + chunk_size]
+            now = datetime.utcnow()
+            try:
+                if spec.type == "ssh_key":
+                    pairs, key_errors = await _new_key_pairs(db, container, chunk)
+                    errors.extend(key_errors)
+                    targets = list(pairs)
+                    new_secrets = [pairs[cid][0] for cid in targets]
+                else:
+                    pairs, targets = {}, chunk
+                    new_secrets = await _new_secrets(spec, len(chunk))
+                ciphertexts = await container.encrypt_many_async(new_secrets)
+                rows = [{"id": cid, "ciphertext": ct, "updated_at": now} for cid, ct in zip(targets, ciphertexts)]
+                if rows:
+                    await db.execute(update(Credential), rows)
+                    await db.commit()
+                    rotated_ids.extend(targets)
+                    fingerprints.update((cid, fingerprint(pairs[cid][1])) for cid in targets if cid in pairs)
+                    publish("credentials.rotated", {"ids": targets, "updated_at": now.isoformat()})
+            except VaultSealedError:
+                # Sealed during the run: nothing more can be encrypted; report what was done
+                await db.rollback()
+                logger.warning("Rotation stopped at ID %s: vault sealed", chunk[0])
+                errors.append(f"IDs {chunk[0]}-{ids[-1]}: vault sealed")
+                break
+            except Exception as e:
+                await db.rollback()
+                logger.exception("Rotation chunk %s-%s failed", chunk[0], chunk[-1])
+                errors.append(f"IDs {chunk[0]}-{chunk[-1]}: {type(e).__name__}")
+            if progress:
+                progress(min(start + chunk_size, len(ids)), len(ids))
+            await asyncio.sleep(0)  # let other requests run between chunks
+    report = RotationReport(
+        policy_id=policy_id,
+        trigger=trigger,
+        dry_run=dry_run,
+        started_at=started,
+        finished_at=datetime.utcnow(),
+        selected=len(ids),
+        rotated=len(rotated_ids),
+        failed=len(ids) - len(rotated_ids) if not dry_run else 0,
+        details=json.dumps({
+            "credential_ids": ids if dry_run else rotated_ids,
+            "errors": errors,
+            "key_fingerprints": fingerprints,
+        }),
+    )
+    db.add(report)
+    await db.commit()
+    await db.refresh(report)
+    logger.info(
+        "Rotation %s (policy=%s, trigger=%s): %d selected, %d rotated, %d failed",
+        report.id, policy_id, trigger, report.selected, report.rotated, report.failed,
+    )
+    return report
+
+
+def policy_selector(policy: RotationPolicy) -> RotationSelector:
+    return RotationSelector(
+        type=policy.type,
+        category=policy.category,
+        older_than_days=policy.older_than_days,
+        length=policy.length,
+        alphabet=policy.alphabet,
+    )
+
+
+async def run_policy(db: AsyncSession, policy: RotationPolicy, trigger: str = "manual") -> RotationReport:
+    policy.last_run_at = datetime.utcnow()
+    await db.commit()
+    return await rotate(db, policy_selector(policy), policy_id=policy.id, trigger=trigger)
+
+
+def report_to_response(report: RotationReport) -> RotationReportResponse:
+    details = json.loads(report.details or "{}")
+    return RotationReportResponse(
+        id=report.id,
+        policy_id=report.policy_id,
+        trigger=report.trigger,
+        dry_run=report.dry_run,
+        started_at=report.started_at,
+        finished_at=report.finished_at,
+        selected=report.selected,
+        rotated=report.rotated,
+        failed=report.failed,
+        credential_ids=details.get("credential_ids", []),
+        errors=details.get("errors", []),
+        key_fingerprints={int(cid): fp for cid, fp in details.get("key_fingerprints", {}).items()},
+    )
+
+
+async def claim_policy(db: AsyncSession, policy: RotationPolicy, now: datetime) -> bool:
+    """
+    Set last_run_at only if nobody else did since we read the policy (compare-and-set), so with
+    several workers each due policy runs once.
+    """
+    last = RotationPolicy.last_run_at
+    r = await db.execute(
+        update(RotationPolicy)
+        .where(RotationPolicy.id == policy.id, last.is_(None) if policy.last_run_at is None else last == policy.last_run_at)
+        .values(last_run_at=now)
+    )
+    await db.commit()
+    if r.rowcount != 1:
+        return False
+    await db.refresh(policy)
+    return True
+
+
+async def due_policies(db: AsyncSession, now: datetime) -> list[RotationPolicy]:
+    r = await db.execute(
+        select(RotationPolicy).where(RotationPolicy.enabled.is_(True), RotationPolicy.interval_minutes.is_not(None))
+    )
+    return [
+        p for p in r.scalars().all()
+        if p.last_run_at is None or p.last_run_at + timedelta(minutes=p.interval_minutes) <= now
+    ]
+
+
+class RotationScheduler:
+    """
+    In-process loop: every rotation_scheduler_interval seconds, run policies that are due in each
+    unsealed vault. Sealed vaults are skipped (policies become due again after unseal).
+    """
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_due()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Rotation scheduler run failed")
+
+    async def run_due(self) -> int:
+        count = 0
+        for vault in unsealed_vaults():
+            try:
+                count += await self._run_vault(vault)
+            except Exception:
+                logger.exception("Scheduled rotation in vault %s failed", vault)
+        return count
+
+    async def _run_vault(self, vault: str) -> int:
+        with use_vault(vault):
+            async with database.session(vault) as db:
+                now = datetime.utcnow()
+                count = 0
+                for policy in await due_policies(db, now):
+                    if get_container().is_sealed:
+                        break
+                    if not await claim_policy(db, policy, now):
+                        continue  # run by another worker
+                    await rotate(db, policy_selector(policy), policy_id=policy.id, trigger="schedule")
+                    count += 1
+        return count
+
+
+# Singleton for the app
+_scheduler: Optional[RotationScheduler] = None
+
+
+def get_scheduler() -> RotationScheduler:
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = RotationScheduler(settings.rotation_scheduler_interval)
+    return _scheduler
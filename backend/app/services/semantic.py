@@ -0,0 +1,253 @@
+# Semantic search: decrypted name, type, category and description of every credential are embedded with
+# Ollama (/api/embed, OLLAMA_EMBED_MODEL) into a normalized NumPy matrix that exists only in memory and
+# only while the vault is unsealed. Built in batches after unseal (or on first search), then kept current
+# from the change feed (credential.created/updated/deleted), so it works the same in supervisor workers.
+import asyncio
+import logging
+from typing import Optional
+
+import httpx
+import numpy as np
+from fastapi import HTTPException
+from sqlalchemy import select
+
+from app.config import Settings
+from app.crypto import CryptoContainer, add_seal_listener, get_container
+from app.db import database
+from app.db.models import Credential
+from app.services.credentials import _decrypt_fields
+from app.services.events import Event, get_event_bus
+from app.services.ollama import OllamaBusyError, get_ollama, keep_alive
+
+logger = logging.getLogger(__name__)
+settings = Settings()
+
+FLUSH_DELAY = 0.2  # seconds: writes arriving within this are embedded in one request
+
+
+def embedding_text(name: str, type: str, category: str, description: str) -> str:
+    return "\n".join(part for part in (name, type.replace("_", " "), category, description) if part)
+
+
+class _VaultIndex:
+    """Credential IDs and their unit-length embeddings (one row per ID)."""
+
+    def __init__(self) -> None:
+        self.ids: list[int] = []
+        self.pos: dict[int, int] = {}
+        self.matrix: Optional[np.ndarray] = None
+
+    def upsert(self, ids: list[int], vectors: np.ndarray) -> None:
+        new_ids, new_rows = [], []
+        for cid, vector in zip(ids, vectors):
+            row = self.pos.get(cid)
+            if row is None:
+                new_ids.append(cid)
+                new_rows.append(vector)
+            else:
+                self.matrix[row] = vector
+        if new_rows:
+            block = np.stack(new_rows)
+            self.matrix = block if not self.ids else np.vstack([self.matrix, block])
+            for cid in new_ids:
+                self.pos[cid] = len(self.ids)
+                self.ids.append(cid)
+
+    def remove(self, cid: int) -> None:
+        row = self.pos.pop(cid, None)
+        if row is None:
+            return
+        last = len(self.ids) - 1
+        if row != last:  # move the last row into the gap
+            moved = self.ids[last]
+            self.matrix[row] = self.matrix[last]
+            self.ids[row] = moved
+            self.pos[moved] = row
+        self.ids.pop()
+        self.matrix = self.matrix[:last]
+
+    def top(self, query: np.ndarray, k: int) -> list[tuple[int, float]]:
+        if not self.ids or k < 1:
+            return []
+        scores = self.matrix @ query
+        k = min(k, len(self.ids))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [(self.ids[i], float(scores[i])) for i in best]
+
+
+class SemanticIndex:
+    def __init__(self, model: str, batch_size: int, min_score: float) -> None:
+        self.model = model.strip()
+        self.batch_size = max(1, batch_size)
+        self.min_score = min_score
+        self._indexes: dict[str, _VaultIndex] = {}
+        self._builds: dict[str, asyncio.Task] = {}
+        self._flushes: dict[str, asyncio.Task] = {}
+        self._pending: dict[str, dict[int, Optional[str]]] = {}  # vault -> {id: text, None = removed}
+        self._errors: dict[str, str] = {}
+        # Bumped on seal: a build or flush that started before must not install its (now stale) vectors
+        self._generation: dict[str, int] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.model)
+
+    def start(self) -> None:
+        if not self.enabled:
+            return
+        self._loop = asyncio.get_running_loop()
+        get_event_bus().add_listener(self._on_event)
+        add_seal_listener(self._on_seal)
+
+    async def stop(self) -> None:
+        tasks = [t for t in (*self._builds.values(), *self._flushes.values()) if not t.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._indexes.clear()
+
+    def _on_event(self, event: Event) -> None:
+        if event.type == "vault.unsealed":
+            self._schedule_build(event.vault)
+        elif event.type in ("credential.created", "credential.updated"):
+            d = event.data
+            text = embedding_text(d.get("name", ""), d.get("type", ""), d.get("category", ""), d.get("description", ""))
+            self._queue(event.vault, d["id"], text)
+        elif event.type == "credential.deleted":
+            self._queue(event.vault, event.data["id"], None)
+
+    def _on_seal(self, container: CryptoContainer) -> None:
+        # May run in a threadpool thread (sync seal endpoint): only drop references here
+        vault = container.vault
+        self._generation[vault] = self._generation.get(vault, 0) + 1
+        self._indexes.pop(vault, None)
+        self._pending.pop(vault, None)
+        for task in (self._builds.pop(vault, None), self._flushes.pop(vault, None)):
+            if task is not None and self._loop is not None:
+                self._loop.call_soon_threadsafe(task.cancel)
+
+    async def _embed(self, texts: list[str]) -> np.ndarray:
+        r = await get_ollama().post(
+            "/api/embed", {"model": self.model, "input": texts, "keep_alive": keep_alive(settings.ollama_keep_alive)}
+        )
+        vectors = np.asarray(r.json()["embeddings"], dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def _schedule_build(self, vault: str) -> asyncio.Task:
+        task = self._builds.get(vault)
+        if task is None or task.done():
+            task = self._builds[vault] = asyncio.create_task(self._build(vault))
+        return task
+
+    async def _build(self, vault: str) -> None:
+        generation = self._generation.get(vault, 0)
+        try:
+            container = get_container(vault)
+            if container.is_sealed:
+                return
+            async with database.read_session(vault) as db:
+                r = await db.execute(
+                    select(Credential.id, Credential.type, Credential.name, Credential.category, Credential.description)
+                )
+                rows = list(r.all())
+            names = await _decrypt_fields(container, [row.name for row in rows])
+            texts = [embedding_text(n, row.type, row.category, row.description) for row, (n, _) in zip(rows, names)]
+            index = _VaultIndex()
+            for start in range(0, len(rows), self.batch_size):
+                vectors = await self._embed(texts[start:start + self.batch_size])
+                index.upsert([row.id for row in rows[start:start + self.batch_size]], vectors)
+            if self._generation.get(vault, 0) == generation:
+                self._indexes[vault] = index
+                self._errors.pop(vault, None)
+                logger.info("Semantic index for vault %s: %d credentials", vault, len(index.ids))
+        except asyncio.CancelledError:
+            raise
+        except (httpx.HTTPError, OllamaBusyError, KeyError, ValueError, RuntimeError) as e:
+            self._errors[vault] = f"{type(e).__name__}: {e}"
+            logger.warning("Building the semantic index for vault %s failed: %s", vault, self._errors[vault])
+
+    def _queue(self, vault: str, cid: int, text: Optional[str]) -> None:
+        if vault not in self._indexes and vault not in self._builds:
+            return  # never built here: the first search builds from the current state
+        self._pending.setdefault(vault, {})[cid] = text
+        task = self._flushes.get(vault)
+        if task is None or task.done():
+            self._flushes[vault] = asyncio.create_task(self._flush(vault))
+
+    async def _flush(self, vault: str) -> None:
+        await asyncio.sleep(FLUSH_DELAY)
+        build = self._builds.get(vault)
+        if build is not None and not build.done():
+            await asyncio.wait([build])  # apply writes on top of the finished build
+        while self._pending.get(vault):
+            pending = self._pending.pop(vault)
+            index = self._indexes.get(vault)
+            if index is None:
+                return
+            generation = self._generation.get(vault, 0)
+            for cid in [cid for cid, text in pending.items() if text is None]:
+                index.remove(cid)
+            updates = [(cid, text) for cid, text in pending.items() if text is not None]
+            try:
+                for start in range(0, len(updates), self.batch_size):
+                    batch = updates[start:start + self.batch_size]
+                    vectors = await self._embed([text for _, text in batch])
+                    if self._generation.get(vault, 0) != generation:
+                        return
+                    index.upsert([cid for cid, _ in batch], vectors)
+            except (httpx.HTTPError, OllamaBusyError, KeyError, ValueError) as e:
+                # Index would silently miss these credentials: drop it, the next search rebuilds
+                logger.warning("Updating the semantic index for vault %s failed (%s), will rebuild", vault, e)
+                self._indexes.pop(vault, None)
+                return
+
+    async def search(self, vault: str, query: str, k: int) -> list[tuple[int, float]]:
+        """Top k (credential ID, cosine similarity), best first."""
+        if not self.enabled:
+            raise HTTPException(status_code=404, detail="Semantic search is off. Set OLLAMA_EMBED_MODEL.")
+        if get_container(vault).is_sealed:
+            raise HTTPException(status_code=503, detail="Vault is sealed. Unseal first.")
+        if vault not in self._indexes:
+            await asyncio.wait([self._schedule_build(vault)])  # a seal meanwhile cancels it: 503 below
+        flush = self._flushes.get(vault)
+        if flush is not None and not flush.done():
+            await asyncio.wait([flush])  # a search right after a write should find it
+        index = self._indexes.get(vault)
+        if index is None:
+            raise HTTPException(
+                status_code=503,
+                detail=f"Semantic index not available ({self._errors.get(vault, 'not built')}). "
+                       f"Is the embedding model '{self.model}' pulled in Ollama?",
+            )
+        try:
+            query_vector = (await self._embed([query]))[0]
+        except OllamaBusyError as e:
+            raise HTTPException(status_code=429, detail=str(e))
+        except (httpx.HTTPError, KeyError, ValueError) as e:
+            raise HTTPException(status_code=503, detail=f"Embedding the query failed: {type(e).__name__}: {e}")
+        return index.top(query_vector, k)
+
+    async def best_match(self, vault: str, query: str) -> Optional[int]:
+        """ID of the most similar credential if it scores at least min_score; None if none or unavailable."""
+        try:
+            results = await self.search(vault, query, 1)
+        except HTTPException:
+            return None
+        if results and results[0][1] >= self.min_score:
+            return results[0][0]
+        return None
+
+
+# Singleton for the app
+_index: Optional[SemanticIndex] = None
+
+
+def get_semantic_index() -> SemanticIndex:
+    global _index
+    if _index is None:
+        _index = SemanticIndex(settings.ollama_embed_model, settings.embed_batch_size, settings.semantic_min_score)
+    return _index
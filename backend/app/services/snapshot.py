@@ -0,0 +1,80 @@
+# Snapshot export: streams credentials in id order (chunks of rotation_chunk_size), decrypts them with the
+# vault's container and writes a read-only .kps file under the caller's snapshot key (see app/snapshot/format.py).
+import json
+import os
+import time
+from typing import BinaryIO, Optional
+
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import Settings
+from app.crypto import get_container
+from app.db.models import Credential
+from app.services.credentials import _decrypt_fields, ensure_unsealed
+from app.snapshot.format import HEADER, INDEX_ENTRY, MAGIC, NONCE_SIZE, VERSION, derive_keys, name_hmac
+
+settings = Settings()
+
+
+async def write_snapshot(
+    db: AsyncSession,
+    out: BinaryIO,
+    key: bytes,
+    *,
+    type_filter: Optional[str] = None,
+    category: Optional[str] = None,
+) -> int:
+    """
+    Write a snapshot of the matching credentials to out (seekable, positioned at 0), encrypted under
+    key (32 bytes, SnapshotError otherwise). Only the index (44 bytes per entry) is kept in memory.
+    Returns the entry count.
+    """
+    enc_key, mac_key, key_check = derive_keys(key)
+    ensure_unsealed()
+    container = get_container()
+    aes = AESGCM(enc_key)
+    out.write(b"\0" * HEADER.size)  # placeholder, rewritten at the end
+    index: list[tuple[bytes, int, int]] = []
+    offset = HEADER.size
+    last_id = 0
+    chunk_size = max(1, settings.rotation_chunk_size)
+    while True:
+        q = select(Credential).where(Credential.id > last_id).order_by(Credential.id).limit(chunk_size)
+        if type_filter:
+            q = q.where(Credential.type == type_filter)
+        if category:
+            q = q.where(Credential.category == category)
+        rows = list((await db.execute(q)).scalars().all())
+        if not rows:
+            break
+        last_id = rows[-1].id
+        fields = await _decrypt_fields(container, [v for cred in rows for v in (cred.name, cred.username or "")])
+        plain_secrets = await container.decrypt_many_async([cred.ciphertext for cred in rows])
+        for i, cred in enumerate(rows):
+            name, username = fields[2 * i][0], fields[2 * i + 1][0]
+            if plain_secrets[i] is None or not name:
+                continue  # unreadable entries are not exported
+            digest = name_hmac(mac_key, name)
+            plain = json.dumps({
+                "name": name,
+                "type": cred.type,
+                "username": username,
+                "category": cred.category,
+                "secret": plain_secrets[i],
+                "updated_at": cred.updated_at.isoformat() if cred.updated_at else None,
+            }, separators=(",", ":")).encode("utf-8")
+            nonce = os.urandom(NONCE_SIZE)
+            record = nonce + aes.encrypt(nonce, plain, digest)
+            out.write(record)
+            index.append((digest, offset, len(record)))
+            offset += len(record)
+        db.expunge_all()  # keep the session from holding every row
+    index.sort()
+    for entry in index:
+        out.write(INDEX_ENTRY.pack(*entry))
+    out.seek(0)
+    out.write(HEADER.pack(MAGIC, VERSION, 0, len(index), int(time.time()), key_check, offset, HEADER.size))
+    out.flush()
+    return len(index)
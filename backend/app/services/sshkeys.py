@@ -0,0 +1,171 @@
+# SSH key pairs (OpenSSH format): ed25519 generated inline, RSA in a process pool with a small
+# background-refilled stock of pre-generated keys, so creation latency stays flat under bursts.
+import asyncio
+import base64
+import hashlib
+import logging
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+from cryptography.exceptions import UnsupportedAlgorithm
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ed25519, rsa
+from fastapi import HTTPException
+
+from app.config import Settings
+
+logger = logging.getLogger(__name__)
+
+RSA_SIZES = (2048, 4096)
+ALGORITHMS = ("ed25519", "rsa")
+
+
+def generate_keypair(algorithm: str, bits: int = 4096) -> tuple[str, str]:
+    """Returns (private key, public key) in OpenSSH format. Module-level so the process pool can run it."""
+    if algorithm == "ed25519":
+        key = ed25519.Ed25519PrivateKey.generate()
+    else:
+        key = rsa.generate_private_key(public_exponent=65537, key_size=bits)
+    private = key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.OpenSSH,
+        serialization.NoEncryption(),
+    ).decode("ascii")
+    public = key.public_key().public_bytes(
+        serialization.Encoding.OpenSSH,
+        serialization.PublicFormat.OpenSSH,
+    ).decode("ascii")
+    return private, public
+
+
+def _load_private_key(private_key: str):
+    data = private_key.encode("utf-8")
+    if b"OPENSSH PRIVATE KEY" in data:
+        return serialization.load_ssh_private_key(data, password=None)
+    return serialization.load_pem_private_key(data, password=None)
+
+
+def public_key_from_private(private_key: str) -> str:
+    """OpenSSH public key for a stored private key (OpenSSH or PEM)."""
+    try:
+        key = _load_private_key(private_key)
+        return key.public_key().public_bytes(
+            serialization.Encoding.OpenSSH,
+            serialization.PublicFormat.OpenSSH,
+        ).decode("ascii")
+    except (ValueError, TypeError, UnsupportedAlgorithm) as e:
+        raise HTTPException(status_code=400, detail="Stored secret is not an unencrypted SSH private key.") from e
+
+
+def key_spec(private_key: str) -> tuple[str, int]:
+    """(algorithm, bits) of a stored private key, as taken by generate_keypair. ValueError if not ed25519/RSA."""
+    try:
+        key = _load_private_key(private_key)
+    except (ValueError, TypeError, UnsupportedAlgorithm) as e:
+        raise ValueError("not an unencrypted SSH private key") from e
+    if isinstance(key, ed25519.Ed25519PrivateKey):
+        return "ed25519", 0
+    if isinstance(key, rsa.RSAPrivateKey):
+        return "rsa", key.key_size
+    raise ValueError(f"unsupported key type {type(key).__name__}")
+
+
+def fingerprint(public_key: str) -> str:
+    """SHA256 fingerprint of an OpenSSH public key, as printed by ssh-keygen -l."""
+    blob = base64.b64decode(public_key.split()[1])
+    return "SHA256:" + base64.b64encode(hashlib.sha256(blob).digest()).decode("ascii").rstrip("=")
+
+
+def validate_key_spec(algorithm: str, bits: Optional[int]) -> int:
+    """Check algorithm/bits (422 if invalid); returns the RSA size to use (ignored for ed25519)."""
+    if algorithm not in ALGORITHMS:
+        raise HTTPException(status_code=422, detail=f"Unknown algorithm '{algorithm}'. Allowed: {', '.join(ALGORITHMS)}")
+    if algorithm == "rsa":
+        bits = bits or 4096
+        if bits not in RSA_SIZES:
+            raise HTTPException(status_code=422, detail=f"RSA key size must be one of {', '.join(map(str, RSA_SIZES))}.")
+        return bits
+    return 0
+
+
+class SSHKeyPool:
+    """
+    take(): ed25519 is generated inline (well under a millisecond). RSA keys come from a stock of
+    ssh_key_pool_size pre-generated keys per size; when empty, one is generated in the process pool.
+    Every take() triggers a background refill.
+    """
+
+    def __init__(self, pool_size: int, workers: int) -> None:
+        self.pool_size = max(0, pool_size)
+        self.workers = max(1, workers)
+        self._stock: dict[int, deque[tuple[str, str]]] = {bits: deque() for bits in RSA_SIZES}
+        self._refilling: dict[int, Optional[asyncio.Task]] = {bits: None for bits in RSA_SIZES}
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def start(self) -> None:
+        if self._executor is None:
+            # spawn: forking a process that runs an event loop and threads is unsafe
+            self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        for bits in RSA_SIZES:
+            self._schedule_refill(bits)
+
+    async def stop(self) -> None:
+        for task in self._refilling.values():
+            if task and not task.done():
+                task.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        for stock in self._stock.values():
+            stock.clear()
+
+    def stock(self) -> dict[str, int]:
+        return {f"rsa{bits}": len(keys) for bits, keys in self._stock.items()}
+
+    async def _generate(self, algorithm: str, bits: int) -> tuple[str, str]:
+        if self._executor is None:
+            self.start()
+        return await asyncio.get_running_loop().run_in_executor(self._executor, generate_keypair, algorithm, bits)
+
+    async def take(self, algorithm: str, bits: int) -> tuple[str, str]:
+        if algorithm == "ed25519":
+            return generate_keypair("ed25519")
+        stock = self._stock.get(bits)
+        if stock is None:  # no stock for this size (e.g. rotating an existing RSA-3072 key)
+            return await self._generate("rsa", bits)
+        pair = stock.popleft() if stock else await self._generate("rsa", bits)
+        self._schedule_refill(bits)
+        return pair
+
+    def _schedule_refill(self, bits: int) -> None:
+        task = self._refilling[bits]
+        if self.pool_size and (task is None or task.done()) and len(self._stock[bits]) < self.pool_size:
+            self._refilling[bits] = asyncio.create_task(self._refill(bits))
+
+    async def _refill(self, bits: int) -> None:
+        try:
+            while len(self._stock[bits]) < self.pool_size:
+                self._stock[bits].append(await self._generate("rsa", bits))
+        except asyncio.CancelledError:
+            raise
+        except BrokenProcessPool:
+            # Generator process killed (e.g. signal to the process group on shutdown): new pool on next use
+            logger.warning("RSA key generator processes terminated, refill of RSA-%d stopped", bits)
+            self._executor = None
+        except Exception:
+            logger.exception("Refilling RSA-%d key pool failed", bits)
+
+
+# Singleton for the app
+_pool: Optional[SSHKeyPool] = None
+
+
+def get_key_pool() -> SSHKeyPool:
+    global _pool
+    if _pool is None:
+        settings = Settings()
+        _pool = SSHKeyPool(settings.ssh_key_pool_size, settings.ssh_keygen_workers)
+    return _pool
@@ -0,0 +1,48 @@
+# Idle auto-seal: vaults without requests for vault_idle_seal_minutes are sealed (key dropped from memory)
+import asyncio
+import logging
+from typing import Optional
+
+from app.config import Settings
+from app.crypto import seal_idle
+
+logger = logging.getLogger(__name__)
+settings = Settings()
+
+
+class AutoSealer:
+    """Checks every minute (or more often for short timeouts); off when idle_minutes <= 0."""
+
+    def __init__(self, idle_minutes: float) -> None:
+        self.idle_seconds = idle_minutes * 60
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self.idle_seconds > 0 and self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(min(60.0, self.idle_seconds / 4))
+            for vault in seal_idle(self.idle_seconds):
+                logger.info("Vault %s sealed after %.0f minutes without requests", vault, self.idle_seconds / 60)
+
+
+# Singleton for the app
+_sealer: Optional[AutoSealer] = None
+
+
+def get_auto_sealer() -> AutoSealer:
+    global _sealer
+    if _sealer is None:
+        _sealer = AutoSealer(settings.vault_idle_seal_minutes)
+    return _sealer
@@ -0,0 +1,6 @@
+# Read-only encrypted snapshot files (.kps) for hosts that cannot reach the backend.
+# This package only needs the standard library and cryptography, so it can be copied to such hosts.
+from .format import SnapshotError
+from .reader import SnapshotReader
+
+__all__ = ["SnapshotError", "SnapshotReader"]
@@ -0,0 +1,65 @@
+# Snapshot file layout (all integers little-endian):
+#
+#   header   64 bytes  magic, version, entry count, created (unix time), key check,
+#                      offset of the index, offset of the first record
+#   records  per entry: 12-byte nonce + AES-256-GCM(JSON record), AAD = name HMAC
+#   index    count x (32-byte HMAC-SHA256 of the name, u64 record offset, u32 record length),
+#            sorted by HMAC -> binary search without reading records
+#
+# The 32-byte snapshot key never appears in the file; encryption and name-HMAC keys are derived from it.
+import base64
+import hashlib
+import hmac
+import secrets
+import struct
+
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+MAGIC = b"KPSNAP\x00\x01"
+VERSION = 1
+HEADER = struct.Struct("<8sHHIQ16sQQ8x")  # 64 bytes
+INDEX_ENTRY = struct.Struct("<32sQI")  # 44 bytes
+NONCE_SIZE = 12
+KEY_SIZE = 32
+
+
+class SnapshotError(ValueError):
+    """Invalid file, wrong key or damaged entry."""
+
+
+def _subkey(key: bytes, purpose: bytes) -> bytes:
+    return HKDF(algorithm=hashes.SHA256(), length=32, salt=None, info=b"keypilot-snapshot " + purpose).derive(key)
+
+
+def derive_keys(key: bytes) -> tuple[bytes, bytes, bytes]:
+    """(encryption key, name HMAC key, key check stored in the header)."""
+    if len(key) != KEY_SIZE:
+        raise SnapshotError("Snapshot key must be 32 bytes")
+    mac_key = _subkey(key, b"name")
+    check = hmac.new(mac_key, b"key-check", hashlib.sha256).digest()[:16]
+    return _subkey(key, b"enc"), mac_key, check
+
+
+def name_hmac(mac_key: bytes, name: str) -> bytes:
+    return hmac.new(mac_key, name.strip().encode("utf-8"), hashlib.sha256).digest()
+
+
+def generate_key() -> str:
+    """A new random snapshot key as text (base64url)."""
+    return encode_key(secrets.token_bytes(KEY_SIZE))
+
+
+def encode_key(key: bytes) -> str:
+    return base64.urlsafe_b64encode(key).decode("ascii").rstrip("=")
+
+
+def decode_key(text: str) -> bytes:
+    text = text.strip()
+    try:
+        key = base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+    except ValueError as e:
+        raise SnapshotError("Snapshot key is not valid base64") from e
+    if len(key) != KEY_SIZE:
+        raise SnapshotError("Snapshot key must be 32 bytes")
+    return key
@@ -0,0 +1,136 @@
+# Reader: memory-maps a snapshot and decrypts single entries by name (binary search over the index).
+#   python -m app.snapshot.reader <file.kps> <name>   (key in KEYPILOT_SNAPSHOT_KEY) -> prints the secret
+import json
+import mmap
+import os
+import sys
+from typing import Optional
+
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+from .format import (
+    HEADER,
+    INDEX_ENTRY,
+    MAGIC,
+    NONCE_SIZE,
+    VERSION,
+    SnapshotError,
+    decode_key,
+    derive_keys,
+    name_hmac,
+)
+
+
+class SnapshotReader:
+    """
+    with SnapshotReader(path, key) as snap: snap.get("db-prod")["secret"]
+    key: the snapshot key (bytes or the base64 text returned on export). Only touched pages are read.
+    """
+
+    def __init__(self, path: str, key: bytes | str) -> None:
+        raw_key = decode_key(key) if isinstance(key, str) else key
+        self._aes_key, self._mac_key, check = derive_keys(raw_key)
+        self._aes = AESGCM(self._aes_key)
+        with open(path, "rb") as f:
+            try:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError as e:  # empty file
+                raise SnapshotError("Not a KeyPilot snapshot") from e
+        try:
+            self._read_header(check)
+        except Exception:
+            self._map.close()
+            raise
+
+    def _read_header(self, check: bytes) -> None:
+        if len(self._map) < HEADER.size:
+            raise SnapshotError("Not a KeyPilot snapshot")
+        magic, version, _flags, count, created, key_check, index_offset, _data_offset = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise SnapshotError("Not a KeyPilot snapshot")
+        if version != VERSION:
+            raise SnapshotError(f"Unsupported snapshot version {version}")
+        if key_check != check:
+            raise SnapshotError("Wrong snapshot key")
+        if index_offset + count * INDEX_ENTRY.size > len(self._map):
+            raise SnapshotError("Snapshot is truncated")
+        self.count = count
+        self.created = created
+        self._index_offset = index_offset
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __enter__(self) -> "SnapshotReader":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._map.close()
+
+    def _entry(self, i: int) -> tuple[bytes, int, int]:
+        return INDEX_ENTRY.unpack_from(self._map, self._index_offset + i * INDEX_ENTRY.size)
+
+    def _first(self, digest: bytes) -> int:
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._entry(mid)[0] < digest:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _decrypt(self, digest: bytes, offset: int, length: int) -> dict:
+        record = self._map[offset:offset + length]
+        try:
+            plain = self._aes.decrypt(record[:NONCE_SIZE], record[NONCE_SIZE:], digest)
+        except InvalidTag as e:
+            raise SnapshotError("Snapshot entry is damaged") from e
+        return json.loads(plain)
+
+    def get_all(self, name: str) -> list[dict]:
+        """All entries with this name (names need not be unique, e.g. password and API key)."""
+        digest = name_hmac(self._mac_key, name)
+        result = []
+        i = self._first(digest)
+        while i < self.count:
+            entry_digest, offset, length = self._entry(i)
+            if entry_digest != digest:
+                break
+            result.append(self._decrypt(digest, offset, length))
+            i += 1
+        return result
+
+    def get(self, name: str, type: Optional[str] = None) -> Optional[dict]:
+        """Entry {name, type, username, category, secret, updated_at} or None."""
+        for entry in self.get_all(name):
+            if type is None or entry.get("type") == type:
+                return entry
+        return None
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = sys.argv[1:] if argv is None else argv
+    key = os.environ.get("KEYPILOT_SNAPSHOT_KEY")
+    if len(args) != 2 or not key:
+        print("usage: KEYPILOT_SNAPSHOT_KEY=... python -m app.snapshot.reader <file.kps> <name>", file=sys.stderr)
+        return 2
+    try:
+        with SnapshotReader(args[0], key) as snap:
+            entry = snap.get(args[1])
+    except (OSError, SnapshotError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    if entry is None:
+        print(f"not found: {args[1]}", file=sys.stderr)
+        return 1
+    sys.stdout.write(entry["secret"])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,63 @@
+# Multi-worker mode: python -m app.supervisor --workers 4 [--host ...] [--port ...]
+# The supervisor runs the key agent (unsealed keys, idle auto-seal) and starts uvicorn with N workers
+# that use it over a Unix socket, so unseal/seal apply to all workers at once.
+import argparse
+import asyncio
+import logging
+import os
+import shutil
+import signal
+import sys
+import tempfile
+
+os.environ.pop("KEY_AGENT_SOCKET", None)  # before app imports read settings: the supervisor holds the keys
+
+from app.crypto.agent import KeyAgentServer
+from app.db import database
+from app.main import init_db
+from app.services.vaults import get_auto_sealer
+
+logger = logging.getLogger("app.supervisor")
+
+
+def _parse_args(argv: list[str]) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="KeyPilot backend with a shared key agent for several workers")
+    p.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8000)
+    return p.parse_args(argv)
+
+
+async def _run(args: argparse.Namespace) -> int:
+    await init_db()  # once here: workers creating tables at the same time would collide
+    await database.engine.dispose()
+    # Private directory (0700) for the socket; removed on exit
+    runtime_dir = tempfile.mkdtemp(prefix="keypilot-agent-")
+    agent = KeyAgentServer(os.path.join(runtime_dir, "agent.sock"))
+    await agent.start()
+    get_auto_sealer().start()
+    env = dict(os.environ, KEY_AGENT_SOCKET=agent.path)
+    proc = await asyncio.create_subprocess_exec(
+        sys.executable, "-m", "uvicorn", "app.main:app",
+        "--workers", str(max(1, args.workers)), "--host", args.host, "--port", str(args.port),
+        env=env,
+    )
+    logger.info("Key agent on %s, %d workers (pid %d)", agent.path, args.workers, proc.pid)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, proc.send_signal, sig)
+    try:
+        return await proc.wait()
+    finally:
+        await get_auto_sealer().stop()
+        await agent.stop()
+        shutil.rmtree(runtime_dir, ignore_errors=True)
+
+
+def main(argv: list[str] | None = None) -> None:
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s:     %(message)s")
+    sys.exit(asyncio.run(_run(_parse_args(sys.argv[1:] if argv is None else argv))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,349 @@
+#!/usr/bin/env python
+# KeyPilot load test: drive the API with a weighted traffic mix at increasing concurrency.
+#
+# Usage (from backend/):
+#   python loadtest.py                                  # in-process (ASGI transport), stub LLM
+#   python loadtest.py --concurrency 1,8,32 --duration 15
+#   python loadtest.py --mix list=60,get_secret=20,create=5,update=5,chat=5,chat_stream=5
+#   python loadtest.py --mix list=50,search=50              # semantic search (stub embeddings)
+#   python loadtest.py --url http://localhost:8000      # running uvicorn (start it with
+#                                                       # OLLAMA_BASE_URL pointing at the stub, see --stub-port)
+#
+# In-process mode uses a throw-away database under backend/data/ and removes it afterwards.
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import httpx
+
+BACKEND_ROOT = Path(__file__).resolve().parent
+
+DEFAULT_MIX = "list=50,get_secret=20,create=10,update=10,chat=10"
+OPERATIONS = ("list", "get_secret", "create", "update", "chat", "chat_stream", "search")
+TYPES = ("password", "ssh_key", "api_key")
+CATEGORIES = ("Production", "Staging", "BTP", "DEV", "")
+CHAT_MESSAGES = (
+    "list all api keys in BTP",
+    "show all passwords",
+    "what can you do?",
+    "list credentials in Production",
+    "could you list the api keys we have in BTP",
+)
+SEARCH_QUERIES = ("production database password", "btp api key", "staging ssh access", "dev user")
+STUB_EMBED_DIM = 256
+
+
+# --- Stub LLM (Ollama API subset) ---
+
+def _stub_reply(message: str) -> str:
+    text = message.lower()
+    if "list" in text or "show all" in text:
+        type_ = "api_key" if "api key" in text else ("password" if "password" in text else None)
+        category = next((c for c in CATEGORIES if c and c.lower() in text), None)
+        return "INTENT: credential_list | PARAMS: " + json.dumps({"type": type_, "category": category})
+    return "INTENT: chat | PARAMS: {}"
+
+
+def _stub_embedding(text: str) -> list[float]:
+    """Hashed words and character trigrams: texts sharing words/fragments get a high cosine similarity."""
+    import hashlib
+
+    vector = [0.0] * STUB_EMBED_DIM
+    words = text.lower().split()
+    grams = words + [w[i:i + 3] for w in words for i in range(max(1, len(w) - 2))]
+    for gram in grams:
+        h = int.from_bytes(hashlib.blake2b(gram.encode("utf-8"), digest_size=4).digest(), "little")
+        vector[h % STUB_EMBED_DIM] += 1.0 if h & 0x80000000 else -1.0
+    return vector
+
+
+def build_stub_llm(latency: float):
+    """Minimal ASGI app answering /api/chat (JSON or NDJSON stream) and /api/embed like Ollama would."""
+    from starlette.applications import Starlette
+    from starlette.responses import JSONResponse, StreamingResponse
+    from starlette.routing import Route
+
+    def message(body: dict, content: str, done: bool) -> dict:
+        return {"model": body.get("model"), "message": {"role": "assistant", "content": content}, "done": done}
+
+    async def chat(request):
+        body = await request.json()
+        user = next((m["content"] for m in reversed(body.get("messages", [])) if m.get("role") == "user"), "")
+        reply = _stub_reply(user)
+        if not body.get("stream", True):
+            if latency:
+                await asyncio.sleep(latency)
+            return JSONResponse(message(body, reply, True))
+
+        async def chunks():
+            # Spread the latency over ~4-character tokens, like a model generating.
+            pieces = [reply[i:i + 4] for i in range(0, len(reply), 4)]
+            for piece in pieces:
+                if latency:
+                    await asyncio.sleep(latency / len(pieces))
+                yield json.dumps(message(body, piece, False)) + "\n"
+            yield json.dumps(message(body, "", True)) + "\n"
+
+        return StreamingResponse(chunks(), media_type="application/x-ndjson")
+
+    async def embed(request):
+        body = await request.json()
+        inputs = body.get("input", [])
+        texts = [inputs] if isinstance(inputs, str) else inputs
+        return JSONResponse({"model": body.get("model"), "embeddings": [_stub_embedding(t) for t in texts]})
+
+    return Starlette(routes=[Route("/api/chat", chat, methods=["POST"]), Route("/api/embed", embed, methods=["POST"])])
+
+
+async def start_stub_llm(port: int, latency: float):
+    import uvicorn
+
+    config = uvicorn.Config(build_stub_llm(latency), host="127.0.0.1", port=port, log_level="warning", lifespan="off")
+    server = uvicorn.Server(config)
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        if task.done():
+            task.result()
+        await asyncio.sleep(0.01)
+    return server, task
+
+
+# --- Traffic ---
+
+class Stats:
+    def __init__(self) -> None:
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+
+    def record(self, op: str, seconds: float, ok: bool) -> None:
+        self.latencies[op].append(seconds)
+        if not ok:
+            self.errors[op] += 1
+
+
+def _percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[idx]
+
+
+def parse_mix(raw: str) -> dict[str, float]:
+    mix = {}
+    for part in raw.split(","):
+        if not part.strip():
+            continue
+        op, _, weight = part.partition("=")
+        op = op.strip()
+        if op not in OPERATIONS:
+            raise SystemExit(f"Unknown operation '{op}' in --mix (allowed: {', '.join(OPERATIONS)})")
+        mix[op] = float(weight or 1)
+    if not mix or sum(mix.values()) <= 0:
+        raise SystemExit("--mix must contain at least one operation with weight > 0")
+    return mix
+
+
+async def _do(client: httpx.AsyncClient, op: str, ids: list[int]) -> bool:
+    if op == "list":
+        r = await client.get("/credentials")
+    elif op == "get_secret":
+        r = await client.get(f"/credentials/{random.choice(ids)}/secret")
+    elif op == "create":
+        r = await client.post("/credentials", json=_random_credential())
+        if r.status_code == 200:
+            ids.append(r.json()["id"])
+    elif op == "update":
+        r = await client.patch(f"/credentials/{random.choice(ids)}", json={"secret": os.urandom(18).hex()})
+    elif op == "chat":
+        r = await client.post("/chat", json={"message": random.choice(CHAT_MESSAGES)})
+    elif op == "search":
+        r = await client.get("/credentials/semantic-search", params={"q": random.choice(SEARCH_QUERIES), "k": 5})
+    else:
+        async with client.stream("POST", "/chat/stream", json={"message": random.choice(CHAT_MESSAGES)}) as r:
+            body = (await r.aread()).decode()
+        return r.status_code < 400 and "event: result" in body
+    return r.status_code < 400
+
+
+def _random_credential() -> dict:
+    n = random.randrange(1_000_000)
+    return {
+        "type": random.choice(TYPES),
+        "name": f"loadtest-{n}",
+        "username": f"user{n % 97}",
+        "category": random.choice(CATEGORIES),
+        "description": "created by loadtest.py",
+        "secret": os.urandom(18).hex(),
+    }
+
+
+async def run_level(client: httpx.AsyncClient, concurrency: int, duration: float, mix: dict[str, float], ids: list[int]):
+    stats = Stats()
+    ops, weights = list(mix), list(mix.values())
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            op = random.choices(ops, weights)[0]
+            t0 = time.perf_counter()
+            try:
+                ok = await _do(client, op, ids)
+            except httpx.HTTPError:
+                ok = False
+            stats.record(op, time.perf_counter() - t0, ok)
+
+    t_start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return stats, time.perf_counter() - t_start
+
+
+def summarize(stats: Stats, elapsed: float) -> list[dict]:
+    rows = []
+    all_latencies = []
+    for op in OPERATIONS:
+        values = sorted(stats.latencies.get(op, []))
+        if not values:
+            continue
+        all_latencies.extend(values)
+        rows.append(_row(op, values, stats.errors.get(op, 0), elapsed))
+    all_latencies.sort()
+    rows.append(_row("total", all_latencies, sum(stats.errors.values()), elapsed))
+    return rows
+
+
+def _row(op: str, values: list[float], errors: int, elapsed: float) -> dict:
+    n = len(values)
+    return {
+        "op": op,
+        "requests": n,
+        "rps": n / elapsed if elapsed else 0.0,
+        "p50_ms": _percentile(values, 50) * 1000,
+        "p95_ms": _percentile(values, 95) * 1000,
+        "p99_ms": _percentile(values, 99) * 1000,
+        "error_rate": errors / n if n else 0.0,
+    }
+
+
+def print_rows(concurrency: int, rows: list[dict]) -> None:
+    print(f"\nconcurrency={concurrency}")
+    print(f"  {'op':<13}{'requests':>9}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>9}")
+    for r in rows:
+        print(
+            f"  {r['op']:<13}{r['requests']:>9}{r['rps']:>10.1f}{r['p50_ms']:>10.1f}"
+            f"{r['p95_ms']:>10.1f}{r['p99_ms']:>10.1f}{r['error_rate']:>8.1%}"
+        )
+
+
+# --- Setup ---
+
+async def prepare_vault(client: httpx.AsyncClient, master_key: str, seed: int) -> list[int]:
+    r = await client.post("/vault/unseal", json={"master_key": master_key})
+    if r.status_code != 200:
+        raise SystemExit(f"Unseal failed ({r.status_code}): {r.text}")
+    r = await client.get("/credentials")
+    r.raise_for_status()
+    ids = [c["id"] for c in r.json()]
+    # Sequential on purpose: the seed must not fail because of the concurrency being measured.
+    for _ in range(max(0, seed - len(ids))):
+        r = await client.post("/credentials", json=_random_credential())
+        r.raise_for_status()
+        ids.append(r.json()["id"])
+    if not ids:
+        raise SystemExit("Vault has no credentials; use --seed > 0")
+    return ids
+
+
+async def main_async(args) -> list[dict]:
+    mix = parse_mix(args.mix)
+    levels = [int(x) for x in args.concurrency.split(",") if x.strip()]
+    stub_server, stub_task = await start_stub_llm(args.stub_port, args.llm_latency / 1000)
+    results = []
+    try:
+        if args.url:
+            print(f"Target: {args.url} (stub LLM on http://127.0.0.1:{args.stub_port})")
+            limits = httpx.Limits(max_connections=max(levels), max_keepalive_connections=max(levels))
+            async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+                results = await _run_all(client, args, mix, levels)
+        else:
+            from app.main import app
+
+            print("Target: in-process ASGI app (app.main:app), stub LLM on "
+                  f"http://127.0.0.1:{args.stub_port}")
+            # Report server errors as 500 responses instead of raising them in the client.
+            transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+            async with app.router.lifespan_context(app):
+                async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=args.timeout) as client:
+                    results = await _run_all(client, args, mix, levels)
+    finally:
+        stub_server.should_exit = True
+        await stub_task
+    return results
+
+
+async def _run_all(client, args, mix, levels) -> list[dict]:
+    ids = await prepare_vault(client, args.master_key, args.seed)
+    print(f"Vault ready: {len(ids)} credentials; mix: {mix}; {args.duration:g}s per level")
+    results = []
+    for c in levels:
+        stats, elapsed = await run_level(client, c, args.duration, mix, ids)
+        rows = summarize(stats, elapsed)
+        print_rows(c, rows)
+        results.append({"concurrency": c, "elapsed_s": elapsed, "endpoints": rows})
+    r = await client.get("/chat/stats")
+    if r.status_code == 200:
+        stats = r.json()
+        print(
+            f"\nchat: {stats['fast_path']} fast path, {stats['cache']} cache, {stats['llm']} LLM "
+            f"(offload rate {stats['offload_rate']:.0%})"
+        )
+    return results
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="KeyPilot load test (throughput and latency per endpoint).")
+    p.add_argument("--url", help="Base URL of a running backend; default: in-process app.main:app")
+    p.add_argument("--concurrency", default="1,4,16,64", help="Comma-separated concurrency levels")
+    p.add_argument("--duration", type=float, default=10.0, help="Seconds per concurrency level")
+    p.add_argument("--mix", default=DEFAULT_MIX, help=f"Weighted operations (default: {DEFAULT_MIX})")
+    p.add_argument("--seed", type=int, default=200, help="Credentials to create before the run")
+    p.add_argument("--master-key", default="loadtest-master-key", help="Master key used to unseal")
+    p.add_argument("--llm-latency", type=float, default=50.0, help="Stub LLM response time in ms")
+    p.add_argument("--stub-port", type=int, default=11499, help="Port for the stub LLM (Ollama API)")
+    p.add_argument("--timeout", type=float, default=30.0, help="HTTP timeout per request in seconds")
+    p.add_argument("--json", dest="json_out", help="Also write results as JSON to this file")
+    p.add_argument("--verbose", action="store_true", help="Show backend error logs (tracebacks of failed requests)")
+    args = p.parse_args()
+    if not args.verbose:
+        # Failed requests are counted in the report; their tracebacks would drown it.
+        logging.getLogger("app").setLevel(logging.CRITICAL)
+
+    tmp_dir = None
+    if not args.url:
+        # Settings are read at import time: point the app at a scratch DB and the stub LLM first.
+        (BACKEND_ROOT / "data").mkdir(exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(prefix="loadtest-", dir=BACKEND_ROOT / "data")
+        os.environ["KEYPILOT_DATA_DIR"] = tmp_dir
+        os.environ["OLLAMA_BASE_URL"] = f"http://127.0.0.1:{args.stub_port}"
+        os.environ.setdefault("OLLAMA_EMBED_MODEL", "stub-embed")  # the search mix needs the semantic index
+        sys.path.insert(0, str(BACKEND_ROOT))
+    try:
+        results = asyncio.run(main_async(args))
+    finally:
+        if tmp_dir:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    if args.json_out:
+        Path(args.json_out).write_text(json.dumps(results, indent=2))
+        print(f"\nResults written to {args.json_out}")
+
+
+if __name__ == "__main__":
+    main()
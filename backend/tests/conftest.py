@@ -0,0 +1,159 @@
+# Test setup: throwaway data directory under backend/ (the config only accepts paths there) and the port
+# of the stub Ollama server. Set before any app module is imported, since Settings are read at import time.
+import asyncio
+import hashlib
+import json
+import os
+import re
+import shutil
+import socket
+import sys
+import tempfile
+from pathlib import Path
+
+import httpx
+import numpy as np
+import pytest
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, StreamingResponse
+
+BACKEND = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND))
+
+_data_root = BACKEND / "data"
+_created_data_root = not _data_root.exists()
+_data_root.mkdir(exist_ok=True)
+DATA_DIR = tempfile.mkdtemp(prefix="pytest-", dir=_data_root)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+STUB_PORT = _free_port()
+
+os.environ.update({
+    "KEYPILOT_DATA_DIR": DATA_DIR,
+    "OLLAMA_BASE_URL": f"http://127.0.0.1:{STUB_PORT}",
+    "OLLAMA_WARMUP": "false",
+    "OLLAMA_EMBED_MODEL": "stub-embed",
+    "SSH_KEY_POOL_SIZE": "0",  # no key generator processes
+    "ROTATION_SCHEDULER_INTERVAL": "0",
+    "SQL_STATS": "false",
+})
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(DATA_DIR, ignore_errors=True)
+    if _created_data_root:
+        shutil.rmtree(_data_root, ignore_errors=True)
+
+
+# --- App harness for async tests (@pytest.mark.anyio): the app with its lifespan, a stub Ollama
+# (/api/embed) on STUB_PORT and a vault of its own per test. The app is imported in the fixture,
+# after the environment above is set.
+
+def stub_embedding(text: str, dims: int = 1024) -> list[float]:
+    """Bag of words: texts sharing words are similar, so expected scores can be worked out by hand."""
+    vector = np.zeros(dims, dtype=np.float32)
+    for word in re.findall(r"[a-z0-9]+", text.lower()):
+        vector[int(hashlib.md5(word.encode("utf-8")).hexdigest(), 16) % dims] += 1.0
+    return vector.tolist()
+
+
+class StubOllama:
+    """
+    Records the inputs of every /api/embed request; delay holds each response back. /api/chat answers
+    with reply (streamed: fragments of chunk_size characters, fragment_delay apart) or chat_status.
+    """
+
+    def __init__(self) -> None:
+        self.requests: list[list[str]] = []
+        self.delay = 0.0
+        self.chats: list[dict] = []  # /api/chat payloads
+        self.reply = ""
+        self.chat_status = 200
+        self.chunk_size = 4
+        self.fragment_delay = 0.0
+        self.fragments_sent = 0  # of the last stream
+        self.stream_finished = False  # False after a stream the client closed early
+        self.app = FastAPI()
+
+        @self.app.post("/api/embed")
+        async def embed(body: dict):
+            self.requests.append(list(body["input"]))
+            await asyncio.sleep(self.delay)
+            return {"model": body["model"], "embeddings": [stub_embedding(text) for text in body["input"]]}
+
+        @self.app.post("/api/chat")
+        async def chat(body: dict):
+            self.chats.append(body)
+            if self.chat_status != 200:
+                return JSONResponse({"error": f"model '{body['model']}' not found"}, status_code=self.chat_status)
+            if not body.get("stream"):
+                return {"model": body["model"], "message": {"role": "assistant", "content": self.reply}, "done": True}
+            return StreamingResponse(self._stream(body["model"]), media_type="application/x-ndjson")
+
+    async def _stream(self, model: str):
+        self.fragments_sent, self.stream_finished = 0, False
+        for start in range(0, len(self.reply), self.chunk_size):
+            message = {"role": "assistant", "content": self.reply[start:start + self.chunk_size]}
+            yield json.dumps({"model": model, "message": message, "done": False}) + "\n\n"  # blank lines are skipped
+            self.fragments_sent += 1
+            await asyncio.sleep(self.fragment_delay)
+        yield json.dumps({"model": model, "message": {"role": "assistant", "content": ""}, "done": True}) + "\n"
+        self.stream_finished = True
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def stub_ollama(anyio_backend):
+    stub = StubOllama()
+    server = uvicorn.Server(uvicorn.Config(stub.app, host="127.0.0.1", port=STUB_PORT, log_level="warning"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    try:
+        yield stub
+    finally:
+        server.should_exit = True
+        await serving
+
+
+@pytest.fixture
+def vault(request) -> str:
+    """Vault named after the test: its own database, sealed until the test unseals it."""
+    return re.sub(r"[^a-z0-9_-]+", "-", request.node.name.lower())[:63].strip("-")
+
+
+@pytest.fixture
+async def client(stub_ollama, vault):
+    """httpx client on the app (lifespan included), addressing the test's vault. Seals every vault after the test."""
+    from app.crypto import get_container, unsealed_vaults
+    from app.main import app
+
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://test", headers={"X-KeyPilot-Vault": vault}
+        ) as c:
+            yield c
+        for name in unsealed_vaults():  # so no test counts against another's VAULT_MAX_UNSEALED
+            get_container(name).seal()
+
+
+async def unseal(client, master_key: str = "test") -> None:
+    r = await client.post("/vault/unseal", json={"master_key": master_key})
+    assert r.status_code == 200, r.text
+
+
+async def create(client, name: str, type: str = "password", category: str = "", secret: str = "s3cret") -> int:
+    r = await client.post("/credentials", json={"type": type, "name": name, "category": category, "secret": secret})
+    assert r.status_code == 200, r.text
+    return r.json()["id"]
@@ -0,0 +1,160 @@
+# Chat agent (services/agent.py): the rule-based fast path, what reaches the model with the chat
+# history, and when the intent cache is used for follow-ups.
+import json
+
+import pytest
+
+from app.services import agent
+from app.services.intent_cache import IntentCache
+
+SHOW_REPLY = "**prod db** (password)\nSecret: hunter2-Zq81"
+
+
+def test_assistant_replies_never_reach_the_model():
+    history = [
+        {"role": "user", "content": "show prod db"},
+        {"role": "assistant", "content": SHOW_REPLY},
+        {"role": "user", "content": "list passwords"},
+        {"role": "assistant", "content": "Credentials found:\n- [1] prod db (password)"},
+    ]
+    payload = agent._chat_payload("and what is its username", history)
+
+    assert "hunter2" not in json.dumps(payload)
+    assert [m["role"] for m in payload["messages"]] == ["system", "user", "user", "user"]
+    assert [m["content"] for m in payload["messages"][1:]] == ["show prod db", "list passwords", "and what is its username"]
+
+
+def test_history_window_counts_user_turns(monkeypatch):
+    monkeypatch.setattr(agent.settings, "ollama_context_messages", 2)
+    history = []
+    for i in range(4):
+        history += [{"role": "user", "content": f"message {i}"}, {"role": "assistant", "content": f"reply {i}"}]
+    payload = agent._chat_payload("next", history)
+    assert [m["content"] for m in payload["messages"][1:]] == ["message 2", "message 3", "next"]
+
+    monkeypatch.setattr(agent.settings, "ollama_context_messages", 0)
+    assert [m["role"] for m in agent._chat_payload("next", history)["messages"]] == ["system", "user"]
+
+
+def test_self_contained_messages_use_the_cache_despite_history(monkeypatch):
+    cache = IntentCache(16, 60)
+    monkeypatch.setattr(agent, "get_intent_cache", lambda: cache)
+    message = "I need the grafana token from monitoring"
+    history = [{"role": "user", "content": "list api keys"}]
+
+    assert agent._known_intent(message, history) is None
+    agent._remember_intent(message, history, "credential_show", {"name": "grafana token"})
+    assert agent._known_intent(message, history) == ("credential_show", {"name": "grafana token"}, "cache")
+    assert agent._known_intent(message) == ("credential_show", {"name": "grafana token"}, "cache")
+
+
+def test_follow_ups_skip_the_cache(monkeypatch):
+    cache = IntentCache(16, 60)
+    monkeypatch.setattr(agent, "get_intent_cache", lambda: cache)
+    history = [{"role": "user", "content": "show grafana token"}]
+
+    for message in ("and its username as well", "now the same for jenkins", "what about that one"):
+        agent._remember_intent(message, history, "credential_show", {"name": "grafana token"})
+        assert agent._known_intent(message, history) is None
+    assert len(cache) == 0
+
+    # Without history there is nothing to refer to: the text alone decides
+    agent._remember_intent("and its username as well", None, "credential_show", {"name": "its username"})
+    assert agent._known_intent("and its username as well") == ("credential_show", {"name": "its username"}, "cache")
+
+
+@pytest.mark.parametrize("message", ["show it", "show that one", "get it again", "show prod db again", "delete id 17 again"])
+def test_follow_ups_are_left_to_the_llm_with_history(message, monkeypatch):
+    monkeypatch.setattr(agent, "get_intent_cache", lambda: IntentCache(16, 60))
+    history = [{"role": "user", "content": "show prod db"}]
+    assert agent._known_intent(message, history) is None
+
+
+@pytest.mark.parametrize("message, expected", [
+    ("list passwords", ("credential_list", {"type": "password", "category": None})),
+    ("get entries", ("credential_list", {"type": None, "category": None})),
+    ("show passwords", ("credential_list", {"type": "password", "category": None})),
+    ("show all api keys for BTP", ("credential_list", {"type": "api_key", "category": "BTP"})),
+    ("list ssh keys in category 'Prod'", ("credential_list", {"type": "ssh_key", "category": "Prod"})),
+    ("list api-keys under the group BTP", ("credential_list", {"type": "api_key", "category": "BTP"})),
+    ("show 17", ("credential_show", {"id": 17})),
+    ("get #4", ("credential_show", {"id": 4})),
+    ("show the password with id 17", ("credential_show", {"id": 17})),
+    ("show password for prod db", ("credential_show", {"name": "prod db"})),
+    ("please show prod db.", ("credential_show", {"name": "prod db"})),
+    ("show the password for “SAP HANA”", ("credential_show", {"name": "SAP HANA"})),
+    ('show "me"', ("credential_show", {"name": "me"})),  # quoted: a name after all
+    ('create a password named "SAP HANA Prod"', ("credential_create", {"type": "password", "name": "SAP HANA Prod"})),
+    ("save a password for backup server", ("credential_create", {"type": "password", "name": "backup server"})),
+    ("add an api key for grafana in category Monitoring",
+     ("credential_create", {"type": "api_key", "name": "grafana", "category": "Monitoring"})),
+    # Rotate and delete: only with an explicit ID
+    ("delete id 17", ("credential_delete", {"id": 17})),
+    ("remove the password with id: 17", ("credential_delete", {"id": 17})),
+    ("delete #4", ("credential_delete", {"id": 4})),
+    ("rotate id 17", ("credential_rotate", {"id": 17})),
+    ("regenerate the api key with the id 9", ("credential_rotate", {"id": 9})),
+])
+def test_fast_path_handles_common_commands(message, expected):
+    assert agent._fast_intent(message) == expected
+
+
+@pytest.mark.parametrize("message", [
+    # Irreversible: the LLM unless the ID is explicit ("id 17", "#17"), never by name
+    "delete 17",
+    "rotate number 17",
+    "delete id 17 and 18",
+    "remove prod db",
+    "rotate the key",
+    "rotate password for RFC User DEV",
+    # Follow-ups: "it" and "that one" are not names
+    "show it",
+    "show that one",
+    "get it again",
+    "display this",
+    "show them",
+    "get the same one",
+    "show prod db again",
+    # Generic nouns and sentence starts are not names
+    "show password",
+    "show the key",
+    "show my password",
+    "show me how to add a key",
+    "show a b c d e f g",
+    # Questions
+    "what is the password for prod?",
+    "show prod db?",
+    # Name and description mixed ("for ... under the name ...")
+    "create a password for server prod-01 under the name SAP HANA Prod",
+    "add a key for jenkins called deploy",
+    "",
+])
+def test_fast_path_leaves_unclear_and_destructive_messages_to_the_llm(message):
+    assert agent._fast_intent(message) is None
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ('"SAP HANA"', ("SAP HANA", True)),
+    ("'prod db'", ("prod db", True)),
+    ("“SAP HANA”", ("SAP HANA", True)),
+    ('" padded "', ("padded", True)),
+    ("prod db", ("prod db", False)),
+    ("'unbalanced", ("'unbalanced", False)),
+    ('"', ('"', False)),
+])
+def test_clean_name_strips_matching_quotes(raw, expected):
+    assert agent._clean_name(raw) == expected
+
+
+@pytest.mark.parametrize("name, quoted, confidence", [
+    ("prod db", False, 0.85),
+    ("prod db", True, 0.95),
+    ("me", True, 0.95),
+    ("me how to add a key", False, 0.3),
+    ("all", False, 0.3),
+    ("the passwords", False, 0.3),
+    ("one two three four five six seven", False, 0.3),
+    ("", False, 0.0),
+])
+def test_name_confidence(name, quoted, confidence):
+    assert agent._name_confidence(name, quoted) == confidence
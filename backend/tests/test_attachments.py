@@ -0,0 +1,151 @@
+# Attachments (services/attachments.py) through the API: chunked round trips, chunk boundaries, the size
+# limit, and chunks that were reordered, truncated or moved to another credential in the database.
+import os
+
+import pytest
+from sqlalchemy import delete, update
+
+from conftest import create, unseal
+from app.db import database
+from app.db.models import Attachment, AttachmentChunk
+from app.services import attachments
+
+pytestmark = pytest.mark.anyio
+
+CHUNK = 1024  # the smallest chunk size allowed
+
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(attachments.settings, "attachment_chunk_size", CHUNK)
+
+
+async def upload(client, credential_id: int, content: bytes, compress: bool = False, filename: str = "kubeconfig"):
+    return await client.post(
+        f"/credentials/{credential_id}/attachments",
+        params={"filename": filename, "compress": compress},
+        content=content,
+        headers={"Content-Type": "application/x-yaml"},
+    )
+
+
+async def stored(client, credential_id: int, content: bytes, compress: bool = False) -> dict:
+    r = await upload(client, credential_id, content, compress)
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+async def download(client, credential_id: int, attachment_id: int) -> bytes:
+    r = await client.get(f"/credentials/{credential_id}/attachments/{attachment_id}")
+    assert r.status_code == 200, r.text
+    return r.content
+
+
+async def chunk_count(vault: str, attachment_id: int) -> int:
+    async with database.session(vault) as db:
+        return (await db.get(Attachment, attachment_id)).chunk_count
+
+
+@pytest.mark.parametrize("size, chunks", [
+    (0, 1),
+    (1, 1),
+    (CHUNK - 1, 1),
+    (CHUNK, 1),  # exactly full: no empty trailing chunk
+    (CHUNK + 1, 2),
+    (3 * CHUNK, 3),
+    (10 * CHUNK + 17, 11),
+])
+async def test_round_trip_across_chunk_boundaries(client, vault, small_chunks, size, chunks):
+    await unseal(client)
+    cid = await create(client, "prod cluster")
+    content = os.urandom(size)
+
+    att = await stored(client, cid, content)
+    assert (att["size"], att["compression"], att["filename"]) == (size, "none", "kubeconfig")
+    assert att["stored_size"] == size + chunks * (attachments.NONCE_SIZE + attachments.TAG_SIZE)
+    assert await chunk_count(vault, att["id"]) == chunks
+    assert await download(client, cid, att["id"]) == content
+
+
+async def test_compressed_round_trip(client, vault, small_chunks):
+    await unseal(client)
+    cid = await create(client, "prod cluster")
+    content = os.urandom(20 * CHUNK).hex().encode()  # hex text: compresses to about half
+
+    att = await stored(client, cid, content, compress=True)
+    assert att["compression"] == "zlib" and att["size"] == len(content)
+    assert 1 < await chunk_count(vault, att["id"]) < len(content) // CHUNK
+    r = await client.get(f"/credentials/{cid}/attachments/{att['id']}")
+    assert r.content == content and r.headers["content-length"] == str(len(content))
+    assert r.headers["content-disposition"] == "attachment; filename*=utf-8''kubeconfig"
+
+    listed = (await client.get(f"/credentials/{cid}/attachments")).json()
+    assert [(a["id"], a["filename"]) for a in listed] == [(att["id"], "kubeconfig")]
+
+
+async def test_size_limit(client, monkeypatch, small_chunks):
+    monkeypatch.setattr(attachments.settings, "attachment_max_size_mb", 1)
+    await unseal(client)
+    cid = await create(client, "prod cluster")
+
+    assert (await upload(client, cid, bytes(1024 * 1024))).status_code == 200
+    r = await upload(client, cid, bytes(1024 * 1024 + 1))
+    assert r.status_code == 413
+    assert len((await client.get(f"/credentials/{cid}/attachments")).json()) == 1  # nothing stored
+
+
+async def test_upload_checks(client):
+    await unseal(client)
+    cid = await create(client, "prod cluster")
+    assert (await upload(client, cid + 1, b"x")).status_code == 404
+    assert (await upload(client, cid, b"x", filename=" ")).status_code == 400
+    assert (await client.get(f"/credentials/{cid}/attachments/999")).status_code == 404
+
+
+async def test_reordered_chunks_are_rejected(client, vault, small_chunks):
+    await unseal(client)
+    cid = await create(client, "prod cluster")
+    att = await stored(client, cid, os.urandom(3 * CHUNK))
+
+    async with database.session(vault) as db:
+        for seq, new_seq in ((0, -1), (1, 0), (-1, 1)):  # swap chunks 0 and 1
+            await db.execute(
+                update(AttachmentChunk)
+                .where(AttachmentChunk.attachment_id == att["id"], AttachmentChunk.seq == seq)
+                .values(seq=new_seq)
+            )
+        await db.commit()
+    with pytest.raises(RuntimeError, match="Chunk 0 .* failed authentication"):
+        await client.get(f"/credentials/{cid}/attachments/{att['id']}")
+
+
+async def test_truncated_attachment_is_rejected(client, vault, small_chunks):
+    await unseal(client)
+    cid = await create(client, "prod cluster")
+    att = await stored(client, cid, os.urandom(3 * CHUNK))
+
+    async with database.session(vault) as db:
+        await db.execute(delete(AttachmentChunk).where(AttachmentChunk.attachment_id == att["id"], AttachmentChunk.seq == 2))
+        await db.commit()
+    with pytest.raises(RuntimeError, match="Chunk 2 .* is missing"):
+        await client.get(f"/credentials/{cid}/attachments/{att['id']}")
+
+    # Dropping the last chunk from the count as well: the new last chunk lacks the "last" flag
+    async with database.session(vault) as db:
+        await db.execute(update(Attachment).where(Attachment.id == att["id"]).values(chunk_count=2))
+        await db.commit()
+    with pytest.raises(RuntimeError, match="Chunk 1 .* failed authentication"):
+        await client.get(f"/credentials/{cid}/attachments/{att['id']}")
+
+
+async def test_attachment_moved_to_another_credential_is_rejected(client, vault):
+    await unseal(client)
+    cid = await create(client, "prod cluster")
+    other = await create(client, "dev cluster")
+    att = await stored(client, cid, b"apiVersion: v1\n")
+
+    async with database.session(vault) as db:
+        await db.execute(update(Attachment).where(Attachment.id == att["id"]).values(credential_id=other))
+        await db.commit()
+    with pytest.raises(RuntimeError, match="failed authentication"):
+        await client.get(f"/credentials/{other}/attachments/{att['id']}")
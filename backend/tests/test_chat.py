@@ -0,0 +1,115 @@
+# Chat streaming (services/agent.py execute_stream, POST /chat/stream) against the stub Ollama: tokens of
+# free-text replies, the intent event and early stop of the generation, and errors before and after
+# the first event.
+import asyncio
+import json
+
+import pytest
+
+from conftest import create, unseal
+from app.services import agent
+
+pytestmark = pytest.mark.anyio
+
+LIST_PASSWORDS = 'INTENT: credential_list | PARAMS: {"type": "password", "category": null}'
+
+
+@pytest.fixture(autouse=True)
+def no_intent_cache(monkeypatch):
+    monkeypatch.setattr(agent.get_intent_cache(), "max_size", 0)
+
+
+async def stream(client, message: str) -> list[tuple[str, dict]]:
+    r = await client.post("/chat/stream", json={"message": message})
+    assert r.status_code == 200, r.text
+    assert r.headers["content-type"].startswith("text/event-stream")
+    events = []
+    for block in r.text.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+@pytest.mark.parametrize("line, rest", [
+    (LIST_PASSWORDS, ""),
+    (LIST_PASSWORDS, "\nand then some"),
+    ('  INTENT: credential_show | PARAMS: {"name": "a}b \\" {"}', " rest"),  # braces and quotes in strings
+    ('INTENT: credential_show | PARAMS: {"name": {"nested": 1}}', "}"),
+])
+def test_intent_line_end(line, rest):
+    assert agent._intent_line_end(line + rest) == len(line)
+
+
+@pytest.mark.parametrize("text", [
+    'INTENT: credential_show | PARAMS: {"name": "unfinished',
+    'INTENT: credential_show | PARAMS: {"name": "a"',
+    "INTENT: credential_list | PARAMS:",
+    "Hello",
+])
+def test_intent_line_incomplete(text):
+    assert agent._intent_line_end(text) is None
+
+
+async def test_llm_intent_stops_the_generation(client, stub_ollama):
+    await unseal(client)
+    await create(client, "prod db")
+    stub_ollama.reply = LIST_PASSWORDS + "\n" + "The model would go on rambling here. " * 20
+    stub_ollama.fragment_delay = 0.01
+
+    events = await stream(client, "which of my logins are there in the vault")
+    assert [e for e, _ in events] == ["intent", "result"]
+    assert events[0][1] == {"intent": "credential_list", "handled_by": "llm"}
+    assert events[1][1] == {"reply": "Credentials found:\n- [1] prod db (password)",
+                            "action_performed": "credential_list", "handled_by": "llm"}
+    assert stub_ollama.chats[-1]["stream"] is True
+
+    # The rest of the generation was not awaited: Ollama saw the connection close
+    await asyncio.sleep(0.3)
+    assert not stub_ollama.stream_finished
+    assert stub_ollama.fragments_sent < len(stub_ollama.reply) // stub_ollama.chunk_size
+
+
+async def test_free_text_is_streamed_as_tokens(client, stub_ollama):
+    await unseal(client)
+    stub_ollama.reply = "I can list, show, create, rotate and delete credentials."
+    events = await stream(client, "what can you do for me")
+
+    tokens = [d["text"] for e, d in events if e == "token"]
+    assert len(tokens) > 1 and "".join(tokens) == stub_ollama.reply
+    assert [e for e, _ in events if e != "token"] == ["result"]
+    assert events[-1][1] == {"reply": stub_ollama.reply, "action_performed": None, "handled_by": "llm"}
+    assert stub_ollama.stream_finished
+
+
+async def test_chat_intent_then_text(client, stub_ollama):
+    await unseal(client)
+    stub_ollama.reply = "INTENT: chat | PARAMS: {}\nSure, ask me anything about your credentials."
+    events = await stream(client, "hello there")
+    assert events[0] == ("intent", {"intent": "chat", "handled_by": "llm"})
+    assert "".join(d["text"] for e, d in events if e == "token").strip() == "Sure, ask me anything about your credentials."
+    assert events[-1][0] == "result" and events[-1][1]["action_performed"] is None
+
+
+async def test_fast_path_needs_no_model(client, stub_ollama):
+    await unseal(client)
+    events = await stream(client, "list passwords")
+    assert events[0] == ("intent", {"intent": "credential_list", "handled_by": "fast_path"})
+    assert events[1] == ("result", {"reply": "No matching credentials found.", "action_performed": "credential_list",
+                                    "handled_by": "fast_path"})
+    assert stub_ollama.chats == []
+
+
+async def test_errors(client, stub_ollama):
+    await unseal(client)
+    # Before the first event: a plain HTTP error, no stream
+    stub_ollama.chat_status = 404
+    r = await client.post("/chat/stream", json={"message": "which logins do I have"})
+    assert r.status_code == 503 and "not found" in r.json()["detail"]
+
+    # After the first event: an SSE "error" event ends the stream
+    stub_ollama.chat_status = 200
+    stub_ollama.reply = LIST_PASSWORDS
+    await client.post("/vault/seal")
+    events = await stream(client, "which logins do I have")
+    assert [e for e, _ in events] == ["intent", "error"]
+    assert events[1][1]["status"] == 503 and "sealed" in events[1][1]["detail"]
@@ -0,0 +1,50 @@
+# Credential list (api/credentials.py): ETag and If-None-Match revalidation, and the sealed-vault check.
+import pytest
+
+from conftest import create, unseal
+from app.api.credentials import _etag_matches
+
+ETAG = 'W/"0123abcd"'
+
+
+@pytest.mark.parametrize("header, matches", [
+    ('W/"0123abcd"', True),
+    ('"0123abcd"', True),  # weak comparison: the W/ prefix does not matter
+    ('"other", W/"0123abcd"', True),
+    ('W/"other" ,  "0123abcd" ', True),
+    ("*", True),
+    ('"other", *', True),
+    ("", False),
+    ('"other"', False),
+    ('W/"0123abcd', False),
+    ('"0123abc"', False),
+    ('"0123abcd0"', False),  # a match of a substring is no match
+    ('W/"0123abcd"x', False),
+])
+def test_if_none_match(header, matches):
+    assert _etag_matches(header, ETAG) is matches
+
+
+@pytest.mark.anyio
+async def test_list_revalidation(client):
+    await unseal(client)
+    await create(client, "prod db")
+
+    r = await client.get("/credentials")
+    etag = r.headers["etag"]
+    assert r.status_code == 200 and [c["name"] for c in r.json()] == ["prod db"]
+    for header in (etag, f'"stale", {etag}', etag.removeprefix("W/"), "*"):
+        r = await client.get("/credentials", headers={"If-None-Match": header})
+        assert r.status_code == 304 and r.headers["etag"] == etag and r.content == b""
+
+    # Filters have their own ETag
+    r = await client.get("/credentials", params={"type": "api_key"}, headers={"If-None-Match": etag})
+    assert r.status_code == 200 and r.json() == []
+
+    await create(client, "grafana")
+    r = await client.get("/credentials", headers={"If-None-Match": etag})
+    assert r.status_code == 200 and r.headers["etag"] != etag and len(r.json()) == 2
+
+    # Sealed: no 304 from a stale ETag either
+    await client.post("/vault/seal")
+    assert (await client.get("/credentials", headers={"If-None-Match": "*"})).status_code == 503
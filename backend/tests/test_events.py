@@ -0,0 +1,126 @@
+# Change feed (services/events.py, GET /events): resume with Last-Event-ID, a reset when the missed
+# events are gone, and the buffer being cleared on seal. The endpoint is called directly: its stream
+# never ends, and the ASGI test transport reads whole responses.
+import asyncio
+import json
+
+import pytest
+
+from conftest import create, unseal
+from app.api.events import events as events_endpoint
+from app.crypto import current_vault
+from app.services.events import get_event_bus
+
+pytestmark = pytest.mark.anyio
+
+
+class Stream:
+    """One /events connection: next() returns the next event as (id, type, data), skipping keep-alives."""
+
+    def __init__(self, response) -> None:
+        self.body = response.body_iterator
+
+    async def next(self, timeout: float = 2.0) -> tuple[int, str, dict]:
+        while True:
+            chunk = await asyncio.wait_for(self.body.__anext__(), timeout)
+            if not chunk.startswith(":"):
+                break
+        fields = dict(line.split(": ", 1) for line in chunk.strip().split("\n"))
+        return int(fields["id"]), fields["event"], json.loads(fields["data"])
+
+    async def take(self, n: int) -> list[tuple[int, str, dict]]:
+        return [await self.next() for _ in range(n)]
+
+    async def close(self) -> None:
+        await self.body.aclose()
+
+
+@pytest.fixture
+async def connect(client, vault):
+    """connect(last_id, header=True) opens /events on the test's vault, by Last-Event-ID header or query."""
+    current_vault.set(vault)
+    streams: list[Stream] = []
+
+    async def open_stream(last_id=None, header: bool = True) -> Stream:
+        raw = None if last_id is None else str(last_id)
+        response = await events_endpoint(last_event_id=None if header else raw, last_event_id_header=raw if header else None)
+        streams.append(Stream(response))
+        return streams[-1]
+
+    yield open_stream
+    for stream in streams:
+        await stream.close()
+
+
+async def created(client, connect, names: list[str]) -> list[int]:
+    """Creates the credentials while a stream listens; returns the ids of their events."""
+    stream = await connect()
+    for name in names:
+        await create(client, name)
+    events = await stream.take(len(names))
+    assert [(type, data["name"]) for _, type, data in events] == [("credential.created", n) for n in names]
+    await stream.close()
+    return [seq for seq, _, _ in events]
+
+
+async def test_resume_replays_missed_events(client, connect):
+    await unseal(client)
+    seqs = await created(client, connect, ["a", "b", "c"])
+    assert seqs == sorted(seqs)
+
+    stream = await connect(seqs[0])
+    assert [(seq, data["name"]) for seq, _, data in await stream.take(2)] == [(seqs[1], "b"), (seqs[2], "c")]
+    await create(client, "d")  # then live events, without a duplicate
+    seq, type, data = await stream.next()
+    assert (type, data["name"]) == ("credential.created", "d") and seq > seqs[2]
+
+    stream = await connect(seqs[1], header=False)  # ?last_event_id= works the same
+    assert [data["name"] for _, _, data in await stream.take(2)] == ["c", "d"]
+
+    stream = await connect(seq)  # up to date: nothing to replay
+    with pytest.raises(asyncio.TimeoutError):
+        await stream.next(timeout=0.2)
+
+
+@pytest.mark.parametrize("resume", ["dropped", "earlier run", "future", "garbage"])
+async def test_gap_means_reset(client, connect, monkeypatch, resume):
+    await unseal(client)
+    bus = get_event_bus()
+    seqs = await created(client, connect, ["a", "b", "c", "d"])
+    monkeypatch.setattr(bus, "buffer_size", 2)
+    await create(client, "e")  # the buffer keeps d and e only
+    last_id = {"dropped": seqs[0], "earlier run": bus._first_seq - 1, "future": bus.last_seq + 10, "garbage": "x"}[resume]
+
+    stream = await connect(last_id)
+    if resume == "garbage":  # unreadable id: a fresh subscription, not a reset
+        await create(client, "f")
+        _, type, data = await stream.next()
+        assert (type, data["name"]) == ("credential.created", "f")
+        return
+    seq, type, data = await stream.next()
+    assert (seq, type) == (bus.last_seq, "reset") and data["reason"] == "missed events are no longer available"
+    await create(client, "f")  # the buffered events are not sent after the reset; live ones are
+    assert (await stream.next())[2]["name"] == "f"
+
+    # Resuming from the last dropped event is no gap: the buffer now holds e and f
+    stream = await connect(seqs[3])
+    assert [data["name"] for _, _, data in await stream.take(2)] == ["e", "f"]
+
+
+async def test_seal_clears_the_buffer(client, connect, vault):
+    await unseal(client)
+    seqs = await created(client, connect, ["prod db", "grafana"])
+    bus = get_event_bus()
+
+    await client.post("/vault/seal")
+    buffered = list(bus._buffers.get(vault, ()))
+    assert [e.type for e in buffered] == ["vault.sealed"]  # no decrypted names left in memory
+    assert "prod db" not in json.dumps([e.data for e in buffered])
+
+    stream = await connect(seqs[0])
+    seq, type, _ = await stream.next()
+    assert type == "reset"
+    # Resuming right after the last event before the seal loses nothing: only vault.sealed follows
+    stream = await connect(seqs[1])
+    seq, type, _ = await stream.next()
+    assert type == "vault.sealed" and seq == buffered[0].seq
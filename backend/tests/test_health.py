@@ -0,0 +1,119 @@
+# Password health (services/health.py): strength scores, reuse detection by keyed fingerprints, the
+# incremental scan, and the list of common passwords.
+import pytest
+
+from conftest import create, unseal
+from app.crypto import CryptoContainer
+from app.services import health
+from app.services.health import HealthScanner, load_common_passwords, score_secret
+
+pytestmark = pytest.mark.anyio
+
+SHARED = "Shared-Secret-2024!"
+
+
+@pytest.mark.parametrize("secret, score, reasons", [
+    ("password", 0, ["well-known password"]),
+    ("PassWord", 0, ["well-known password"]),
+    ("", 0, ["few character classes", "shorter than 12 characters"]),
+    ("a" * 24, 0, ["many repeated characters"]),
+    ("sunshine", 2, ["few character classes", "shorter than 12 characters"]),
+    ("Tr0ub4dor&3", 2, ["shorter than 12 characters"]),  # strong classes, but short
+    ("abcd1234Efgh", 2, ["contains a keyboard or alphabet sequence"]),
+    ("Sunshine2024", 3, []),
+    ("xK9#mQ2$vL7!pR4@", 4, []),
+    ("ölbaum-Straße-42Ü", 4, []),
+    ("correct horse battery staple", 4, ["many repeated characters"]),  # long enough anyway
+])
+def test_score_secret(secret, score, reasons):
+    assert score_secret(secret) == (score, reasons)
+
+
+def test_common_password_list(tmp_path):
+    path = tmp_path / "common.txt"
+    path.write_text("sunshine\n  Dragon2000 \n\n", encoding="utf-8")
+    common = load_common_passwords(str(path))
+    assert common == {"sunshine", "dragon2000"}
+
+    assert score_secret("Sunshine", common) == (0, ["common password"])
+    assert score_secret("DRAGON2000", common) == (0, ["common password"])
+    assert score_secret("Sunshine2024", common) == (3, [])
+    # Without a list nothing is called common
+    assert score_secret("Sunshine")[1] != ["common password"]
+    assert load_common_passwords(None) == frozenset()
+    assert load_common_passwords(str(tmp_path / "missing.txt")) == frozenset()
+
+
+def test_fingerprints_are_keyed_per_vault():
+    a, b = CryptoContainer("health-fp-a"), CryptoContainer("health-fp-b")
+    a.unseal("key a")
+    b.unseal("key b")
+    try:
+        same, same_again, other = a.fingerprint_many([SHARED, SHARED, SHARED + " "])
+        assert same == same_again != other
+        assert b.fingerprint_many([SHARED]) != [same]
+    finally:
+        a.seal()
+        b.seal()
+
+
+async def report(client, **params) -> dict:
+    r = await client.get("/credentials/health", params=params)
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+async def test_reuse_weak_and_incremental_scan(client):
+    await unseal(client)
+    shared = [
+        await create(client, "prod db", secret=SHARED),
+        await create(client, "grafana", type="api_key", secret=SHARED),
+        await create(client, "backup", secret=SHARED),
+    ]
+    weak_id = await create(client, "wiki", secret="sunshine")
+    strong_id = await create(client, "jenkins", secret="xK9#mQ2$vL7!pR4@")
+    await create(client, "ci", secret="xK9#mQ2$vL7!pR4@ ")  # one character apart: not reused
+
+    first = await report(client)
+    assert (first["total"], first["rescanned"]) == (6, 6)
+    assert [[e["id"] for e in group] for group in first["reused"]] == [shared]
+    assert [e["name"] for e in first["reused"][0]] == ["prod db", "grafana", "backup"]
+    assert [(e["id"], e["score"], e["reasons"]) for e in first["weak"]] == [
+        (weak_id, 2, ["few character classes", "shorter than 12 characters"]),
+    ]
+    assert first["stale"] == [] and first["unreadable"] == []
+    assert SHARED not in str(first) and "sunshine" not in str(first)
+
+    # Unchanged: the cached report
+    assert await report(client) == first
+
+    # Only the changed credential is decrypted again
+    r = await client.patch(f"/credentials/{shared[2]}", json={"secret": "password"})
+    assert r.status_code == 200, r.text
+    second = await report(client)
+    assert second["rescanned"] == 1
+    assert [[e["id"] for e in group] for group in second["reused"]] == [shared[:2]]
+    assert [(e["id"], e["score"], e["reasons"]) for e in second["weak"]] == [
+        (shared[2], 0, ["well-known password"]),
+        (weak_id, 2, ["few character classes", "shorter than 12 characters"]),
+    ]
+
+    # A deleted credential leaves its group; one left is no reuse
+    assert (await client.delete(f"/credentials/{shared[1]}")).status_code == 204
+    third = await report(client)
+    assert (third["total"], third["rescanned"], third["reused"]) == (5, 0, [])
+
+    stale = await report(client, stale_days=0)
+    assert len(stale["stale"]) == 5 and stale["stale_days"] == 0
+    assert strong_id in {e["id"] for e in stale["stale"]}
+
+
+async def test_configured_list_marks_common_passwords(client, monkeypatch, tmp_path):
+    path = tmp_path / "common.txt"
+    path.write_text("tigger2000\n", encoding="utf-8")
+    monkeypatch.setattr(health, "_scanner", HealthScanner(250, 4, 3, load_common_passwords(str(path))))
+    await unseal(client)
+    cid = await create(client, "router", secret="Tigger2000")
+
+    weak = (await report(client))["weak"]
+    assert [(e["id"], e["score"], e["reasons"]) for e in weak] == [(cid, 0, ["common password"])]
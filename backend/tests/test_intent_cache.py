@@ -0,0 +1,142 @@
+# Intent cache (services/intent_cache.py): hits and misses, invalidation when the model or system prompt
+# changes, TTL expiry, LRU eviction, what is never cached, and clearing on seal.
+import pytest
+
+from app.crypto import CryptoContainer, container
+from app.services import agent, intent_cache
+from app.services.intent_cache import IntentCache, normalize_message, prompt_hash
+
+MODEL = "llama3.2:latest"
+PROMPT = prompt_hash("system prompt")
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controls time.monotonic() as seen by the cache."""
+    now = [1000.0]
+    monkeypatch.setattr(intent_cache.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_hits_and_misses():
+    cache = IntentCache(16, 60)
+    assert cache.get("show grafana token", MODEL, PROMPT) is None
+    assert cache.put("show grafana token", MODEL, PROMPT, "credential_show", {"name": "grafana token"})
+
+    # Case, whitespace and trailing punctuation are the same message
+    for message in ("show grafana token", "  Show   GRAFANA token?! ", "show grafana token."):
+        assert cache.get(message, MODEL, PROMPT) == ("credential_show", {"name": "grafana token"})
+    assert cache.get("show grafana tokens", MODEL, PROMPT) is None
+    assert (cache.hits, cache.misses) == (3, 2)
+
+    # Callers get copies: changing a result does not change the entry
+    cache.get("show grafana token", MODEL, PROMPT)[1]["name"] = "changed"
+    assert cache.get("show grafana token", MODEL, PROMPT)[1] == {"name": "grafana token"}
+
+
+def test_message_text_is_not_kept():
+    cache = IntentCache(16, 60)
+    cache.put("show grafana token", MODEL, PROMPT, "credential_show", {"id": 3})
+    assert "grafana" not in repr(list(cache._entries))
+    assert normalize_message(" A  b. ") == "a b"
+
+
+@pytest.mark.parametrize("model, prompt", [("mistral:latest", PROMPT), (MODEL, prompt_hash("new system prompt"))])
+def test_new_model_or_prompt_drops_all_entries(model, prompt):
+    cache = IntentCache(16, 60)
+    cache.put("list passwords in prod", MODEL, PROMPT, "credential_list", {"type": "password"})
+    cache.put("show jenkins", MODEL, PROMPT, "credential_show", {"name": "jenkins"})
+    assert cache._generation == (MODEL, PROMPT)
+
+    assert cache.get("show jenkins", model, prompt) is None
+    assert len(cache) == 0 and cache._generation == (model, prompt)
+    # Back to the old generation: the old entries do not come back
+    assert cache.get("show jenkins", MODEL, PROMPT) is None
+
+
+def test_agent_keys_entries_by_model_and_prompt(monkeypatch):
+    cache = IntentCache(16, 60)
+    monkeypatch.setattr(agent, "get_intent_cache", lambda: cache)
+    monkeypatch.setattr(agent.settings, "ollama_model", "llama3.2")
+    agent._remember_intent("I need the jenkins deploy token", None, "credential_show", {"name": "jenkins"})
+    assert cache._generation == ("llama3.2:latest", agent._SYSTEM_PROMPT_HASH)
+    assert agent._known_intent("I need the jenkins deploy token") == ("credential_show", {"name": "jenkins"}, "cache")
+
+    monkeypatch.setattr(agent.settings, "ollama_model", "mistral")
+    assert agent._known_intent("I need the jenkins deploy token") is None
+    assert len(cache) == 0
+
+
+def test_entries_expire(clock):
+    cache = IntentCache(16, 60)
+    cache.put("show jenkins", MODEL, PROMPT, "credential_show", {"name": "jenkins"})
+    clock[0] += 60
+    assert cache.get("show jenkins", MODEL, PROMPT) is not None
+    clock[0] += 0.1
+    assert cache.get("show jenkins", MODEL, PROMPT) is None
+    assert len(cache) == 0  # the expired entry was removed on the miss
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = IntentCache(3, 60)
+    for name in ("a", "b", "c"):
+        cache.put(f"show {name}", MODEL, PROMPT, "credential_show", {"name": name})
+    cache.get("show a", MODEL, PROMPT)  # a is used: b is now the oldest
+    cache.put("show d", MODEL, PROMPT, "credential_show", {"name": "d"})
+
+    assert len(cache) == 3
+    assert cache.get("show b", MODEL, PROMPT) is None
+    assert [cache.get(f"show {n}", MODEL, PROMPT)[1]["name"] for n in ("a", "c", "d")] == ["a", "c", "d"]
+
+    # Storing an existing message again refreshes it instead of adding an entry
+    cache.put("show a", MODEL, PROMPT, "credential_show", {"name": "a2"})
+    cache.put("show e", MODEL, PROMPT, "credential_show", {"name": "e"})
+    assert cache.get("show a", MODEL, PROMPT)[1] == {"name": "a2"}
+    assert cache.get("show c", MODEL, PROMPT) is None
+
+
+@pytest.mark.parametrize("intent, params", [
+    ("chat", {"reply": "Hello"}),
+    # Actions that change the vault: the model decides again every time
+    ("credential_delete", {"id": 3}),
+    ("credential_delete", {"name": "prod db"}),
+    ("credential_rotate", {"name": "prod db"}),
+    ("credential_create", {"type": "password", "name": "db"}),
+    # Secret values, even in a read-only intent
+    ("credential_show", {"name": "db", "secret": "hunter2"}),
+    ("credential_list", {"type": None, "Password": "hunter2"}),
+])
+def test_only_read_only_results_without_secrets_are_cached(intent, params):
+    cache = IntentCache(16, 60)
+    assert cache.put("message", MODEL, PROMPT, intent, params) is False
+    assert len(cache) == 0
+
+
+def test_delete_is_never_served_from_the_cache(monkeypatch):
+    cache = IntentCache(16, 60)
+    monkeypatch.setattr(agent, "get_intent_cache", lambda: cache)
+    message = "please get rid of the old jenkins deploy token"
+    agent._remember_intent(message, None, "credential_delete", {"name": "jenkins deploy token"})
+    assert agent._known_intent(message) is None
+    assert len(cache) == 0
+
+
+@pytest.mark.parametrize("size, ttl", [(0, 60), (16, 0)])
+def test_disabled_cache_stores_nothing(size, ttl):
+    cache = IntentCache(size, ttl)
+    assert not cache.enabled
+    assert cache.put("show jenkins", MODEL, PROMPT, "credential_show", {"name": "jenkins"}) is False
+    assert cache.get("show jenkins", MODEL, PROMPT) is None and cache.misses == 0
+
+
+def test_seal_clears_the_cache(monkeypatch):
+    monkeypatch.setattr(intent_cache, "_cache", None)
+    monkeypatch.setattr(container, "_seal_listeners", list(container._seal_listeners))
+    cache = intent_cache.get_intent_cache()
+    assert intent_cache.get_intent_cache() is cache
+    cache.put("show jenkins", MODEL, PROMPT, "credential_show", {"name": "jenkins"})
+
+    vault = CryptoContainer("intent-cache-seal")
+    vault.unseal("k")
+    vault.seal()
+    assert len(cache) == 0
@@ -0,0 +1,153 @@
+# Background jobs (services/jobs.py) through the API: progress and ETA while running, the re-encryption
+# job, and jobs aborted by a seal while running or still queued.
+import asyncio
+
+import pytest
+from sqlalchemy import select
+
+from conftest import create, unseal
+from app.crypto import VaultSealedError, get_container
+from app.db import database
+from app.db.models import Attachment, Credential
+from app.services import jobs
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def gate(client, monkeypatch):
+    """Registers job kind "wait": reports 1 of 4 done after 0.2 s, then waits until the gate is set."""
+    monkeypatch.setattr(jobs, "_KINDS", dict(jobs._KINDS))
+    event = asyncio.Event()
+
+    @jobs.job_handler("wait")
+    async def wait(ctx, db, params):
+        ctx.progress(0, 4)
+        await asyncio.sleep(0.2)
+        ctx.progress(1, 4, "one of four")
+        await event.wait()
+        ctx.progress(4, 4, "done")
+        return {"waited": True}
+
+    yield event
+    event.set()  # jobs a failed test left waiting finish before the kind is unregistered
+    await asyncio.sleep(0.05)
+
+
+async def start(client, kind: str, params: dict | None = None) -> dict:
+    r = await client.post("/jobs", json={"kind": kind, "params": params or {}})
+    assert r.status_code == 202, r.text
+    return r.json()
+
+
+async def until(client, job_id: int, condition, timeout: float = 5.0) -> dict:
+    for _ in range(int(timeout / 0.02)):
+        job = (await client.get(f"/jobs/{job_id}")).json()
+        if condition(job):
+            return job
+        await asyncio.sleep(0.02)
+    raise AssertionError(f"job {job_id} stuck: {job}")
+
+
+def finished(job: dict) -> bool:
+    return job["status"] in jobs.FINISHED
+
+
+async def test_progress_and_eta(client, gate):
+    await unseal(client)
+    job = await start(client, "wait")
+    assert job["status"] == "queued" and job["eta_seconds"] is None
+
+    job = await until(client, job["id"], lambda j: j["done"] == 1)
+    assert (job["status"], job["total"], job["message"]) == ("running", 4, "one of four")
+    assert 0.5 <= job["eta_seconds"] < 5  # 1 of 4 took at least 0.2 s: 3 more to go
+
+    gate.set()
+    job = await until(client, job["id"], finished)
+    assert (job["status"], job["done"], job["total"], job["result"]) == ("succeeded", 4, 4, {"waited": True})
+    assert job["eta_seconds"] is None and job["error"] is None and job["finished_at"] is not None
+
+
+async def test_unknown_kind_and_sealed_vault(client):
+    await unseal(client)
+    assert (await client.post("/jobs", json={"kind": "frobnicate"})).status_code == 400
+    await client.post("/vault/seal")
+    assert (await client.post("/jobs", json={"kind": "reencrypt"})).status_code == 503
+
+
+async def test_seal_aborts_running_and_queued_jobs(client, gate):
+    await unseal(client)
+    running = [await start(client, "wait") for _ in range(jobs.settings.job_workers)]
+    queued = await start(client, "wait")
+    for job in running:
+        await until(client, job["id"], lambda j: j["status"] == "running")
+    assert (await client.get(f"/jobs/{queued['id']}")).json()["status"] == "queued"
+
+    await client.post("/vault/seal")
+    for job in running:
+        job = await until(client, job["id"], finished)
+        assert (job["status"], job["error"]) == ("aborted", "Vault was sealed")
+    job = await until(client, queued["id"], finished)
+    assert (job["status"], job["error"], job["started_at"]) == ("aborted", "Vault was sealed", None)
+
+    # Cancelling is for users: "cancelled", not "aborted"
+    await unseal(client)
+    job = await start(client, "wait")
+    await until(client, job["id"], lambda j: j["status"] == "running")
+    assert (await client.post(f"/jobs/{job['id']}/cancel")).status_code == 200
+    job = await until(client, job["id"], finished)
+    assert (job["status"], job["error"]) == ("cancelled", "Cancelled by user")
+    assert (await client.post(f"/jobs/{job['id']}/cancel")).status_code == 409
+
+
+async def test_reencrypt_refreshes_every_value_in_chunks(client, vault, monkeypatch):
+    monkeypatch.setattr(jobs.settings, "rotation_chunk_size", 2)
+    await unseal(client)
+    ids = [await create(client, f"server {i}", secret=f"secret {i}") for i in range(5)]
+    for i in range(3):
+        r = await client.post(f"/credentials/{ids[0]}/attachments", params={"filename": f"file {i}"}, content=b"data")
+        assert r.status_code == 200, r.text
+
+    async def stored():
+        async with database.session(vault) as db:
+            creds = (await db.execute(select(Credential.ciphertext, Credential.name, Credential.updated_at))).all()
+            atts = (await db.execute(select(Attachment.filename, Attachment.wrapped_key))).all()
+        return creds, atts
+
+    creds_before, atts_before = await stored()
+    job = await until(client, (await start(client, "reencrypt"))["id"], finished)
+    assert job["status"] == "succeeded", job
+    assert job["result"] == {"reencrypted": 5, "skipped": [], "attachments": 3}
+    assert (job["done"], job["total"]) == (8, 8)
+
+    creds_after, atts_after = await stored()
+    for before, after in zip(creds_before, creds_after):
+        assert before.ciphertext != after.ciphertext and before.name != after.name  # fresh nonces
+        assert before.updated_at == after.updated_at
+    for before, after in zip(atts_before, atts_after):
+        assert before.filename != after.filename and before.wrapped_key != after.wrapped_key
+    # Same key: everything still decrypts
+    assert (await client.get(f"/credentials/{ids[4]}/secret")).json()["secret"] == "secret 4"
+    files = (await client.get(f"/credentials/{ids[0]}/attachments")).json()
+    assert [f["filename"] for f in files] == ["file 0", "file 1", "file 2"]
+    assert (await client.get(f"/credentials/{ids[0]}/attachments/{files[2]['id']}")).content == b"data"
+
+
+async def test_seal_from_another_thread(client, gate, vault, monkeypatch):
+    await unseal(client)
+    running = await start(client, "wait")
+    await until(client, running["id"], lambda j: j["status"] == "running")
+
+    # The seal listener runs in the sealing thread; the task is cancelled on the event loop
+    await asyncio.to_thread(get_container(vault).seal)
+    job = await until(client, running["id"], finished)
+    assert (job["status"], job["error"]) == ("aborted", "Vault was sealed")
+
+    # A job that reaches the sealed vault before its cancellation arrives is aborted too, not failed
+    @jobs.job_handler("touches-vault")
+    async def touches_vault(ctx, db, params):
+        raise VaultSealedError("Vault is sealed. Unseal with master key first.")
+
+    await unseal(client)
+    job = await until(client, (await start(client, "touches-vault"))["id"], finished)
+    assert (job["status"], job["error"]) == ("aborted", "Vault was sealed")
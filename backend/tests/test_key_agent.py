@@ -0,0 +1,194 @@
+# Key agent (crypto/agent.py) in its own process, as under the supervisor: the socket protocol, unseal
+# without stalling other workers, the seal broadcast to SealWatcher and its reconnect after an agent restart.
+import asyncio
+import base64
+import json
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from conftest import BACKEND
+from app.crypto import agent, container
+from app.crypto.agent import KeyAgentClient, RemoteCryptoContainer, SealWatcher
+
+AGENT_SCRIPT = """
+import asyncio, sys
+from app.crypto.agent import KeyAgentServer
+
+async def main():
+    server = KeyAgentServer(sys.argv[1])
+    await server.start()
+    print("ready", flush=True)
+    await asyncio.Event().wait()
+
+asyncio.run(main())
+"""
+
+
+class AgentProcess:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.proc: subprocess.Popen | None = None
+
+    def start(self) -> None:
+        self.proc = subprocess.Popen(
+            [sys.executable, "-c", AGENT_SCRIPT, self.path], cwd=BACKEND, stdout=subprocess.PIPE, text=True
+        )
+        assert self.proc.stdout.readline().strip() == "ready"
+
+    def stop(self) -> None:
+        self.proc.kill()
+        self.proc.wait()
+        Path(self.path).unlink(missing_ok=True)
+
+
+@pytest.fixture
+def key_agent(monkeypatch):
+    runtime_dir = tempfile.mkdtemp(prefix="kp-agent-")  # short path: Unix socket names are limited
+    process = AgentProcess(str(Path(runtime_dir) / "agent.sock"))
+    process.start()
+    # This process plays a worker: RemoteCryptoContainer and SealWatcher use these singletons
+    monkeypatch.setattr(agent, "_client", KeyAgentClient(process.path))
+    monkeypatch.setattr(agent, "_watcher", SealWatcher(process.path))
+    try:
+        yield process
+    finally:
+        process.stop()
+        shutil.rmtree(runtime_dir, ignore_errors=True)
+
+
+@pytest.fixture
+def sealed_vaults(monkeypatch):
+    """Vaults whose local seal listeners ran in this (worker) process."""
+    sealed: list[str] = []
+    listeners = list(container._seal_listeners)
+    monkeypatch.setattr(container, "_seal_listeners", listeners)
+    listeners.append(lambda c: sealed.append(c.vault))
+    return sealed
+
+
+async def until(condition, timeout: float = 5.0) -> None:
+    for _ in range(int(timeout / 0.02)):
+        if condition():
+            return
+        await asyncio.sleep(0.02)
+    raise AssertionError("condition not reached")
+
+
+def test_protocol(key_agent):
+    client = KeyAgentClient(key_agent.path)
+    assert client.call("status", vault="a") == {"sealed": True}
+    with pytest.raises(RuntimeError, match="sealed"):
+        client.call("encrypt", vault="a", values=["x"])
+
+    salt = base64.b64decode(client.call("unseal", vault="a", master_key="right")["salt"])
+    (check,) = client.call("encrypt", vault="a", values=[container.CryptoContainer.KEY_CHECK_PLAINTEXT])["values"]
+    ciphertexts = client.call("encrypt", vault="a", values=["one", "two"])["values"]
+    assert client.call("decrypt", vault="a", values=ciphertexts + ["not ciphertext"])["values"] == ["one", "two", None]
+    first, second, again = client.call("fingerprint", vault="a", values=["one", "two", "one"])["values"]
+    assert first == again != second
+    assert client.call("unsealed")["vaults"] == ["a"]
+    with pytest.raises(RuntimeError, match="Unknown op"):
+        client.call("frobnicate", vault="a")
+
+    client.call("seal", vault="a")
+    with pytest.raises(ValueError, match="Wrong master key"):
+        client.call("unseal", vault="a", master_key="wrong", salt=base64.b64encode(salt).decode(), key_check=check)
+    assert client.call("status", vault="a") == {"sealed": True}
+    client.call("unseal", vault="a", master_key="right", salt=base64.b64encode(salt).decode(), key_check=check)
+    assert client.call("decrypt", vault="a", values=ciphertexts)["values"] == ["one", "two"]
+
+
+def test_unseal_does_not_stall_other_workers(key_agent):
+    async def main():
+        worker_a, worker_b = KeyAgentClient(key_agent.path), KeyAgentClient(key_agent.path)
+        await worker_a.acall("unseal", vault="a", master_key="k")
+        # Key derivation takes a while; another worker's encrypt must not wait for it
+        unseal = asyncio.create_task(worker_b.acall("unseal", vault="b", master_key="k"))
+        await asyncio.sleep(0.02)
+        (ciphertext,) = (await worker_a.acall("encrypt", vault="a", values=["x"]))["values"]
+        assert not unseal.done()
+        await unseal
+        assert (await worker_a.acall("decrypt", vault="a", values=[ciphertext]))["values"] == ["x"]
+
+    asyncio.run(main())
+
+
+def test_seal_state_follows_the_broadcast(key_agent, sealed_vaults):
+    other_worker = KeyAgentClient(key_agent.path)
+    other_worker.call("unseal", vault="a", master_key="k")
+
+    async def main():
+        watcher = agent.get_seal_watcher()
+        assert RemoteCryptoContainer("a").is_sealed  # not subscribed yet: fail closed, no blocking call
+        watcher.start()
+        try:
+            assert await watcher.wait_subscribed(5.0)
+            assert not RemoteCryptoContainer("a").is_sealed  # from the snapshot
+            assert RemoteCryptoContainer("b").is_sealed
+
+            await asyncio.to_thread(other_worker.call, "unseal", vault="b", master_key="k")
+            await until(lambda: watcher.sealed("b") is False)
+            await asyncio.to_thread(other_worker.call, "seal", vault="a")
+            await until(lambda: watcher.sealed("a"))
+            assert sealed_vaults == ["a"]
+            assert watcher.unsealed_vaults() == ["b"]
+        finally:
+            await watcher.stop()
+
+    asyncio.run(main())
+
+
+def test_watcher_fails_closed_and_catches_up_after_agent_restart(key_agent, sealed_vaults):
+    async def main():
+        client = agent.get_agent_client()
+        watcher = agent.get_seal_watcher()
+        await client.acall("unseal", vault="a", master_key="k")
+        watcher.start()
+        try:
+            assert await watcher.wait_subscribed(5.0)
+            assert not RemoteCryptoContainer("a").is_sealed
+
+            key_agent.stop()  # agent gone: its keys with it
+            await until(lambda: watcher.sealed("a") is None)
+            assert RemoteCryptoContainer("a").is_sealed
+            assert sealed_vaults == []  # no event could arrive
+
+            key_agent.start()
+            assert await watcher.wait_subscribed(5.0)
+            assert watcher.sealed("a")
+            assert sealed_vaults == ["a"]  # the missed seal runs the local listeners on reconnect
+            # The clients reconnect on their next call
+            assert (await client.acall("status", vault="a")) == {"sealed": True}
+            assert client.call("status", vault="a") == {"sealed": True}
+        finally:
+            await watcher.stop()
+
+    asyncio.run(main())
+
+
+def test_large_batches(key_agent):
+    values = [f"secret number {i:05d} " + "x" * 40 for i in range(3 * agent.BATCH_SIZE + 7)]
+    client = KeyAgentClient(key_agent.path)
+    client.call("unseal", vault="a", master_key="k")
+    # One line far over asyncio's default 64 KiB stream limit
+    ciphertexts = client.call("encrypt", vault="a", values=values)["values"]
+    assert len(json.dumps(ciphertexts)) > 64 * 1024
+
+    remote = RemoteCryptoContainer("a")
+    assert remote.decrypt_many(ciphertexts) == values
+    assert len(set(remote.fingerprint_many(values))) == len(values)
+
+    async def main():
+        # Unsplit on the async connection too: both sides of the socket take long lines
+        assert len((await client.acall("decrypt", vault="a", values=ciphertexts))["values"]) == len(values)
+        encrypted = await remote.encrypt_many_async(values)
+        assert await remote.decrypt_many_async(encrypted) == values
+        assert await remote.fingerprint_many_async(values) == remote.fingerprint_many(values)
+        assert await remote.encrypt_many_async([]) == []
+
+    asyncio.run(main())
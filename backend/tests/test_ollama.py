@@ -0,0 +1,148 @@
+# Ollama client (services/ollama.py): generation slots and the bounded wait queue, OllamaBusyError ->
+# 429, timeouts, NDJSON streaming and keep_alive formatting. Slots are tested against httpx.MockTransport,
+# timeouts and the API against the stub Ollama server.
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from conftest import STUB_PORT, unseal
+from app.config import Settings
+from app.services import ollama
+from app.services.ollama import OllamaBusyError, OllamaClient, keep_alive
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("30m", "30m"),
+    ("1h30m", "1h30m"),
+    (" 5m ", "5m"),
+    ("-1", -1),  # forever
+    ("0", 0),  # unload right away
+    ("300", 300),
+    (" 600 ", 600),
+])
+def test_keep_alive(value, expected):
+    assert keep_alive(value) == expected
+
+
+class Backend:
+    """Mock Ollama: each request waits until the gate is set; counts requests in flight."""
+
+    def __init__(self) -> None:
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.gate = asyncio.Event()
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await self.gate.wait()
+        finally:
+            self.in_flight -= 1
+        if request.url.path == "/api/fail":
+            return httpx.Response(500, json={"error": "boom"})
+        return httpx.Response(200, json={"path": request.url.path})
+
+
+def make_client(backend: Backend, **settings) -> OllamaClient:
+    client = OllamaClient(Settings(ollama_base_url="http://ollama.test", **settings))
+    client._client = httpx.AsyncClient(base_url=client.base_url, transport=httpx.MockTransport(backend.handle))
+    return client
+
+
+async def test_slots_and_queue():
+    backend = Backend()
+    client = make_client(backend, ollama_max_concurrency=2, ollama_max_queue=1, ollama_queue_timeout=5)
+    calls = [asyncio.create_task(client.post(f"/api/{i}", {})) for i in range(3)]
+    await asyncio.sleep(0.05)
+    assert (backend.in_flight, client._waiting) == (2, 1)  # two generate, one waits
+
+    with pytest.raises(OllamaBusyError, match="too many chats"):
+        await client.post("/api/3", {})  # queue full: rejected at once
+
+    backend.gate.set()
+    assert [r.json()["path"] for r in await asyncio.gather(*calls)] == ["/api/0", "/api/1", "/api/2"]
+    assert backend.max_in_flight == 2 and client._waiting == 0
+    assert not client._semaphore.locked()
+    await client.close()
+
+
+async def test_queue_wait_times_out():
+    backend = Backend()
+    client = make_client(backend, ollama_max_concurrency=1, ollama_max_queue=4, ollama_queue_timeout=0.05)
+    running = asyncio.create_task(client.post("/api/slow", {}))
+    await asyncio.sleep(0.02)
+    with pytest.raises(OllamaBusyError, match="timed out"):
+        await client.post("/api/next", {})
+    assert client._waiting == 0
+
+    backend.gate.set()
+    await running
+    assert (await client.post("/api/next", {})).status_code == 200  # the slot came back
+    await client.close()
+
+
+async def test_no_queue_and_errors_release_the_slot():
+    backend = Backend()
+    backend.gate.set()
+    client = make_client(backend, ollama_max_concurrency=1, ollama_max_queue=0)
+    with pytest.raises(httpx.HTTPStatusError):
+        await client.post("/api/fail", {})
+    assert not client._semaphore.locked()
+
+    backend.gate.clear()
+    running = asyncio.create_task(client.post("/api/slow", {}))
+    await asyncio.sleep(0.02)
+    with pytest.raises(OllamaBusyError):  # max_queue 0: nobody waits
+        await client.post("/api/next", {})
+    backend.gate.set()
+    await running
+    await client.close()
+
+
+async def test_stream_decodes_lines_and_closing_early_frees_the_slot():
+    async def handle(request: httpx.Request) -> httpx.Response:
+        assert json.loads(request.content)["stream"] is True
+        return httpx.Response(200, content=b'{"n": 1}\n\n{"n": 2}\n  \n{"n": 3}\n')
+
+    client = OllamaClient(Settings(ollama_base_url="http://ollama.test", ollama_max_concurrency=1, ollama_max_queue=0))
+    client._client = httpx.AsyncClient(base_url=client.base_url, transport=httpx.MockTransport(handle))
+    assert [chunk async for chunk in client.stream("/api/chat", {})] == [{"n": 1}, {"n": 2}, {"n": 3}]
+
+    chunks = client.stream("/api/chat", {})
+    assert await chunks.__anext__() == {"n": 1}
+    assert client._semaphore.locked()  # held while the caller reads
+    await chunks.aclose()
+    assert not client._semaphore.locked()
+    await client.close()
+
+
+async def test_read_timeout(stub_ollama):
+    stub_ollama.delay = 0.5
+    client = OllamaClient(Settings(ollama_base_url=f"http://127.0.0.1:{STUB_PORT}", ollama_read_timeout=0.1))
+    with pytest.raises(httpx.ReadTimeout):
+        await client.post("/api/embed", {"model": "m", "input": ["x"]})
+    assert not client._semaphore.locked()
+    stub_ollama.delay = 0
+    assert (await client.post("/api/embed", {"model": "m", "input": ["x"]})).status_code == 200
+    await client.close()
+
+
+async def test_busy_ollama_is_429(client, monkeypatch):
+    await unseal(client)
+    busy = ollama.get_ollama()
+    monkeypatch.setattr(busy, "max_queue", 0)
+    for _ in range(busy.max_concurrency):  # all slots taken
+        await busy._semaphore.acquire()
+    try:
+        for path in ("/chat", "/chat/stream"):
+            r = await client.post(path, json={"message": "what do you keep in this vault?"})
+            assert r.status_code == 429 and r.headers["retry-after"] == "2", r.text
+            assert "busy" in r.json()["detail"]
+    finally:
+        for _ in range(busy.max_concurrency):
+            busy._semaphore.release()
@@ -0,0 +1,150 @@
+# Rotation engine (services/rotation.py): selection, new secrets per policy, SSH key pairs of the same
+# algorithm and size, and how a run ends when the vault is sealed or a chunk fails.
+import pytest
+from cryptography.hazmat.primitives import serialization
+
+from conftest import create, unseal
+from app.crypto import get_container, use_vault
+from app.db import database
+from app.models.schemas import RotationSelector
+from app.services import rotation
+from app.services.sshkeys import fingerprint, generate_keypair
+
+pytestmark = pytest.mark.anyio
+
+
+async def secret(client, credential_id: int) -> str:
+    r = await client.get(f"/credentials/{credential_id}/secret")
+    assert r.status_code == 200, r.text
+    return r.json()["secret"]
+
+
+async def run(client, **selector) -> dict:
+    r = await client.post("/rotation/run", json=selector)
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def rsa_bits(public_key: str) -> int:
+    return serialization.load_ssh_public_key(public_key.encode("ascii")).key_size
+
+
+async def test_rotates_the_selection(client, monkeypatch):
+    monkeypatch.setattr(rotation.settings, "rotation_chunk_size", 2)
+    await unseal(client)
+    prod = [await create(client, f"prod {i}", category="Prod") for i in range(5)]
+    dev = await create(client, "dev", category="Dev")
+    key = await create(client, "deploy key", type="ssh_key", category="Prod", secret=generate_keypair("ed25519")[0])
+    before = {cid: await secret(client, cid) for cid in prod + [dev, key]}
+
+    report = await run(client, category="Prod", dry_run=True)
+    assert (report["selected"], report["rotated"], report["credential_ids"]) == (5, 0, prod)
+    assert await secret(client, prod[0]) == before[prod[0]]
+
+    report = await run(client, category="Prod", length=20, alphabet="hex")
+    assert (report["selected"], report["rotated"], report["failed"], report["errors"]) == (5, 5, 0, [])
+    assert report["credential_ids"] == prod and report["key_fingerprints"] == {}
+    for cid in prod:
+        new = await secret(client, cid)
+        assert new != before[cid] and len(new) == 20 and set(new) <= set("0123456789abcdef")
+    # Other categories and SSH keys (not selected by type) are left alone
+    assert await secret(client, dev) == before[dev]
+    assert await secret(client, key) == before[key]
+
+    reports = (await client.get("/rotation/reports")).json()
+    assert [r["id"] for r in reports] == [report["id"], report["id"] - 1]
+
+
+async def test_selector_is_validated(client):
+    await unseal(client)
+    assert (await client.post("/rotation/run", json={"alphabet": "emoji"})).status_code == 400
+    assert (await client.post("/rotation/run", json={"length": 4})).status_code == 400
+    assert (await client.post("/rotation/run", json={"older_than_days": -1})).status_code == 400
+
+
+async def test_ssh_keys_keep_algorithm_and_size(client):
+    await unseal(client)
+    ed = await create(client, "ed key", type="ssh_key", secret=generate_keypair("ed25519")[0])
+    rsa3072 = await create(client, "rsa key", type="ssh_key", secret=generate_keypair("rsa", 3072)[0])
+    rsa1024 = await create(client, "old rsa key", type="ssh_key", secret=generate_keypair("rsa", 1024)[0])
+    broken = await create(client, "not a key", type="ssh_key", secret="hunter2")
+    before = {cid: await secret(client, cid) for cid in (ed, rsa3072, rsa1024)}
+
+    report = await run(client, type="ssh_key")
+    assert (report["selected"], report["rotated"], report["failed"]) == (4, 3, 1)
+    assert report["credential_ids"] == [ed, rsa3072, rsa1024]
+    assert report["errors"] == [f"ID {broken}: not an unencrypted SSH private key"]
+
+    public = {}
+    for cid in (ed, rsa3072, rsa1024):
+        assert await secret(client, cid) != before[cid]
+        public[cid] = (await client.get(f"/credentials/{cid}/public-key")).json()["public_key"]
+    assert public[ed].startswith("ssh-ed25519 ")
+    assert rsa_bits(public[rsa3072]) == 3072
+    assert rsa_bits(public[rsa1024]) == rotation.MIN_RSA_BITS
+    assert report["key_fingerprints"] == {str(cid): fingerprint(key) for cid, key in public.items()}
+    assert await secret(client, broken) == "hunter2"
+
+
+async def test_seal_during_a_run_stops_it(client, vault, monkeypatch):
+    monkeypatch.setattr(rotation.settings, "rotation_chunk_size", 2)
+    await unseal(client)
+    ids = [await create(client, f"server {i}") for i in range(6)]
+
+    def seal_after_first_chunk(done: int, total: int) -> None:
+        if done == 2:
+            get_container(vault).seal()
+
+    with use_vault(vault):
+        async with database.session(vault) as db:
+            report = rotation.report_to_response(await rotation.rotate(db, RotationSelector(), progress=seal_after_first_chunk))
+    assert (report.selected, report.rotated, report.failed) == (6, 2, 4)
+    assert report.credential_ids == ids[:2]
+    assert report.errors == [f"IDs {ids[2]}-{ids[5]}: vault sealed"]
+
+
+async def test_other_errors_skip_only_their_chunk(client, monkeypatch):
+    monkeypatch.setattr(rotation.settings, "rotation_chunk_size", 2)
+    await unseal(client)
+    ids = [await create(client, f"server {i}") for i in range(6)]
+    new_secrets = rotation._new_secrets
+    calls = 0
+
+    async def failing_once(spec, count):
+        nonlocal calls
+        calls += 1
+        if calls == 2:
+            raise RuntimeError("generator failed")
+        return await new_secrets(spec, count)
+
+    monkeypatch.setattr(rotation, "_new_secrets", failing_once)
+    report = await run(client)
+    assert (report["selected"], report["rotated"], report["failed"]) == (6, 4, 2)
+    assert report["credential_ids"] == ids[:2] + ids[4:]
+    assert report["errors"] == [f"IDs {ids[2]}-{ids[3]}: RuntimeError"]
+
+
+async def test_policy_updates_are_validated(client):
+    await unseal(client)
+    r = await client.post("/rotation/policies", json={"name": "prod", "category": "prod", "interval_minutes": 60})
+    assert r.status_code == 200, r.text
+    policy = r.json()
+
+    # Fields the database needs may be omitted, not nulled
+    for field in ("name", "length", "alphabet", "enabled"):
+        r = await client.patch(f"/rotation/policies/{policy['id']}", json={field: None})
+        assert r.status_code == 422, (field, r.text)
+    # The scheduler would fire on every check
+    for minutes in (0, -5):
+        r = await client.patch(f"/rotation/policies/{policy['id']}", json={"interval_minutes": minutes})
+        assert r.status_code == 422, r.text
+        r = await client.post("/rotation/policies", json={"name": "busy", "interval_minutes": minutes})
+        assert r.status_code == 422, r.text
+    assert (await client.get("/rotation/policies")).json() == [policy]
+
+    # Null clears the optional fields; omitted fields stay as they were
+    r = await client.patch(f"/rotation/policies/{policy['id']}", json={"interval_minutes": None, "category": None, "length": 40})
+    assert r.status_code == 200, r.text
+    assert {k: r.json()[k] for k in ("name", "interval_minutes", "category", "length")} == {
+        "name": "prod", "interval_minutes": None, "category": None, "length": 40,
+    }
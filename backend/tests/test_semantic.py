@@ -0,0 +1,127 @@
+# Semantic index (services/semantic.py) against the stub Ollama /api/embed, through the search API and
+# the chat: batch build after unseal, incremental updates from the change feed, drop on seal, ranking
+# and the chat's name fallback.
+import asyncio
+
+import pytest
+
+from conftest import create, unseal
+from app.services.semantic import embedding_text, get_semantic_index
+
+pytestmark = pytest.mark.anyio
+
+
+async def search(client, q: str, k: int = 10) -> list[tuple[int, float]]:
+    """(id, score) best first. The search waits for a running build and pending index updates."""
+    r = await client.get("/credentials/semantic-search", params={"q": q, "k": k})
+    assert r.status_code == 200, r.text
+    return [(hit["id"], hit["score"]) for hit in r.json()]
+
+
+async def test_build_after_unseal_embeds_in_batches(client, stub_ollama, monkeypatch):
+    monkeypatch.setattr(get_semantic_index(), "batch_size", 2)
+    await unseal(client)
+    ids = [await create(client, f"server {i}") for i in range(5)]
+    await client.post("/vault/seal")
+    stub_ollama.requests.clear()
+
+    await unseal(client)
+    assert sorted(cid for cid, _ in await search(client, "server")) == ids
+    assert [len(inputs) for inputs in stub_ollama.requests] == [2, 2, 1, 1]  # build, then the query
+
+
+async def test_writes_update_the_index_incrementally(client, stub_ollama):
+    await unseal(client)
+    grafana = await create(client, "grafana token", type="api_key", category="Monitoring")
+    assert [cid for cid, _ in await search(client, "grafana")] == [grafana]
+
+    stub_ollama.requests.clear()
+    deploy = await create(client, "jenkins deploy key")
+    assert sorted(cid for cid, _ in await search(client, "key")) == sorted([grafana, deploy])
+    # Only the new credential was embedded (no rebuild), then the query
+    assert stub_ollama.requests == [[embedding_text("jenkins deploy key", "password", "", "")], ["key"]]
+
+    assert (await client.patch(f"/credentials/{deploy}", json={"name": "gitlab runner"})).status_code == 200
+    (best, score), *_ = await search(client, "gitlab runner", 1)
+    assert best == deploy and score > 0.8
+
+    stub_ollama.requests.clear()
+    assert (await client.delete(f"/credentials/{grafana}")).status_code == 204
+    assert [cid for cid, _ in await search(client, "grafana")] == [deploy]
+    assert stub_ollama.requests == [["grafana"]]  # removal needs no embedding
+
+
+async def test_ranking_follows_changes(client):
+    await unseal(client)
+    # The embedded text is "<name>\npassword"; the query shares 3, 2, 1 and 0 words with these names
+    full = await create(client, "alpha beta gamma")
+    two = await create(client, "alpha beta")
+    one = await create(client, "alpha")
+    other = await create(client, "delta")
+
+    hits = await search(client, "alpha beta gamma")
+    assert [cid for cid, _ in hits] == [full, two, one, other]
+    assert [score for _, score in hits] == pytest.approx([3 / (3 ** 0.5 * 2), 2 / 3, 1 / 6 ** 0.5, 0.0], abs=1e-5)
+    assert [cid for cid, _ in await search(client, "alpha beta gamma", 2)] == [full, two]
+
+    await client.delete(f"/credentials/{two}")  # the last row moves into its place
+    await client.patch(f"/credentials/{other}", json={"name": "alpha beta gamma delta"})
+    hits = await search(client, "alpha beta gamma")
+    assert [cid for cid, _ in hits] == [full, other, one]
+    assert hits[1][1] == pytest.approx(3 / (3 ** 0.5 * 5 ** 0.5), abs=1e-5)
+
+
+async def test_seal_drops_the_index(client, stub_ollama):
+    await unseal(client)
+    await create(client, "grafana token")
+    await search(client, "grafana")
+
+    await client.post("/vault/seal")
+    r = await client.get("/credentials/semantic-search", params={"q": "grafana"})
+    assert r.status_code == 503
+
+    stub_ollama.requests.clear()
+    await unseal(client)
+    await search(client, "grafana")
+    assert stub_ollama.requests == [[embedding_text("grafana token", "password", "", "")], ["grafana"]]  # rebuilt
+
+
+async def test_seal_during_a_build_leaves_no_stale_index(client, stub_ollama):
+    await unseal(client)
+    grafana = await create(client, "grafana token")
+    await client.post("/vault/seal")
+
+    stub_ollama.requests.clear()
+    stub_ollama.delay = 0.3
+    await unseal(client)  # starts the build
+    while not stub_ollama.requests:
+        await asyncio.sleep(0.01)
+    await client.post("/vault/seal")
+    stub_ollama.delay = 0.0
+
+    await unseal(client)
+    assert [cid for cid, _ in await search(client, "grafana")] == [grafana]
+    assert len(stub_ollama.requests) == 3  # first build (cut short), the new build, the query
+
+
+async def test_chat_falls_back_to_a_suggestion_above_min_score(client):
+    index = get_semantic_index()
+    await unseal(client)
+    staging = await create(client, "staging sap database", secret="hunter2")
+    await create(client, "grafana token", type="api_key", category="Monitoring")
+
+    async def chat(message: str) -> str:
+        r = await client.post("/chat", json={"message": message})
+        assert r.status_code == 200, r.text
+        return r.json()["reply"]
+
+    assert "Secret: hunter2" in await chat("show staging sap database")
+
+    # 3 of 4 words shared (cosine 0.87): suggested, but the secret is not shown on a guess
+    reply = await chat("show sap database staging")
+    assert f'Did you mean "staging sap database" (ID {staging})' in reply and "hunter2" not in reply
+
+    # Best hit, but only 1 shared word (0.35): below SEMANTIC_MIN_SCORE, so no suggestion
+    (best, score), *_ = await search(client, "sap token")
+    assert best == staging and score < index.min_score
+    assert await chat("show sap token") == "Credential not found."
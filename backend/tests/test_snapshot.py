@@ -0,0 +1,142 @@
+# Snapshots: export through the API under the caller's key, then the .kps format and its mmap reader
+# (app/snapshot/): lookup by name, wrong key, truncated file, tampered records and index.
+import pytest
+
+from conftest import create, unseal
+from app.snapshot.format import HEADER, INDEX_ENTRY, SnapshotError, decode_key, derive_keys, generate_key, name_hmac
+from app.snapshot.reader import SnapshotReader, main
+
+pytestmark = pytest.mark.anyio
+
+
+async def new_key(client) -> str:
+    r = await client.post("/snapshot/key")
+    assert r.status_code == 200 and r.headers["cache-control"] == "no-store"
+    return r.json()["key"]
+
+
+async def export(client, path, key: str, **filters) -> int:
+    r = await client.post("/snapshot/export", json={"key": key, **filters})
+    assert r.status_code == 200, r.text
+    assert key not in str(r.headers) and "snapshot-key" not in str(r.headers).lower()
+    path.write_bytes(r.content)
+    return int(r.headers["x-keypilot-snapshot-entries"])
+
+
+@pytest.fixture
+async def snapshot(client, tmp_path):
+    """A snapshot of three credentials, two of them named "db-prod": (path, key)."""
+    await unseal(client)
+    await create(client, "db-prod", secret="pw-1")
+    await create(client, "db-prod", type="api_key", category="Ops", secret="token-2")
+    await create(client, "grafana", type="api_key", category="Monitoring", secret="token-3")
+    path = tmp_path / "vault.kps"
+    key = await new_key(client)
+    assert await export(client, path, key) == 3
+    return path, key
+
+
+async def test_round_trip_by_name(snapshot):
+    path, key = snapshot
+    with SnapshotReader(str(path), key) as snap:
+        assert len(snap) == 3
+        assert snap.get("grafana")["secret"] == "token-3"
+        assert snap.get(" grafana ")["category"] == "Monitoring"
+        assert sorted(e["secret"] for e in snap.get_all("db-prod")) == ["pw-1", "token-2"]
+        assert snap.get("db-prod", type="api_key")["secret"] == "token-2"
+        assert snap.get("Grafana") is None and snap.get("missing") is None and snap.get_all("missing") == []
+    with SnapshotReader(str(path), decode_key(key)) as snap:  # raw bytes work as well
+        assert snap.get("grafana")["secret"] == "token-3"
+
+
+async def test_export_filters_and_keys(client, tmp_path):
+    await unseal(client)
+    await create(client, "db-prod")
+    await create(client, "grafana", type="api_key", category="Monitoring")
+    key = await new_key(client)
+    assert key != await new_key(client)
+
+    path = tmp_path / "filtered.kps"
+    assert await export(client, path, key, type="api_key") == 1
+    with SnapshotReader(str(path), key) as snap:
+        assert snap.get("db-prod") is None and snap.get("grafana") is not None
+    assert await export(client, path, key, category="Nothing") == 0
+    with SnapshotReader(str(path), key) as snap:
+        assert len(snap) == 0 and snap.get("grafana") is None
+
+    for bad in ("", "short", "not base64 !!!"):
+        r = await client.post("/snapshot/export", json={"key": bad})
+        assert r.status_code == 400
+    assert (await client.post("/snapshot/export", params={"type": "password"})).status_code == 422  # key is required
+
+
+async def test_wrong_key(snapshot, client):
+    path, _ = snapshot
+    with pytest.raises(SnapshotError, match="Wrong snapshot key"):
+        SnapshotReader(str(path), await new_key(client))
+    with pytest.raises(SnapshotError, match="32 bytes"):
+        SnapshotReader(str(path), b"too short")
+
+
+async def test_not_a_snapshot_or_truncated(snapshot, tmp_path):
+    path, key = snapshot
+    data = path.read_bytes()
+    damaged = tmp_path / "damaged.kps"
+    for content, message in [
+        (b"", "Not a KeyPilot snapshot"),
+        (data[:HEADER.size - 1], "Not a KeyPilot snapshot"),
+        (b"x" * len(data), "Not a KeyPilot snapshot"),
+        (data[:-1], "truncated"),
+        (data[:HEADER.size], "truncated"),
+    ]:
+        damaged.write_bytes(content)
+        with pytest.raises(SnapshotError, match=message):
+            SnapshotReader(str(damaged), key)
+
+
+async def test_tampered_record_or_index(snapshot, tmp_path):
+    path, key = snapshot
+    data = bytearray(path.read_bytes())
+    mac_key = derive_keys(decode_key(key))[1]
+    _, _, _, count, _, _, index_offset, _ = HEADER.unpack_from(data, 0)
+    entries = [INDEX_ENTRY.unpack_from(data, index_offset + i * INDEX_ENTRY.size) for i in range(count)]
+    grafana = next(i for i, (digest, _, _) in enumerate(entries) if digest == name_hmac(mac_key, "grafana"))
+    other = (grafana + 1) % count
+
+    # One flipped ciphertext byte: authentication fails for that entry only
+    tampered = bytearray(data)
+    _, offset, length = entries[grafana]
+    tampered[offset + length - 1] ^= 1
+    (tmp_path / "record.kps").write_bytes(tampered)
+    with SnapshotReader(str(tmp_path / "record.kps"), key) as snap:
+        with pytest.raises(SnapshotError, match="damaged"):
+            snap.get("grafana")
+        assert snap.get("db-prod") is not None
+
+    # Index entry pointing at another entry's record: the name HMAC is the AAD, so it does not decrypt
+    tampered = bytearray(data)
+    digest, _, _ = entries[grafana]
+    INDEX_ENTRY.pack_into(tampered, index_offset + grafana * INDEX_ENTRY.size, digest, *entries[other][1:])
+    (tmp_path / "index.kps").write_bytes(tampered)
+    with SnapshotReader(str(tmp_path / "index.kps"), key) as snap:
+        with pytest.raises(SnapshotError, match="damaged"):
+            snap.get("grafana")
+
+    # Changed name HMAC in the index: the entry is no longer found by its name
+    tampered = bytearray(data)
+    INDEX_ENTRY.pack_into(tampered, index_offset + grafana * INDEX_ENTRY.size, bytes(32), *entries[grafana][1:])
+    (tmp_path / "name.kps").write_bytes(tampered)
+    with SnapshotReader(str(tmp_path / "name.kps"), key) as snap:
+        assert snap.get("grafana") is None
+
+
+async def test_reader_command(snapshot, monkeypatch, capsys):
+    path, key = snapshot
+    monkeypatch.setenv("KEYPILOT_SNAPSHOT_KEY", key)
+    assert main([str(path), "grafana"]) == 0
+    assert capsys.readouterr().out == "token-3"
+    assert main([str(path), "missing"]) == 1
+    assert main([str(path)]) == 2
+    monkeypatch.setenv("KEYPILOT_SNAPSHOT_KEY", generate_key())
+    assert main([str(path), "grafana"]) == 1
+    assert capsys.readouterr().err.endswith("error: Wrong snapshot key\n")
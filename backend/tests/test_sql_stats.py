@@ -0,0 +1,120 @@
+# SQL statistics (SQL_STATS): statement timings of db/database.py SQLStats, the X-KeyPilot-SQL header and
+# per-route totals of api/middleware.py SQLStatsMiddleware, GET /admin/sql-stats and the slow-query log.
+# The test run has SQL_STATS=false, so the stats are switched on per test: vaults opened during the test
+# get the listeners, and the middleware wraps the app.
+import logging
+
+import httpx
+import pytest
+
+from conftest import create, unseal
+from app.api import middleware
+from app.api.middleware import SQLStatsMiddleware
+from app.db import database
+from app.db.database import SQLStats
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def stats(client, vault, monkeypatch):
+    """SQLStats logging every statement as slow (threshold 0), and a client on the app wrapped in its middleware."""
+    from app.main import app
+
+    sql_stats = SQLStats(window=1000, slow_ms=0)
+    monkeypatch.setattr(database, "sql_stats", sql_stats)
+    monkeypatch.setattr(middleware, "sql_stats", sql_stats)
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=SQLStatsMiddleware(app)), base_url="http://test", headers={"X-KeyPilot-Vault": vault}
+    ) as c:
+        yield sql_stats, c
+
+
+def sql_header(r: httpx.Response) -> tuple[int, float]:
+    queries, ms = (part.split("=")[1] for part in r.headers["x-keypilot-sql"].split("; "))
+    return int(queries), float(ms)
+
+
+async def test_off_by_default(client):
+    assert database.sql_stats is None
+    r = await client.get("/admin/sql-stats")
+    assert r.status_code == 404 and "SQL_STATS=true" in r.json()["detail"]
+    assert (await client.post("/admin/sql-stats/reset")).status_code == 404
+    assert "x-keypilot-sql" not in (await client.get("/health")).headers
+
+
+async def test_header_and_routes(stats):
+    sql_stats, c = stats
+    await unseal(c)
+    ids = [await create(c, f"db {i}") for i in range(3)]
+    sql_stats.reset()
+
+    r = await c.get("/credentials")
+    assert r.status_code == 200 and len(r.json()) == 3
+    queries, ms = sql_header(r)
+    assert queries >= 1 and ms > 0
+    for cid in ids:
+        r = await c.get(f"/credentials/{cid}")
+        assert r.status_code == 200 and sql_header(r)[0] >= 1
+    assert sql_header(await c.get("/utils/generate-password")) == (0, 0.0)
+
+    report = (await c.get("/admin/sql-stats")).json()
+    routes = {route["route"]: route for route in report["routes"]}
+    # Path templates, not paths: the three reads of single credentials are one route
+    assert routes["GET /credentials/{credential_id}"]["requests"] == 3
+    assert routes["GET /credentials"]["requests"] == 1
+    assert routes["GET /credentials"]["queries_max"] == queries
+    assert routes["GET /utils/generate-password"] == {
+        "route": "GET /utils/generate-password", "requests": 1, "queries_mean": 0, "queries_max": 0, "sql_ms_mean": 0,
+    }
+    means = [route["queries_mean"] for route in report["routes"]]
+    assert means == sorted(means, reverse=True)
+
+    assert report["slow_ms"] == 0 and report["window"] == sum(
+        route["requests"] * route["queries_mean"] for route in report["routes"]
+    )
+    totals = [st["total_ms"] for st in report["statements"]]
+    assert totals == sorted(totals, reverse=True)
+    assert all(st["max_ms"] <= st["total_ms"] and st["count"] >= 1 for st in report["statements"])
+    assert not any("db 0" in st["statement"] for st in report["statements"])  # placeholders, no values
+
+    assert len((await c.get("/admin/sql-stats", params={"limit": 1})).json()["routes"]) == 1
+    assert sql_header(await c.get("/credentials/9999/public-key"))[0] >= 1
+    assert "GET /credentials/{credential_id}/public-key" in {
+        route["route"] for route in (await c.get("/admin/sql-stats")).json()["routes"]
+    }
+    assert (await c.get("/nowhere")).status_code == 404
+    assert "GET unmatched" in {route["route"] for route in (await c.get("/admin/sql-stats")).json()["routes"]}
+
+    assert (await c.post("/admin/sql-stats/reset")).status_code == 204
+    report = (await c.get("/admin/sql-stats")).json()
+    assert (report["window"], report["statements"]) == (0, [])
+    assert [route["route"] for route in report["routes"]] == ["POST /admin/sql-stats/reset"]  # counted after the reset
+
+
+async def test_slow_statements_are_logged_with_their_plan(stats, caplog):
+    sql_stats, c = stats
+    await unseal(c)
+    cid = await create(c, "prod db")
+    caplog.clear()
+    with caplog.at_level(logging.WARNING, logger="app.db.database"):
+        r = await c.get(f"/credentials/{cid}")
+    assert r.status_code == 200
+
+    slow = [record.getMessage() for record in caplog.records if record.getMessage().startswith("Slow SQL")]
+    assert len(slow) == sql_header(r)[0]
+    select = next(message for message in slow if "FROM credentials" in message)
+    plan = select.split("plan: ", 1)[1]
+    assert "SEARCH credentials USING INTEGER PRIMARY KEY" in plan
+    assert "prod db" not in select
+
+
+def test_window_keeps_the_last_executions():
+    sql_stats = SQLStats(window=3, slow_ms=100)
+    for statement, ms in [("SELECT 1", 5.0), ("SELECT 2", 1.0), ("SELECT 2", 2.0), ("SELECT 1", 0.5)]:
+        sql_stats._executions.append((statement, ms))
+    assert sql_stats.window == 3
+    assert sql_stats.top_statements(10) == [
+        {"statement": "SELECT 2", "count": 2, "total_ms": 3.0, "mean_ms": 1.5, "max_ms": 2.0},
+        {"statement": "SELECT 1", "count": 1, "total_ms": 0.5, "mean_ms": 0.5, "max_ms": 0.5},
+    ]
@@ -0,0 +1,120 @@
+# Multiple vaults (crypto/container.py, api/middleware.py): selection by header or /v/<vault>/ prefix,
+# isolation of data and keys, the limit of unsealed vaults, and wrong master keys.
+import pytest
+
+from conftest import create, unseal
+from app.crypto import container
+from app.crypto.container import CryptoContainer, get_container
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def names(vault):
+    """Vault names of their own for this test: names("a") -> "<test>-a"."""
+    return lambda suffix: f"{vault[:50]}-{suffix}"
+
+
+@pytest.fixture
+def sealed_vaults(monkeypatch):
+    """Vaults whose seal listeners ran during the test."""
+    sealed: list[str] = []
+    listeners = list(container._seal_listeners)
+    monkeypatch.setattr(container, "_seal_listeners", listeners)
+    listeners.append(lambda c: sealed.append(c.vault))
+    return sealed
+
+
+async def names_in(client, prefix: str) -> list[str]:
+    r = await client.get(f"{prefix}/credentials")
+    assert r.status_code == 200, r.text
+    return [c["name"] for c in r.json()]
+
+
+async def test_path_prefix_and_header_select_the_vault(client, vault, names):
+    team = names("team")
+    r = await client.post(f"/v/{team}/vault/unseal", json={"master_key": "team key"})
+    assert r.status_code == 200, r.text
+    r = await client.post(f"/v/{team}/credentials", json={"type": "password", "name": "team db", "secret": "x"})
+    assert r.status_code == 200, r.text
+
+    # The prefix is stripped before routing and wins over the header
+    assert await names_in(client, f"/v/{team}") == ["team db"]
+    r = await client.get("/credentials", headers={"X-KeyPilot-Vault": team})
+    assert [c["name"] for c in r.json()] == ["team db"]
+    assert (await client.get(f"/v/{team}/vault/status")).json() == {"sealed": False, "vault": team}
+    assert (await client.get("/vault/status")).json() == {"sealed": True, "vault": vault}
+
+    assert (await client.get("/v/Team/credentials")).status_code == 400
+    assert (await client.get("/credentials", headers={"X-KeyPilot-Vault": "../etc"})).status_code == 400
+    r = await client.get(f"/v/{names('missing')}/credentials")
+    assert r.status_code == 404 and "Unseal it once to create it" in r.json()["detail"]
+    assert names("missing") not in container._containers  # requests naming unknown vaults register nothing
+
+
+async def test_vaults_are_isolated(client, names, sealed_vaults):
+    a, b = names("a"), names("b")
+    assert (await client.post(f"/v/{a}/vault/unseal", json={"master_key": "key a"})).status_code == 200
+    assert (await client.post(f"/v/{b}/vault/unseal", json={"master_key": "key b"})).status_code == 200
+    id_a = (await client.post(f"/v/{a}/credentials", json={"type": "password", "name": "only a", "secret": "sa"})).json()["id"]
+    id_b = (await client.post(f"/v/{b}/credentials", json={"type": "password", "name": "only b", "secret": "sb"})).json()["id"]
+    assert id_a == id_b  # own database per vault
+
+    assert await names_in(client, f"/v/{a}") == ["only a"]
+    assert await names_in(client, f"/v/{b}") == ["only b"]
+    assert (await client.get(f"/v/{a}/credentials/{id_a}/secret")).json()["secret"] == "sa"
+    listed = {v["vault"]: v["sealed"] for v in (await client.get("/vault/list")).json()}
+    assert listed[a] is False and listed[b] is False
+
+    # Sealing one vault leaves the other open; each needs its own key
+    assert (await client.post(f"/v/{a}/vault/seal")).status_code == 200
+    assert sealed_vaults == [a]
+    assert (await client.get(f"/v/{a}/credentials")).status_code == 503
+    assert await names_in(client, f"/v/{b}") == ["only b"]
+    assert (await client.post(f"/v/{a}/vault/unseal", json={"master_key": "key b"})).status_code == 403
+    assert (await client.post(f"/v/{a}/vault/unseal", json={"master_key": "key a"})).status_code == 200
+    assert await names_in(client, f"/v/{a}") == ["only a"]
+
+
+async def test_wrong_master_key_does_not_run_seal_listeners(client, names, sealed_vaults):
+    await unseal(client, "right")
+    await create(client, "db")
+    await client.post("/vault/seal")
+    sealed_vaults.clear()
+
+    r = await client.post("/vault/unseal", json={"master_key": "wrong"})
+    assert r.status_code == 403 and r.json()["detail"] == "Wrong master key"
+    assert sealed_vaults == []
+    assert (await client.get("/vault/status")).json()["sealed"] is True
+    await unseal(client, "right")
+    assert await names_in(client, "") == ["db"]
+
+
+def test_wrong_key_leaves_an_unsealed_container_as_it_was(sealed_vaults):
+    c = CryptoContainer("wrong-key-check")
+    salt = c.unseal("right")
+    check = c.encrypt(CryptoContainer.KEY_CHECK_PLAINTEXT)
+    ciphertext = c.encrypt("secret")
+
+    with pytest.raises(ValueError, match="Wrong master key"):
+        c.unseal("wrong", salt, check)
+    assert not c.is_sealed and c.decrypt(ciphertext) == "secret"
+    assert sealed_vaults == []
+    c.seal()
+    assert sealed_vaults == ["wrong-key-check"]
+
+
+async def test_least_recently_used_vault_is_sealed_over_the_limit(client, names, sealed_vaults, monkeypatch):
+    monkeypatch.setattr(container.settings, "vault_max_unsealed", 2)
+    a, b, c = names("a"), names("b"), names("c")
+    for name in (a, b):
+        assert (await client.post(f"/v/{name}/vault/unseal", json={"master_key": "k"})).status_code == 200
+    sealed_vaults.clear()  # vaults left unsealed by other tests went first
+
+    await names_in(client, f"/v/{a}")  # a request on a: b is now the least recently used
+    assert (await client.post(f"/v/{c}/vault/unseal", json={"master_key": "k"})).status_code == 200
+    assert sealed_vaults == [b]
+    assert get_container(b).is_sealed
+    assert not get_container(a).is_sealed and not get_container(c).is_sealed
+    assert (await client.get(f"/v/{b}/credentials")).status_code == 503
+    assert b not in container._containers  # sealed vaults other than default are not kept
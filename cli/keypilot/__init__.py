@@ -0,0 +1,4 @@
+# KeyPilot CLI: get/list/put/rotate/export against the REST API (one pooled connection per run)
+from .client import KeyPilotClient, KeyPilotError
+
+__all__ = ["KeyPilotClient", "KeyPilotError"]
@@ -0,0 +1,74 @@
+# Local metadata cache (credential list without secrets), AES-GCM encrypted on disk.
+# Fresh for ttl seconds; afterwards revalidated with the server's ETag (304 = reuse, no download).
+import hashlib
+import json
+import os
+import secrets
+import time
+from pathlib import Path
+from typing import Optional
+
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+
+def _default_dir(env: str, fallback: str) -> Path:
+    return Path(os.environ.get(env) or Path.home() / fallback) / "keypilot"
+
+
+def _load_key() -> bytes:
+    """KEYPILOT_CACHE_KEY (any passphrase) or a random key in ~/.config/keypilot/cache.key (0600), not next to the cache."""
+    env = os.environ.get("KEYPILOT_CACHE_KEY")
+    if env:
+        return hashlib.sha256(env.encode("utf-8")).digest()
+    path = _default_dir("XDG_CONFIG_HOME", ".config") / "cache.key"
+    if path.exists():
+        return bytes.fromhex(path.read_text().strip())
+    path.parent.mkdir(parents=True, exist_ok=True, mode=0o700)
+    key = secrets.token_bytes(32)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "w") as f:
+        f.write(key.hex())
+    return key
+
+
+class MetadataCache:
+    """One file per backend URL + vault; a damaged or foreign file counts as a miss."""
+
+    def __init__(self, scope: str, ttl: float, directory: Optional[Path] = None) -> None:
+        self.ttl = ttl
+        self.dir = directory or _default_dir("XDG_CACHE_HOME", ".cache")
+        self.path = self.dir / (hashlib.sha256(scope.encode("utf-8")).hexdigest()[:32] + ".bin")
+        self._aes = AESGCM(_load_key())
+        self._aad = scope.encode("utf-8")
+
+    def load(self) -> Optional[dict]:
+        """{"etag", "fetched_at", "items"} or None."""
+        try:
+            raw = self.path.read_bytes()
+            return json.loads(self._aes.decrypt(raw[:12], raw[12:], self._aad))
+        except (OSError, ValueError, InvalidTag):
+            return None
+
+    def is_fresh(self, entry: dict) -> bool:
+        return time.time() - entry.get("fetched_at", 0) < self.ttl
+
+    def store(self, etag: Optional[str], items: list[dict]) -> None:
+        self.dir.mkdir(parents=True, exist_ok=True, mode=0o700)
+        nonce = secrets.token_bytes(12)
+        data = json.dumps({"etag": etag, "fetched_at": time.time(), "items": items}).encode("utf-8")
+        tmp = self.path.with_suffix(".tmp")
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(nonce + self._aes.encrypt(nonce, data, self._aad))
+        os.replace(tmp, self.path)
+
+    def touch(self, entry: dict) -> None:
+        """Server confirmed the cached list (304): fresh again."""
+        self.store(entry.get("etag"), entry["items"])
+
+    def clear(self) -> None:
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,186 @@
+# keypilot get|list|put|rotate|export|status|unseal|seal – see keypilot --help
+# Connection: --url / KEYPILOT_URL, --vault / KEYPILOT_VAULT. Metadata cache TTL: --cache-ttl / KEYPILOT_CACHE_TTL.
+import argparse
+import getpass
+import json
+import os
+import sys
+from typing import Optional
+
+from .cache import MetadataCache
+from .client import KeyPilotClient, KeyPilotError
+
+TYPES = ("password", "ssh_key", "api_key", "other")
+
+
+def _read_secret(value: Optional[str]) -> str:
+    if value is None:
+        return getpass.getpass("Secret: ")
+    if value == "-":
+        return sys.stdin.read().rstrip("\n")
+    return value
+
+
+def cmd_get(client: KeyPilotClient, args: argparse.Namespace) -> int:
+    found = client.resolve(args.names, args.type)
+    missing = [n for n in args.names if n not in found]
+    if missing:
+        print(f"not found: {', '.join(missing)}", file=sys.stderr)
+        return 1
+    by_id = {item["id"]: item for item in client.secrets([found[n]["id"] for n in args.names])}
+    if len(args.names) == 1 and not args.json:
+        sys.stdout.write(by_id[found[args.names[0]]["id"]]["secret"] + "\n")
+    else:
+        print(json.dumps({n: by_id[found[n]["id"]]["secret"] for n in args.names}, indent=2))
+    return 0
+
+
+def cmd_list(client: KeyPilotClient, args: argparse.Namespace) -> int:
+    items = [
+        i for i in client.list_credentials(refresh=args.refresh)
+        if (not args.type or i["type"] == args.type) and (not args.category or i["category"] == args.category)
+    ]
+    if args.json:
+        print(json.dumps(items, indent=2))
+        return 0
+    for i in sorted(items, key=lambda i: i["name"].lower()):
+        print(f"{i['id']:>6}  {i['type']:<9} {i['name']:<32} {i['username']:<20} {i['category']}")
+    return 0
+
+
+def cmd_put(client: KeyPilotClient, args: argparse.Namespace) -> int:
+    """Create, or update the existing credential with this name and type."""
+    secret = _read_secret(args.secret)
+    existing = client.resolve([args.name], args.type).get(args.name)
+    fields = {k: getattr(args, k) for k in ("username", "category", "description") if getattr(args, k) is not None}
+    if existing:
+        item = client.update(existing["id"], {"secret": secret, **fields})
+        print(f"updated {item['id']}", file=sys.stderr)
+    else:
+        item = client.create({"type": args.type, "name": args.name, "secret": secret, **fields})
+        print(f"created {item['id']}", file=sys.stderr)
+    return 0
+
+
+def cmd_rotate(client: KeyPilotClient, args: argparse.Namespace) -> int:
+    selector = {"type": args.type, "category": args.category, "older_than_days": args.older_than_days}
+    if all(v is None for v in selector.values()) and not args.all:
+        print("error: select credentials with --type, --category or --older-than-days, "
+              "or pass --all to rotate every password and API key", file=sys.stderr)
+        return 2
+    if args.all and not args.dry_run and not args.yes:
+        # Rotation cannot be undone: the old secrets are gone
+        prompt = f"Rotate every matching credential in vault '{args.vault or 'default'}'? Type 'yes' to continue: "
+        if not sys.stdin.isatty() or input(prompt).strip().lower() != "yes":
+            print("aborted (use --yes to skip this question)", file=sys.stderr)
+            return 1
+    options = {"length": args.length, "alphabet": args.alphabet, "dry_run": args.dry_run}
+    report = client.rotate({k: v for k, v in {**selector, **options}.items() if v is not None})
+    print(json.dumps(report, indent=2) if args.json else
+          f"selected {report['selected']}, rotated {report['rotated']}, failed {report['failed']}"
+          + (" (dry run)" if report["dry_run"] else ""))
+    return 0
+
+
+def cmd_export(client: KeyPilotClient, args: argparse.Namespace) -> int:
+    params = {k: v for k, v in (("type", args.type), ("category", args.category)) if v}
+    key, count = client.export_snapshot(args.output, params)
+    if args.key_file:
+        fd = os.open(args.key_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write(key + "\n")
+        print(f"{count} entries -> {args.output}, key -> {args.key_file}", file=sys.stderr)
+    else:
+        print(f"{count} entries -> {args.output}", file=sys.stderr)
+        print(key)
+    return 0
+
+
+def cmd_status(client: KeyPilotClient, args: argparse.Namespace) -> int:
+    s = client.status()
+    print(f"{s.get('vault', 'default')}: {'sealed' if s['sealed'] else 'unsealed'}")
+    return 0
+
+
+def cmd_unseal(client: KeyPilotClient, args: argparse.Namespace) -> int:
+    client.unseal(os.environ.get("KEYPILOT_MASTER_KEY") or getpass.getpass("Master key: "))
+    return 0
+
+
+def cmd_seal(client: KeyPilotClient, args: argparse.Namespace) -> int:
+    client.seal()
+    if client.cache:
+        client.cache.clear()
+    return 0
+
+
+def _parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(prog="keypilot", description="KeyPilot command-line client")
+    p.add_argument("--url", default=os.environ.get("KEYPILOT_URL", "http://localhost:8000"))
+    p.add_argument("--vault", default=os.environ.get("KEYPILOT_VAULT"))
+    p.add_argument("--cache-ttl", type=float, default=float(os.environ.get("KEYPILOT_CACHE_TTL", "60")),
+                   help="seconds the metadata cache is used without asking the server (default 60, 0 = always revalidate)")
+    p.add_argument("--no-cache", action="store_true", help="no local metadata cache")
+    sub = p.add_subparsers(dest="command", required=True)
+
+    s = sub.add_parser("get", help="print secrets by name (several names: JSON)")
+    s.add_argument("names", nargs="+")
+    s.add_argument("--type", choices=TYPES)
+    s.add_argument("--json", action="store_true")
+    s.set_defaults(func=cmd_get)
+
+    s = sub.add_parser("list", help="list credentials (no secrets)")
+    s.add_argument("--type", choices=TYPES)
+    s.add_argument("--category")
+    s.add_argument("--refresh", action="store_true", help="revalidate the cache now")
+    s.add_argument("--json", action="store_true")
+    s.set_defaults(func=cmd_list)
+
+    s = sub.add_parser("put", help="create or update a credential (secret: argument, '-' for stdin, else prompt)")
+    s.add_argument("name")
+    s.add_argument("secret", nargs="?")
+    s.add_argument("--type", choices=TYPES, default="password")
+    s.add_argument("--username")
+    s.add_argument("--category")
+    s.add_argument("--description")
+    s.set_defaults(func=cmd_put)
+
+    s = sub.add_parser("rotate", help="rotate matching credentials (POST /rotation/run); needs a selector or --all")
+    s.add_argument("--type", choices=TYPES)
+    s.add_argument("--category")
+    s.add_argument("--older-than-days", type=int)
+    s.add_argument("--all", action="store_true", help="no selector: every password and API key (asks first)")
+    s.add_argument("-y", "--yes", action="store_true", help="do not ask before rotating everything")
+    s.add_argument("--length", type=int)
+    s.add_argument("--alphabet")
+    s.add_argument("--dry-run", action="store_true")
+    s.add_argument("--json", action="store_true")
+    s.set_defaults(func=cmd_rotate)
+
+    s = sub.add_parser("export", help="download an encrypted snapshot; prints the snapshot key")
+    s.add_argument("-o", "--output", default="keypilot.kps")
+    s.add_argument("--key-file", help="write the key here (0600) instead of stdout")
+    s.add_argument("--type", choices=TYPES)
+    s.add_argument("--category")
+    s.set_defaults(func=cmd_export)
+
+    for name, func, text in (("status", cmd_status, "vault status"),
+                             ("unseal", cmd_unseal, "unseal (KEYPILOT_MASTER_KEY or prompt)"),
+                             ("seal", cmd_seal, "seal the vault")):
+        sub.add_parser(name, help=text).set_defaults(func=func)
+    return p
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    args = _parser().parse_args(argv)
+    cache = None if args.no_cache else MetadataCache(f"{args.url}|{args.vault or ''}", args.cache_ttl)
+    try:
+        with KeyPilotClient(args.url, args.vault, cache) as client:
+            return args.func(client, args)
+    except KeyPilotError as e:
+        print(f"error: {e.detail}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+# HTTP client: one httpx.Client (keep-alive connection pool) per CLI run; vault via X-KeyPilot-Vault
+import base64
+import secrets
+from typing import Any, Optional
+
+import httpx
+
+from .cache import MetadataCache
+
+
+class KeyPilotError(Exception):
+    """API error with the backend's detail message."""
+
+    def __init__(self, status: int, detail: str) -> None:
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+
+
+class KeyPilotClient:
+    def __init__(
+        self,
+        url: str,
+        vault: Optional[str] = None,
+        cache: Optional[MetadataCache] = None,
+        timeout: float = 30.0,
+        transport: Optional[httpx.BaseTransport] = None,  # e.g. httpx.MockTransport in tests
+    ) -> None:
+        headers = {"X-KeyPilot-Vault": vault} if vault else {}
+        self._http = httpx.Client(base_url=url.rstrip("/"), headers=headers, timeout=timeout, transport=transport)
+        self.cache = cache
+
+    def __enter__(self) -> "KeyPilotClient":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._http.close()
+
+    def request(self, method: str, path: str, **kwargs: Any) -> httpx.Response:
+        try:
+            r = self._http.request(method, path, **kwargs)
+        except httpx.HTTPError as e:
+            raise KeyPilotError(0, f"Backend not reachable at {self._http.base_url}: {e}") from e
+        if r.status_code >= 400:
+            try:
+                detail = r.json().get("detail", r.text)
+            except ValueError:
+                detail = r.text
+            raise KeyPilotError(r.status_code, str(detail))
+        return r
+
+    # --- vault ---
+
+    def status(self) -> dict:
+        return self.request("GET", "/vault/status").json()
+
+    def unseal(self, master_key: str) -> None:
+        self.request("POST", "/vault/unseal", json={"master_key": master_key})
+
+    def seal(self) -> None:
+        self.request("POST", "/vault/seal")
+
+    # --- credentials ---
+
+    def list_credentials(self, refresh: bool = False) -> list[dict]:
+        """Metadata of all credentials; from the cache while fresh, else revalidated via ETag."""
+        entry = self.cache.load() if self.cache else None
+        if entry and not refresh and self.cache.is_fresh(entry):
+            return entry["items"]
+        headers = {"If-None-Match": entry["etag"]} if entry and entry.get("etag") else {}
+        r = self.request("GET", "/credentials", headers=headers)
+        if r.status_code == 304 and entry:
+            self.cache.touch(entry)
+            return entry["items"]
+        items = r.json()
+        if self.cache:
+            self.cache.store(r.headers.get("etag"), items)
+        return items
+
+    def resolve(self, names: list[str], type: Optional[str] = None) -> dict[str, dict]:
+        """Name -> metadata. Unknown names trigger one revalidation (maybe created since the cache was filled)."""
+        def lookup(items: list[dict]) -> dict[str, dict]:
+            found = {}
+            for item in items:
+                if item["name"] in names and (type is None or item["type"] == type) and item["name"] not in found:
+                    found[item["name"]] = item
+            return found
+
+        found = lookup(self.list_credentials())
+        if len(found) < len(set(names)):
+            found = lookup(self.list_credentials(refresh=True))
+        return found
+
+    def secrets(self, ids: list[int]) -> list[dict]:
+        """Many secrets in one request (POST /credentials/secrets, 500 per call)."""
+        result = []
+        for start in range(0, len(ids), 500):
+            result.extend(self.request("POST", "/credentials/secrets", json={"ids": ids[start:start + 500]}).json())
+        return result
+
+    def create(self, data: dict) -> dict:
+        item = self.request("POST", "/credentials", json=data).json()
+        self._invalidate()
+        return item
+
+    def update(self, credential_id: int, data: dict) -> dict:
+        item = self.request("PATCH", f"/credentials/{credential_id}", json=data).json()
+        self._invalidate()
+        return item
+
+    def rotate(self, selector: dict) -> dict:
+        report = self.request("POST", "/rotation/run", json=selector).json()
+        self._invalidate()
+        return report
+
+    def export_snapshot(self, path: str, params: dict) -> tuple[str, int]:
+        """Stream a snapshot, encrypted under a new key made here, to path. Returns (snapshot key, entries)."""
+        key = base64.urlsafe_b64encode(secrets.token_bytes(32)).decode("ascii").rstrip("=")
+        with self._http.stream("POST", "/snapshot/export", json={"key": key, **params}) as r:
+            if r.status_code >= 400:
+                r.read()
+                raise KeyPilotError(r.status_code, str(r.json().get("detail", r.text)))
+            with open(path, "wb") as f:
+                for chunk in r.iter_bytes():
+                    f.write(chunk)
+            return key, int(r.headers.get("x-keypilot-snapshot-entries", 0))
+
+    def _invalidate(self) -> None:
+        if self.cache:
+            self.cache.clear()
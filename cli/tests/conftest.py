@@ -0,0 +1,15 @@
+# CLI tests run without installing the package, against an in-memory backend (httpx.MockTransport).
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture(autouse=True)
+def cache_env(tmp_path, monkeypatch):
+    """Cache key and directories inside the test's tmp_path, never the user's."""
+    monkeypatch.setenv("KEYPILOT_CACHE_KEY", "test passphrase")
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path / "config"))
@@ -0,0 +1,220 @@
+# KeyPilotClient and MetadataCache: encrypted cache file, TTL, ETag revalidation (304), invalidation
+# on writes, and the snapshot key staying out of headers.
+import json
+import stat
+import time
+
+import httpx
+import pytest
+
+from keypilot import cli
+from keypilot.cache import MetadataCache
+from keypilot.client import KeyPilotClient, KeyPilotError
+
+URL = "http://keypilot.test"
+
+
+class FakeBackend:
+    """GET /credentials with a weak ETag per list version (If-None-Match -> 304), POST /credentials."""
+
+    def __init__(self) -> None:
+        self.items: list[dict] = []
+        self.version = 0
+        self.requests: list[httpx.Request] = []
+        self.transport = httpx.MockTransport(self.handle)
+
+    @property
+    def etag(self) -> str:
+        return f'W/"v{self.version}"'
+
+    def add(self, name: str, type: str = "password") -> dict:
+        item = {"id": len(self.items) + 1, "type": type, "name": name, "username": "", "category": ""}
+        self.items.append(item)
+        self.version += 1
+        return item
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        if request.method == "GET" and request.url.path == "/credentials":
+            if request.headers.get("if-none-match") == self.etag:
+                return httpx.Response(304, headers={"ETag": self.etag})
+            return httpx.Response(200, json=self.items, headers={"ETag": self.etag})
+        if request.method == "POST" and request.url.path == "/credentials":
+            return httpx.Response(200, json=self.add(**{k: v for k, v in json.loads(request.content).items() if k in ("name", "type")}))
+        if request.method == "POST" and request.url.path == "/rotation/run":
+            dry_run = json.loads(request.content).get("dry_run", False)
+            return httpx.Response(200, json={"selected": len(self.items), "rotated": 0 if dry_run else len(self.items),
+                                             "failed": 0, "dry_run": dry_run})
+        if request.method == "POST" and request.url.path == "/snapshot/export":
+            return httpx.Response(200, content=b"KPSNAP", headers={"X-KeyPilot-Snapshot-Entries": "3"})
+        return httpx.Response(503, json={"detail": "Vault is sealed. Unseal first."})
+
+    def list_requests(self) -> list[str | None]:
+        """If-None-Match of each GET /credentials so far (None = unconditional); then forgets them."""
+        sent = [r.headers.get("if-none-match") for r in self.requests if r.url.path == "/credentials" and r.method == "GET"]
+        self.requests.clear()
+        return sent
+
+
+@pytest.fixture
+def backend():
+    return FakeBackend()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controls time.time() as seen by the cache."""
+    now = [1_000_000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    return now
+
+
+def make_client(backend: FakeBackend, ttl: float = 60, vault: str | None = None) -> KeyPilotClient:
+    return KeyPilotClient(URL, vault, MetadataCache(f"{URL}|{vault or ''}", ttl), transport=backend.transport)
+
+
+def test_cache_file_is_encrypted_and_scoped(tmp_path, monkeypatch):
+    cache = MetadataCache("http://a|team", ttl=60)
+    cache.store('W/"1"', [{"id": 1, "name": "prod db"}])
+    assert cache.path.parent == tmp_path / "cache" / "keypilot"
+    assert stat.S_IMODE(cache.path.stat().st_mode) == 0o600
+    assert b"prod db" not in cache.path.read_bytes()
+    assert MetadataCache("http://a|team", ttl=60).load()["items"] == [{"id": 1, "name": "prod db"}]
+
+    # Another vault or backend, another passphrase, a damaged file: a miss, not an error
+    assert MetadataCache("http://a|other", ttl=60).load() is None
+    foreign = MetadataCache("http://a|other", ttl=60)
+    foreign.path.write_bytes(cache.path.read_bytes())
+    assert foreign.load() is None
+    monkeypatch.setenv("KEYPILOT_CACHE_KEY", "another passphrase")
+    assert MetadataCache("http://a|team", ttl=60).load() is None
+    monkeypatch.setenv("KEYPILOT_CACHE_KEY", "test passphrase")
+    cache.path.write_bytes(cache.path.read_bytes()[:-1])
+    assert cache.load() is None
+    cache.clear()
+    cache.clear()  # nothing to remove: no error
+    assert cache.load() is None
+
+
+def test_random_cache_key_is_kept_apart_from_the_cache(tmp_path, monkeypatch):
+    monkeypatch.delenv("KEYPILOT_CACHE_KEY")
+    MetadataCache("scope", ttl=60).store(None, [{"id": 1}])
+    key_file = tmp_path / "config" / "keypilot" / "cache.key"
+    assert stat.S_IMODE(key_file.stat().st_mode) == 0o600
+    assert MetadataCache("scope", ttl=60).load()["items"] == [{"id": 1}]  # same key next run
+
+
+def test_fresh_cache_needs_no_request(backend, clock):
+    backend.add("prod db")
+    with make_client(backend, ttl=60) as client:
+        assert [i["name"] for i in client.list_credentials()] == ["prod db"]
+        assert backend.list_requests() == [None]
+        clock[0] += 59
+        assert [i["name"] for i in client.list_credentials()] == ["prod db"]
+        assert backend.list_requests() == []
+
+
+def test_stale_cache_is_revalidated_with_the_etag(backend, clock):
+    backend.add("prod db")
+    with make_client(backend, ttl=60) as client:
+        client.list_credentials()
+        backend.list_requests()
+
+        clock[0] += 60
+        assert [i["name"] for i in client.list_credentials()] == ["prod db"]  # 304: cached list reused
+        assert backend.list_requests() == ['W/"v1"']
+        clock[0] += 30
+        client.list_credentials()  # the 304 made the entry fresh again
+        assert backend.list_requests() == []
+
+        backend.add("grafana")  # changed on the server (e.g. by another client)
+        clock[0] += 60
+        assert [i["name"] for i in client.list_credentials()] == ["prod db", "grafana"]
+        assert backend.list_requests() == ['W/"v1"']
+        assert client.cache.load()["etag"] == 'W/"v2"'
+
+
+def test_ttl_zero_always_revalidates_and_refresh_skips_the_ttl(backend, clock):
+    backend.add("prod db")
+    with make_client(backend, ttl=0) as client:
+        client.list_credentials()
+        client.list_credentials()
+        assert backend.list_requests() == [None, 'W/"v1"']
+    with make_client(backend, ttl=3600) as client:
+        client.list_credentials(refresh=True)
+        assert backend.list_requests() == ['W/"v1"']
+
+
+def test_unknown_names_revalidate_once(backend, clock):
+    backend.add("prod db")
+    with make_client(backend) as client:
+        client.list_credentials()
+        backend.add("grafana")
+        backend.list_requests()
+        found = client.resolve(["prod db", "grafana", "missing"])
+        assert sorted(found) == ["grafana", "prod db"]
+        assert backend.list_requests() == ['W/"v1"']  # one revalidation for both unknown names
+        assert sorted(client.resolve(["prod db", "grafana"])) == ["grafana", "prod db"]
+        assert backend.list_requests() == []
+
+
+def test_writes_invalidate_the_cache(backend, clock):
+    with make_client(backend) as client:
+        client.list_credentials()
+        client.create({"type": "password", "name": "new", "secret": "x"})
+        assert client.cache.load() is None
+        assert [i["name"] for i in client.list_credentials()] == ["new"]
+        assert backend.list_requests() == [None, None]
+
+
+def test_errors_carry_the_backend_detail(backend):
+    with KeyPilotClient(URL, transport=backend.transport) as client:  # no cache
+        with pytest.raises(KeyPilotError) as e:
+            client.seal()
+        assert (e.value.status, e.value.detail) == (503, "Vault is sealed. Unseal first.")
+        assert client.list_credentials() == []
+
+
+def test_snapshot_key_goes_in_the_body(backend, tmp_path):
+    with KeyPilotClient(URL, transport=backend.transport) as client:
+        key, count = client.export_snapshot(str(tmp_path / "out.kps"), {"type": "password"})
+    (request,) = backend.requests
+    assert json.loads(request.content) == {"key": key, "type": "password"}
+    assert key not in str(request.headers) and key not in str(request.url)
+    assert count == 3 and (tmp_path / "out.kps").read_bytes() == b"KPSNAP"
+
+
+def rotate(backend: FakeBackend, *argv: str) -> tuple[int, list[dict]]:
+    """Runs `keypilot rotate <argv>`; returns the exit code and the bodies sent to POST /rotation/run."""
+    args = cli._parser().parse_args(["rotate", *argv])
+    with KeyPilotClient(URL, transport=backend.transport) as client:
+        code = args.func(client, args)
+    return code, [json.loads(r.content) for r in backend.requests if r.url.path == "/rotation/run"]
+
+
+def test_rotate_needs_a_selector_or_all(backend, monkeypatch, capsys):
+    monkeypatch.setattr("sys.stdin.isatty", lambda: True)
+    monkeypatch.setattr("builtins.input", lambda prompt: pytest.fail("asked without --all"))
+    assert rotate(backend) == (2, [])
+    assert rotate(backend, "--length", "40", "--dry-run") == (2, [])
+    assert "--all" in capsys.readouterr().err
+
+    assert rotate(backend, "--category", "prod") == (0, [{"category": "prod", "dry_run": False}])
+
+
+def test_rotate_all_asks_first(backend, monkeypatch):
+    answers = iter(["no", "yes"])
+    monkeypatch.setattr("sys.stdin.isatty", lambda: True)
+    monkeypatch.setattr("builtins.input", lambda prompt: next(answers))
+    assert rotate(backend, "--all") == (1, [])
+    assert rotate(backend, "--all") == (0, [{"dry_run": False}])
+
+    backend.requests.clear()
+    assert rotate(backend, "--all", "--dry-run") == (0, [{"dry_run": True}])  # nothing to undo: no question
+    backend.requests.clear()
+    assert rotate(backend, "--all", "--yes") == (0, [{"dry_run": False}])
+
+    # Not a terminal (scripts, CI): only with --yes
+    monkeypatch.setattr("sys.stdin.isatty", lambda: False)
+    backend.requests.clear()
+    assert rotate(backend, "--all") == (1, [])
@@ -187,11 +187,17 @@ export function credentialTypeLabel(type: string): string {
   }
 }
 
-export async function chat(message: string): Promise<{ reply: string; action_performed?: string }> {
+export type ChatTurn = { role: "user" | "assistant"; content: string }
+
+/** history: earlier turns, oldest first (the backend only sends the last OLLAMA_CONTEXT_MESSAGES user turns to the model) */
+export async function chat(
+  message: string,
+  history: ChatTurn[] = []
+): Promise<{ reply: string; action_performed?: string }> {
   const r = await fetch(`${BASE}/chat`, {
     method: "POST",
     headers: { "Content-Type": "application/json" },
-    body: JSON.stringify({ message }),
+    body: JSON.stringify({ message, history }),
   })
   if (!r.ok) {
     const e = await r.json().catch(() => ({}))
@@ -3,11 +3,16 @@ import { useNavigate } from "react-router-dom"
 import { Button } from "../components/ui/button"
 import { Input } from "../components/ui/input"
 import { Card, CardContent, CardHeader, CardTitle } from "../components/ui/card"
-import { chat } from "../api/client"
+import { chat, type ChatTurn } from "../api/client"
 import { useVaultSealed } from "../hooks/useVaultSealed"
 import { MessageSquare, Send } from "lucide-react"
 
-type Message = { role: "user" | "assistant"; content: string }
+// error: the request for this user message failed
+type Message = ChatTurn & { error?: boolean }
+
+// Earlier user messages sent along, so follow-ups ("and rotate it too") have context; failed ones are left out.
+// Replies stay in the browser: they can contain decrypted secrets.
+const HISTORY_TURNS = 10
 
 export function ChatPage() {
   const { sealed, loading: vaultLoading } = useVaultSealed()
@@ -33,14 +38,22 @@ export function ChatPage() {
   const send = async () => {
     const text = input.trim()
     if (!text || loading) return
+    const history = messages
+      .filter((msg) => msg.role === "user" && !msg.error)
+      .slice(-HISTORY_TURNS)
+      .map(({ role, content }) => ({ role, content }))
+    const turn: Message = { role: "user", content: text }
     setInput("")
-    setMessages((m) => [...m, { role: "user", content: text }])
+    setMessages((m) => [...m, turn])
     setLoading(true)
     try {
-      const res = await chat(text)
+      const res = await chat(text, history)
       setMessages((m) => [...m, { role: "assistant", content: res.reply }])
     } catch (err) {
-      setMessages((m) => [...m, { role: "assistant", content: `Error: ${err instanceof Error ? err.message : "Unknown"}` }])
+      setMessages((m) => [
+        ...m.map((msg) => (msg === turn ? { ...msg, error: true } : msg)),
+        { role: "assistant", content: `Error: ${err instanceof Error ? err.message : "Unknown"}` },
+      ])
     } finally {
       setLoading(false)
     }